@@ -1,25 +1,30 @@
+import time
+_inicio_ejecucion = time.perf_counter()
+# Tiempo de esta ejecución esperando a un trabajo en segundo plano (no cuenta como reejecución)
+_espera_sondeo = 0.0
+
 import streamlit as st
 import pandas as pd
-import numpy as np
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-import plotly.express as px
 from datetime import datetime
-import io
-import base64
+import uuid
 import warnings
+from auditoria.cache import hash_contenido, obtener_almacen_compartido
+from auditoria.configuracion import (
+    CRITERIOS_AUDITORIA, CSS_PERSONALIZADO,
+    HLB_BLUE, HLB_GOLD, HLB_LIGHT_BLUE, HLB_CHARCOAL, HLB_GREY
+)
+from auditoria.delta import auditar_incremental, obtener_almacen, version_criterios
+from auditoria.ingesta import leer_libros
+from auditoria.medicion import registrar_ejecucion, resumen_ejecuciones
+from auditoria.motor import SistemaAuditoriaAsientos
+from auditoria.paquete import importar_paquete
+from auditoria.progreso import ReporteProgreso, describir_etapa
+from auditoria.trabajos import (
+    obtener_gestor, ESTADO_COMPLETADO, ESTADO_CANCELADO, ESTADO_ERROR
+)
+from auditoria.visualizador import VisualizadorAuditoria
 warnings.filterwarnings('ignore')
 
-# ==============================================
-# PALETA DE COLORES HLB AUDITEC
-# ==============================================
-HLB_BLUE = "#005A77"       # HLB BLUE
-HLB_GOLD = "#FBBA00"       # HLB GOLD  
-HLB_LIGHT_BLUE = "#0093A7" # HLB LIGHT BLUE
-HLB_CHARCOAL = "#3C3C3B"   # HLB CHARCOAL
-HLB_BLACK = "#1D1D1B"      # BLACK
-HLB_GREY = "#C6D3D9"       # HLB GREY
-
 # Configuración de la página
 st.set_page_config(
     page_title="HLB Ecuador - Dashboard de Auditoría Contable",
@@ -28,632 +33,221 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# CSS personalizado con paleta HLB
-st.markdown(f"""
-<style>
-    .main-header {{
-        font-size: 2.5rem;
-        color: {HLB_BLUE};
-        text-align: center;
-        margin-bottom: 2rem;
-        border-bottom: 4px solid {HLB_GOLD};
-        padding-bottom: 1rem;
-    }}
-    .sub-header {{
-        font-size: 1.5rem;
-        color: {HLB_BLUE};
-        margin-top: 2rem;
-        margin-bottom: 1rem;
-        border-left: 5px solid {HLB_GOLD};
-        padding-left: 1rem;
-    }}
-    .metric-card {{
-        background-color: {HLB_GREY};
-        padding: 1.5rem;
-        border-radius: 10px;
-        border-left: 5px solid {HLB_BLUE};
-        margin-bottom: 1rem;
-        box-shadow: 0 2px 8px rgba(0, 0, 0, 0.1);
-    }}
-    .warning-card {{
-        background-color: rgba(251, 186, 0, 0.1);
-        padding: 1rem;
-        border-radius: 10px;
-        border-left: 5px solid {HLB_GOLD};
-        margin-bottom: 1rem;
-    }}
-    .error-card {{
-        background-color: rgba(60, 60, 59, 0.1);
-        padding: 1rem;
-        border-radius: 10px;
-        border-left: 5px solid {HLB_CHARCOAL};
-        margin-bottom: 1rem;
-    }}
-    .stButton>button {{
-        background-color: {HLB_BLUE};
-        color: white;
-        font-weight: bold;
-        border: none;
-        border-radius: 5px;
-        padding: 0.5rem 1.5rem;
-    }}
-    .stDownloadButton>button {{
-        background-color: {HLB_LIGHT_BLUE};
-        color: white;
-        font-weight: bold;
-        border: none;
-        border-radius: 5px;
-        padding: 0.5rem 1.5rem;
-    }}
-    .stSidebar {{
-        background-color: {HLB_GREY};
-    }}
-    .stTabs [data-baseweb="tab-list"] {{
-        gap: 2rem;
-    }}
-    .stTabs [data-baseweb="tab"] {{
-        background-color: {HLB_GREY};
-        border-radius: 5px 5px 0 0;
-        padding: 0.5rem 1rem;
-    }}
-    .stTabs [aria-selected="true"] {{
-        background-color: {HLB_BLUE};
-        color: white;
-    }}
-</style>
-""", unsafe_allow_html=True)
-
-# Clases del sistema de auditoría (adaptadas para Streamlit)
-class SistemaAuditoriaAsientos:
-    def __init__(self, materialidad=170000):
-        self.materialidad = materialidad
-        self.df_original = None
-        self.df_procesado = None
-        self.resultados = None
-        self.estadisticas = None
-        self.asientos_criticos = None
-        self.asientos_irregulares = None
+# CSS personalizado con paleta HLB (construido una vez por proceso)
+st.markdown(CSS_PERSONALIZADO, unsafe_allow_html=True)
 
-        # Criterios de auditoría
-        self.criterios_auditoria = {
-            '5.1_Pagos': {
-                'palabras_clave': ['pago', 'payment', 'pagó', 'pagado', 'cheque', 'transferencia', 'abono', 'remesa'],
-                'columnas_busqueda': ['Comentario', 'Tipo', 'Cuenta', 'Descripción', 'Asiento', 'Saltos'],
-                'descripcion': 'Movimientos que en su detalle tengan algún pago',
-                'nivel_riesgo': 'medio'
-            },
-            '5.2_Cobros_Ventas': {
-                'palabras_clave': ['cobro', 'venta', 'facturación', 'factura', 'sale', 'invoice', 'ingreso', 'recibo', 'cliente'],
-                'columnas_busqueda': ['Comentario', 'Tipo', 'Cuenta', 'Descripción', 'Asiento', 'Saltos'],
-                'descripcion': 'Registros que contengan en su tipo los cobros en ventas y facturación',
-                'nivel_riesgo': 'bajo'
-            },
-            '5.3_Importaciones': {
-                'palabras_clave': ['importación', 'importacion', 'import', 'custom', 'aduana', 'arancel', 'impuesto importación'],
-                'columnas_busqueda': ['Comentario', 'Tipo', 'Descripción', 'Asiento'],
-                'descripcion': 'Movimientos efectuados que en su tipo contengan importaciones',
-                'nivel_riesgo': 'alto'
-            },
-            '5.4_Baja_Inventarios': {
-                'palabras_clave': ['baja inventario', 'baja de inventario', 'inventory write-off', 'low inventory', 'obsolescencia', 'deterioro'],
-                'columnas_busqueda': ['Comentario', 'Tipo', 'Descripción', 'Asiento'],
-                'descripcion': 'Aquellos que su detalle contengan baja de inventarios',
-                'nivel_riesgo': 'alto'
-            },
-            '5.5_Provisiones_Ajustes': {
-                'palabras_clave': ['provisión', 'provision', 'cierre', 'ajuste', 'reclassificación', 'reclasificacion', 'adjustment', 'closing'],
-                'columnas_busqueda': ['Comentario', 'Tipo', 'Descripción', 'Asiento'],
-                'descripcion': 'Valores en las que su detalle tengan: provisiones, cierres, ajustes, reclassificaciones',
-                'nivel_riesgo': 'medio'
-            },
-            '5.6_Retenciones_Depositos': {
-                'palabras_clave': ['retención', 'retencion', 'depósito', 'deposito', 'withholding', 'deposit', 'retiene', 'consignación'],
-                'columnas_busqueda': ['Comentario', 'Tipo', 'Descripción', 'Asiento'],
-                'descripcion': 'Registros que contengan retención, depósito',
-                'nivel_riesgo': 'medio'
-            },
-            '5.7_Fines_Semana_Feriados': {
-                'palabras_clave': [],
-                'columnas_busqueda': ['Fecha de contabilización', 'Fecha'],
-                'descripcion': 'Aquellos que contengan su fecha: fines de semana y feriados',
-                'nivel_riesgo': 'alto'
-            },
-            '5.8_Partes_Relacionadas': {
-                'palabras_clave': ['parte relacionada', 'related party', 'afiliada', 'affiliate', 'subsidiaria', 'matriz', 'controladora'],
-                'columnas_busqueda': ['Comentario', 'Cuenta', 'Descripción', 'Asiento'],
-                'descripcion': 'Ingreso o salida de dinero en donde intervengan transacciones con partes relacionadas',
-                'nivel_riesgo': 'alto'
-            },
-            '5.9_Asesores_Legales': {
-                'palabras_clave': ['asesor legal', 'abogado', 'lawyer', 'legal counsel', 'attorney', 'honorario legal', 'consultoría legal'],
-                'columnas_busqueda': ['Comentario', 'Cuenta', 'Descripción', 'Asiento'],
-                'descripcion': 'Desembolso de dinero con concepto pago a asesores legales',
-                'nivel_riesgo': 'alto'
-            },
-            '5.10_Montos_Sospechosos': {
-                'palabras_clave': [],
-                'columnas_busqueda': [],
-                'descripcion': 'Montos que son múltiplos exactos de números redondos (ej: 10,000 exactos)',
-                'nivel_riesgo': 'medio'
-            },
-            '5.11_Diferencias_Saldo': {
-                'palabras_clave': [],
-                'columnas_busqueda': [],
-                'descripcion': 'Diferencias significativas entre debe y haber',
-                'nivel_riesgo': 'alto'
-            }
-        }
+def referenciar_libro(uploaded_files, todas_las_hojas, progreso=None):
+    """Libro consolidado compartido entre sesiones: los mismos archivos se leen y se guardan una sola vez
 
-        # Feriados (puedes expandir esta lista)
-        self.feriados = [
-            '2022-01-01', '2022-04-14', '2022-04-15', '2022-05-01',
-            '2022-05-26', '2022-08-10', '2022-10-09', '2022-11-02',
-            '2022-11-03', '2022-12-25', '2022-12-31'
-        ]
+    Si hay que leerlos, la lectura informa las filas leídas a `progreso`.
+    """
+    archivos = [(archivo.name, archivo.getvalue()) for archivo in uploaded_files]
+    clave = hash_contenido(b'libro', todas_las_hojas, *(parte for archivo in archivos for parte in archivo))
+    
+    ref_libro = st.session_state.get('ref_libro')
+    if ref_libro is None or ref_libro.clave != clave:
+        if ref_libro is not None:
+            ref_libro.liberar()
+        ref_libro = obtener_almacen_compartido().obtener_o_crear(
+            clave, lambda: leer_libros(archivos, todas_las_hojas=todas_las_hojas, progreso=progreso)
+        )
+        st.session_state['ref_libro'] = ref_libro
+    return ref_libro
 
-    def cargar_datos(self, df):
-        """Cargar y preparar datos para auditoría"""
-        self.df_original = df.copy()
-        self.df_procesado = df.copy()
-        
-        st.info(f"📊 Datos cargados: {len(df)} registros, {len(df.columns)} columnas")
-        
-        # Mostrar columnas detectadas
-        st.write("**Columnas detectadas:**", list(df.columns))
-        
-        # Identificar columnas de monto
-        columna_debe = None
-        columna_haber = None
-        
-        for col in ['Suma de Debe', 'Debe', 'Monto', 'Amount', 'Importe', 'Valor']:
-            if col in df.columns:
-                columna_debe = col
-                break
-                
-        for col in ['Suma de Haber', 'Haber']:
-            if col in df.columns:
-                columna_haber = col
-                break
-        
-        if columna_debe:
-            self.df_procesado['Monto_Debe'] = pd.to_numeric(
-                self.df_procesado[columna_debe], errors='coerce'
-            ).fillna(0)
-            st.success(f"✅ Columna de debe identificada: '{columna_debe}'")
-        
-        if columna_haber:
-            self.df_procesado['Monto_Haber'] = pd.to_numeric(
-                self.df_procesado[columna_haber], errors='coerce'
-            ).fillna(0)
-            st.success(f"✅ Columna de haber identificada: '{columna_haber}'")
-        
-        # Calcular monto absoluto para auditoría
-        if columna_debe and columna_haber:
-            self.df_procesado['Monto_Auditoria'] = self.df_procesado['Monto_Debe'] - self.df_procesado['Monto_Haber']
-            self.df_procesado['Monto_Absoluto'] = abs(self.df_procesado['Monto_Auditoria'])
-        elif columna_debe:
-            self.df_procesado['Monto_Auditoria'] = self.df_procesado['Monto_Debe']
-            self.df_procesado['Monto_Absoluto'] = abs(self.df_procesado['Monto_Debe'])
-        else:
-            st.error("❌ No se pudo identificar columna de monto")
-            raise ValueError("No se pudo identificar columna de monto")
-        
-        # Preparar fechas
-        columna_fecha = None
-        for col in ['Fecha de contabilización', 'Fecha', 'Date', 'Fecha contable']:
-            if col in df.columns:
-                columna_fecha = col
-                self.df_procesado['Fecha_Procesada'] = pd.to_datetime(
-                    self.df_procesado[col], errors='coerce'
-                )
-                st.success(f"✅ Columna de fecha identificada: '{col}'")
-                break
-        
-        if not columna_fecha:
-            st.warning("⚠️ No se encontró columna de fecha específica")
-            self.df_procesado['Fecha_Procesada'] = pd.NaT
-        
-        return self.df_procesado
+def mostrar_carga(auditoria, df):
+    """Informar las columnas identificadas por `cargar_datos`"""
+    st.info(f"📊 Datos cargados: {len(df)} registros, {len(df.columns)} columnas")
     
-    def aplicar_auditoria(self):
-        """Aplicar todos los criterios de auditoría"""
-        if self.df_procesado is None:
-            raise ValueError("Primero debe cargar los datos")
-        
-        st.info("🔍 Aplicando criterios de auditoría...")
-        
-        resultados = []
-        detalles_irregulares = []
-        
-        # Barra de progreso
-        progress_bar = st.progress(0)
-        total_asientos = len(self.df_procesado)
-        
-        for idx, asiento in self.df_procesado.iterrows():
-            criterios_aplicados = []
-            detalles_criterios = []
-            criterios_detalle = {}
-            
-            monto = asiento.get('Monto_Absoluto', 0)
-            es_material = monto >= self.materialidad
-            
-            # Aplicar cada criterio
-            for criterio, config in self.criterios_auditoria.items():
-                aplica_criterio = False
-                detalle_aplicacion = ""
-                nivel_riesgo = config.get('nivel_riesgo', 'medio')
-                
-                if criterio == '5.7_Fines_Semana_Feriados':
-                    # Criterio especial para fechas
-                    fecha = asiento.get('Fecha_Procesada')
-                    if not pd.isna(fecha):
-                        # Verificar fin de semana
-                        if fecha.weekday() >= 5:
-                            aplica_criterio = True
-                            detalle_aplicacion = f"Fin de semana: {fecha.strftime('%Y-%m-%d')}"
-                        # Verificar feriado
-                        fecha_str = fecha.strftime('%Y-%m-%d')
-                        if fecha_str in self.feriados:
-                            aplica_criterio = True
-                            detalle_aplicacion = f"Feriado: {fecha_str}"
-                
-                elif criterio == '5.10_Montos_Sospechosos':
-                    # Montos sospechosos (múltiplos exactos de 10000)
-                    if monto > 0 and monto % 10000 == 0:
-                        aplica_criterio = True
-                        detalle_aplicacion = f"Monto sospechoso: ${monto:,.2f} (múltiplo de 10,000)"
-                
-                elif criterio == '5.11_Diferencias_Saldo':
-                    # Diferencias entre debe y haber
-                    debe = asiento.get('Monto_Debe', 0)
-                    haber = asiento.get('Monto_Haber', 0)
-                    if abs(debe - haber) > 0.01:  # Tolerancia pequeña
-                        aplica_criterio = True
-                        detalle_aplicacion = f"Diferencia: Debe=${debe:,.2f}, Haber=${haber:,.2f}"
-                
-                else:
-                    # Criterios basados en texto
-                    for columna in config['columnas_busqueda']:
-                        if columna in asiento and pd.notna(asiento[columna]):
-                            texto = str(asiento[columna]).lower()
-                            for palabra in config['palabras_clave']:
-                                if palabra.lower() in texto:
-                                    aplica_criterio = True
-                                    detalle_aplicacion = f"'{palabra}' encontrado en {columna}"
-                                    break
-                        if aplica_criterio:
-                            break
-                
-                criterios_aplicados.append(1 if aplica_criterio else 0)
-                if aplica_criterio:
-                    detalles_criterios.append(f"{criterio}: {detalle_aplicacion}")
-                    criterios_detalle[criterio] = {
-                        'detalle': detalle_aplicacion,
-                        'riesgo': nivel_riesgo
-                    }
-                    
-                    # Registrar como irregular si es de alto riesgo y material
-                    if nivel_riesgo == 'alto' and es_material:
-                        detalles_irregulares.append({
-                            'ID_Asiento': idx,
-                            'Criterio': criterio,
-                            'Detalle': detalle_aplicacion,
-                            'Monto': monto,
-                            'Nivel_Riesgo': nivel_riesgo
-                        })
-            
-            # Crear registro de resultado
-            resultado = {
-                'ID_Asiento': idx,
-                'Monto_Original': asiento.get('Monto_Auditoria', 0),
-                'Monto_Absoluto': monto,
-                'Material': 'Sí' if es_material else 'No',
-                'Total_Criterios': sum(criterios_aplicados),
-                'Criterios_Detalle': criterios_detalle,
-                'Detalles_Criterios': ' | '.join(detalles_criterios) if detalles_criterios else 'Ninguno'
-            }
-            
-            # Agregar cada criterio individualmente
-            for i, (criterio, _) in enumerate(self.criterios_auditoria.items()):
-                resultado[criterio] = criterios_aplicados[i]
-            
-            resultados.append(resultado)
-            
-            # Actualizar barra de progreso
-            if idx % max(1, total_asientos // 20) == 0:
-                progress_bar.progress(min(100, int((idx + 1) / total_asientos * 100)))
-        
-        self.resultados = pd.DataFrame(resultados)
-        self.asientos_irregulares = pd.DataFrame(detalles_irregulares)
-        self._calcular_estadisticas()
-        
-        progress_bar.empty()
-        st.success("✅ Auditoría completada exitosamente!")
-        return self.resultados
+    # Mostrar columnas detectadas
+    st.write("**Columnas detectadas:**", list(df.columns))
     
-    def _calcular_estadisticas(self):
-        """Calcular estadísticas detalladas del análisis"""
-        stats = {}
-        
-        stats['total_asientos'] = len(self.resultados)
-        stats['asientos_materiales'] = len(self.resultados[self.resultados['Material'] == 'Sí'])
-        stats['porcentaje_materiales'] = (stats['asientos_materiales'] / stats['total_asientos']) * 100
-        
-        # Estadísticas por criterio
-        criterios_stats = {}
-        for criterio in self.criterios_auditoria.keys():
-            if criterio in self.resultados.columns:
-                count = self.resultados[criterio].sum()
-                porcentaje = (count / stats['total_asientos']) * 100
-                nivel_riesgo = self.criterios_auditoria[criterio].get('nivel_riesgo', 'medio')
-                criterios_stats[criterio] = {
-                    'count': count,
-                    'porcentaje': porcentaje,
-                    'descripcion': self.criterios_auditoria[criterio]['descripcion'],
-                    'nivel_riesgo': nivel_riesgo
-                }
-        
-        stats['criterios'] = criterios_stats
-        stats['asientos_multiple_criterio'] = len(self.resultados[self.resultados['Total_Criterios'] > 1])
-        stats['asientos_alto_riesgo'] = len(self.resultados[
-            (self.resultados['Material'] == 'Sí') &
-            (self.resultados['Total_Criterios'] >= 2)
-        ])
-        
-        # Asientos críticos (alto riesgo + material)
-        self.asientos_criticos = self.resultados[
-            (self.resultados['Material'] == 'Sí') &
-            (self.resultados['Total_Criterios'] > 0)
-        ].sort_values(['Total_Criterios', 'Monto_Absoluto'], ascending=[False, False])
-        
-        stats['asientos_criticos_count'] = len(self.asientos_criticos)
-        
-        # Montos totales
-        stats['monto_total_material'] = self.resultados[self.resultados['Material'] == 'Sí']['Monto_Absoluto'].sum()
-        stats['monto_total'] = self.resultados['Monto_Absoluto'].sum()
-        
-        self.estadisticas = stats
-        return stats
+    columnas = auditoria.columnas_detectadas
+    if columnas.get('debe'):
+        st.success(f"✅ Columna de debe identificada: '{columnas['debe']}'")
+    if columnas.get('haber'):
+        st.success(f"✅ Columna de haber identificada: '{columnas['haber']}'")
+    if columnas.get('fecha'):
+        st.success(f"✅ Columna de fecha identificada: '{columnas['fecha']}'")
+    else:
+        st.warning("⚠️ No se encontró columna de fecha específica")
 
-class VisualizadorAuditoria:
-    def __init__(self, sistema_auditoria):
-        self.auditoria = sistema_auditoria
-        self.resultados = sistema_auditoria.resultados
-        self.estadisticas = sistema_auditoria.estadisticas
-        self.asientos_criticos = sistema_auditoria.asientos_criticos
-        self.asientos_irregulares = sistema_auditoria.asientos_irregulares
+    # Plan de evaluación: columnas leídas con otro nombre y criterios omitidos
+    plan = auditoria.plan_evaluacion or {'columnas': {}, 'omitidos': {}}
+    equivalencias = [f"'{nombre}' ← '{real}'" for nombre, real in plan['columnas'].items()
+                     if real is not None and real != nombre]
+    if equivalencias:
+        st.info("🔗 Columnas de búsqueda identificadas por alias: " + ", ".join(equivalencias))
+    if plan['omitidos']:
+        st.warning("⚠️ Criterios omitidos (no pueden aplicarse a este libro):\n\n" + "\n".join(
+            f"- **{criterio.replace('_', ' ')}**: {motivo}" for criterio, motivo in plan['omitidos'].items()
+        ))
+
+def mostrar_rendimiento():
+    """Tiempos de carga de la página medidos en este proceso"""
+    resumen = resumen_ejecuciones()
+    formato = lambda v: f"{v * 1000:,.0f} ms" if v is not None else "-"
     
-    def crear_dashboard_principal(self):
-        """Crear dashboard principal interactivo con colores HLB"""
-        stats = self.estadisticas
-        
-        # Crear subplots
-        fig = make_subplots(
-            rows=2, cols=2,
-            subplot_titles=(
-                'Distribución por Materialidad',
-                'Top Criterios de Auditoría',
-                'Asientos por Número de Criterios',
-                'Montos vs Criterios Aplicados'
-            ),
-            specs=[
-                [{"type": "pie"}, {"type": "bar"}],
-                [{"type": "histogram"}, {"type": "scatter"}]
-            ]
-        )
-        
-        # 1. Distribución por Materialidad - Usando colores HLB
-        material_counts = self.resultados['Material'].value_counts()
-        fig.add_trace(
-            go.Pie(
-                labels=material_counts.index,
-                values=material_counts.values,
-                hole=0.4,
-                marker=dict(colors=[HLB_GOLD, HLB_LIGHT_BLUE]),  # HLB Gold y Light Blue
-                name="Materialidad",
-                textinfo='percent+label',
-                hoverinfo='label+value+percent'
-            ),
-            row=1, col=1
-        )
-        
-        # 2. Top Criterios
-        criterios_data = []
-        for criterio, data in stats['criterios'].items():
-            nombre_corto = criterio.replace('5.', '').replace('_', ' ')
-            criterios_data.append({
-                'Criterio': nombre_corto,
-                'Count': data['count'],
-                'Riesgo': data['nivel_riesgo']
-            })
-        
-        criterios_df = pd.DataFrame(criterios_data).sort_values('Count', ascending=True)
-        
-        # Colores según nivel de riesgo usando paleta HLB
-        colors = []
-        for riesgo in criterios_df['Riesgo']:
-            if riesgo == 'alto':
-                colors.append(HLB_GOLD)  # HLB Gold para alto riesgo
-            elif riesgo == 'medio':
-                colors.append(HLB_LIGHT_BLUE)  # HLB Light Blue para medio riesgo
-            else:
-                colors.append(HLB_BLUE)  # HLB Blue para bajo riesgo
-        
-        fig.add_trace(
-            go.Bar(
-                y=criterios_df['Criterio'],
-                x=criterios_df['Count'],
-                orientation='h',
-                marker_color=colors,
-                text=criterios_df['Count'],
-                textposition='auto',
-                name="Criterios",
-                hovertemplate='<b>%{y}</b><br>Cantidad: %{x}<br>Nivel de Riesgo: %{customdata[0]}<extra></extra>',
-                customdata=criterios_df[['Riesgo']].values
-            ),
-            row=1, col=2
-        )
-        
-        # 3. Distribución de número de criterios
-        fig.add_trace(
-            go.Histogram(
-                x=self.resultados['Total_Criterios'],
-                nbinsx=10,
-                marker_color=HLB_BLUE,  # HLB Blue
-                name="Número de Criterios",
-                hovertemplate='<b>%{x} criterios</b><br>Cantidad: %{y}<extra></extra>'
-            ),
-            row=2, col=1
-        )
-        
-        # 4. Montos vs Criterios
-        fig.add_trace(
-            go.Scatter(
-                x=self.resultados['Total_Criterios'],
-                y=self.resultados['Monto_Absoluto'],
-                mode='markers',
-                marker=dict(
-                    size=8,
-                    color=self.resultados['Total_Criterios'],
-                    colorscale=[[0, HLB_BLUE], [0.5, HLB_LIGHT_BLUE], [1, HLB_GOLD]],  # Escala HLB
-                    showscale=True,
-                    colorbar=dict(title="Criterios")
-                ),
-                text=[f"ID: {idx}<br>Monto: ${monto:,.2f}" 
-                      for idx, monto in zip(self.resultados['ID_Asiento'], self.resultados['Monto_Absoluto'])],
-                hoverinfo='text',
-                name="Montos vs Criterios"
-            ),
-            row=2, col=2
-        )
-        
-        fig.update_layout(
-            height=800,
-            title_text=f"Dashboard de Auditoría HLB - Materialidad: ${self.auditoria.materialidad:,}",
-            showlegend=False,
-            template="plotly_white",
-            font=dict(color=HLB_CHARCOAL)
-        )
-        
-        return fig
+    st.write(f"**Primera carga del proceso:** {formato(resumen['primera_carga_proceso'])}")
+    for etiqueta, clave in (("Carga inicial de sesión", 'cargas_iniciales'), ("Reejecución", 'reejecuciones')):
+        datos = resumen[clave]
+        st.write(f"**{etiqueta}:** p50 {formato(datos['p50'])} · p95 {formato(datos['p95'])} ({datos['n']} mediciones)")
+
+def mostrar_filtros(cubo):
+    """Controles de filtro del dashboard; devuelve la vista filtrada del cubo"""
+    opciones = cubo.opciones()
+    nombre_corto = lambda criterio: criterio.replace('5.', '').replace('_', ' ')
     
-    def generar_reporte_ejecutivo(self):
-        """Generar reporte ejecutivo de auditoría"""
-        stats = self.estadisticas
-        
-        reporte = f"""
-INFORME EJECUTIVO DE AUDITORÍA - HLB AUDITEC
-{'='*60}
+    with st.expander("🔎 Filtrar dashboard", expanded=False):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            meses = st.multiselect("📅 Mes", opciones['meses'])
+            bandas = st.multiselect("💰 Banda de materialidad", opciones['bandas'])
+        with col2:
+            cuentas = st.multiselect("🏦 Cuenta", opciones['cuentas'])
+            riesgos = st.multiselect("🚦 Nivel de riesgo", opciones['riesgos'])
+        with col3:
+            criterios = st.multiselect("📋 Criterio", opciones['criterios'], format_func=nombre_corto)
+    
+    if not (meses or cuentas or bandas or riesgos or criterios):
+        return cubo
+    
+    vista = cubo.filtrar(meses=meses, cuentas=cuentas, bandas=bandas, criterios=criterios, riesgos=riesgos)
+    st.caption("🔎 Indicadores y gráficos filtrados; el reporte y las exportaciones incluyen todos los asientos")
+    return vista
 
-RESUMEN GENERAL:
-• Total de asientos analizados: {stats['total_asientos']:,}
-• Asientos materiales (>${self.auditoria.materialidad:,}): {stats['asientos_materiales']:,} ({stats['porcentaje_materiales']:.1f}%)
-• Asientos con múltiples criterios: {stats['asientos_multiple_criterio']:,}
-• Asientos de alto riesgo: {stats['asientos_alto_riesgo']:,}
-• Asientos críticos identificados: {stats['asientos_criticos_count']:,}
-• Monto total material: ${stats['monto_total_material']:,.2f}
+def publicar_auditoria(ref_auditoria):
+    """Reemplazar la auditoría que muestra la sesión por la indicada"""
+    anterior = st.session_state.get('ref_auditoria')
+    if anterior is not None and anterior is not ref_auditoria:
+        anterior.liberar()
+    st.session_state['ref_auditoria'] = ref_auditoria
 
-DISTRIBUCIÓN POR CRITERIO DE AUDITORÍA:
-"""
-        
-        for criterio, data in sorted(stats['criterios'].items(), 
-                                    key=lambda x: (x[1]['nivel_riesgo'] == 'alto', x[1]['count']), 
-                                    reverse=True):
-            nombre_corto = criterio.replace('5.', '').replace('_', ' ')
-            riesgo_emoji = "🔴" if data['nivel_riesgo'] == 'alto' else "🟡" if data['nivel_riesgo'] == 'medio' else "🟢"
-            reporte += f"• {riesgo_emoji} {nombre_corto}: {data['count']} asientos ({data['porcentaje']:.1f}%)\n"
-            reporte += f"  {data['descripcion']}\n"
-        
-        # Asientos más críticos
-        reporte += f"""
-ASIENTOS CRÍTICOS IDENTIFICADOS:
-• Total de asientos críticos: {len(self.asientos_criticos)}
-"""
-        
-        if len(self.asientos_criticos) > 0:
-            reporte += "• Top 10 asientos más críticos:\n"
-            for i, (idx, asiento) in enumerate(self.asientos_criticos.head(10).iterrows()):
-                criterios_aplicados = [k for k in self.auditoria.criterios_auditoria.keys() 
-                                      if asiento[k] == 1]
-                reporte += f"  {i+1}. ID {int(asiento['ID_Asiento'])}: ${asiento['Monto_Absoluto']:>12,.2f} - {asiento['Total_Criterios']} criterios\n"
-        
-        # Irregularidades detalladas
-        if self.asientos_irregulares is not None and len(self.asientos_irregulares) > 0:
-            reporte += f"""
-IRREGULARIDADES DETECTADAS:
-• Total de irregularidades: {len(self.asientos_irregulares)}
-"""
-            for criterio in self.asientos_irregulares['Criterio'].unique():
-                count = len(self.asientos_irregulares[self.asientos_irregulares['Criterio'] == criterio])
-                reporte += f"  • {criterio}: {count} irregularidades\n"
-        
-        reporte += f"""
-RECOMENDACIONES:
-1. Revisar en detalle los {len(self.asientos_criticos)} asientos críticos identificados
-2. Evaluar los {stats['asientos_multiple_criterio']} asientos con múltiples criterios
-3. Verificar transacciones en fines de semana/feriados ({stats['criterios'].get('5.7_Fines_Semana_Feriados', {}).get('count', 0)} detectadas)
-4. Investigar posibles fraudes en montos sospechosos ({stats['criterios'].get('5.10_Montos_Sospechosos', {}).get('count', 0)} detectados)
+def abrir_paquete(archivo_paquete):
+    """Publicar los resultados de un paquete exportado, sin ingesta ni auditoría"""
+    contenido = archivo_paquete.getvalue()
+    clave = hash_contenido(b'paquete', contenido)
+    # Solo al subirlo: después la sesión puede ejecutar otras auditorías
+    if st.session_state.get('paquete_abierto') == clave:
+        return
+    ref_auditoria = obtener_almacen_compartido().obtener_o_crear(
+        clave, lambda: importar_paquete(contenido)
+    )
+    publicar_auditoria(ref_auditoria)
+    st.session_state['paquete_abierto'] = clave
+    st.success(f"📦 Resultados cargados desde '{archivo_paquete.name}'")
 
-FECHA DE GENERACIÓN: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-EMPRESA: HLB Auditec Cía. Ltda.
-"""
-        
-        return reporte
+def generar_exportaciones(visualizador):
+    """Bytes de todos los archivos de la pestaña Exportar"""
+    reporte_exportacion = ReporteProgreso()
+    excel = visualizador.exportar_resultados_excel(progreso=reporte_exportacion)
+    criticos = visualizador.asientos_criticos
+    return {
+        'excel': excel,
+        'etapa_excel': reporte_exportacion.instantanea()['etapas']['exportacion'],
+        'reporte_txt': visualizador.generar_reporte_ejecutivo(),
+        'csv_criticos': criticos.to_csv(index=False) if criticos is not None else None,
+        'paquete': visualizador.exportar_paquete()
+    }
+
+def obtener_exportaciones(visualizador):
+    """Exportaciones de la auditoría publicada, o None si aún no se pidieron
+
+    Se generan con un botón y se guardan en el almacén compartido con la
+    clave de la auditoría: otras sesiones con la misma auditoría las reusan.
+    """
+    clave = hash_contenido('exportaciones', st.session_state['ref_auditoria'].clave)
+    ref_exportaciones = st.session_state.get('ref_exportaciones')
+    if ref_exportaciones is not None and ref_exportaciones.clave != clave:
+        ref_exportaciones.liberar()
+        ref_exportaciones = None
+        del st.session_state['ref_exportaciones']
+    if ref_exportaciones is None:
+        if not st.button("📦 Preparar archivos de exportación"):
+            return None
+        with st.spinner("Generando archivos de exportación..."):
+            ref_exportaciones = obtener_almacen_compartido().obtener_o_crear(
+                clave, lambda: generar_exportaciones(visualizador)
+            )
+        st.session_state['ref_exportaciones'] = ref_exportaciones
+    return ref_exportaciones.valor
+
+def mostrar_trabajo_en_curso():
+    """Mostrar el avance del trabajo en segundo plano y publicar su resultado al terminar"""
+    gestor = obtener_gestor()
+    trabajo = gestor.obtener(st.session_state['trabajo_id'])
     
-    def exportar_resultados_excel(self):
-        """Exportar todos los resultados a Excel en memoria"""
-        output = io.BytesIO()
-        
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            # Resultados detallados
-            self.resultados.to_excel(writer, sheet_name='Resultados_Detallados', index=False)
-            
-            # Asientos críticos
-            if self.asientos_criticos is not None and len(self.asientos_criticos) > 0:
-                self.asientos_criticos.to_excel(writer, sheet_name='Asientos_Criticos', index=False)
-            
-            # Irregularidades
-            if self.asientos_irregulares is not None and len(self.asientos_irregulares) > 0:
-                self.asientos_irregulares.to_excel(writer, sheet_name='Irregularidades', index=False)
-            
-            # Resumen estadístico
-            resumen_data = []
-            stats = self.estadisticas
-            
-            resumen_data.append(['PARÁMETRO', 'VALOR'])
-            resumen_data.append(['Total Asientos Analizados', stats['total_asientos']])
-            resumen_data.append(['Asientos Materiales', stats['asientos_materiales']])
-            resumen_data.append(['Porcentaje Materiales', f"{stats['porcentaje_materiales']:.1f}%"])
-            resumen_data.append(['Materialidad Aplicada', f"${self.auditoria.materialidad:,}"])
-            resumen_data.append(['Asientos Múltiples Criterios', stats['asientos_multiple_criterio']])
-            resumen_data.append(['Asientos Alto Riesgo', stats['asientos_alto_riesgo']])
-            resumen_data.append(['Asientos Críticos', stats['asientos_criticos_count']])
-            resumen_data.append(['Monto Total Material', f"${stats['monto_total_material']:,.2f}"])
-            resumen_data.append(['Monto Total', f"${stats['monto_total']:,.2f}"])
-            resumen_data.append(['', ''])
-            resumen_data.append(['CRITERIO', 'CANTIDAD', 'PORCENTAJE', 'NIVEL RIESGO', 'DESCRIPCIÓN'])
-            
-            for criterio, data in sorted(stats['criterios'].items(), 
-                                        key=lambda x: x[1]['count'], reverse=True):
-                nombre_corto = criterio.replace('5.', '').replace('_', ' ')
-                resumen_data.append([
-                    nombre_corto,
-                    data['count'],
-                    f"{data['porcentaje']:.1f}%",
-                    data['nivel_riesgo'].upper(),
-                    data['descripcion']
-                ])
-            
-            pd.DataFrame(resumen_data).to_excel(writer, sheet_name='Resumen_Ejecutivo', index=False, header=False)
-            
-            # Datos originales procesados
-            self.auditoria.df_procesado.to_excel(writer, sheet_name='Datos_Originales', index=False)
-        
-        output.seek(0)
-        return output
+    if trabajo is None:
+        del st.session_state['trabajo_id']
+        st.warning("⚠️ El trabajo de auditoría ya no está disponible")
+        return
+    
+    if trabajo.terminado:
+        del st.session_state['trabajo_id']
+        if trabajo.estado == ESTADO_COMPLETADO:
+            # La referencia pasa del trabajo a la sesión
+            ref_auditoria, trabajo.resultado = trabajo.resultado, None
+            if ref_auditoria is not None:
+                publicar_auditoria(ref_auditoria)
+                if 'ref_libro' in st.session_state:
+                    mostrar_carga(ref_auditoria.valor, st.session_state['ref_libro'].valor)
+            st.success("✅ Auditoría completada exitosamente!")
+        elif trabajo.estado == ESTADO_CANCELADO:
+            st.warning("⏹️ Auditoría cancelada")
+        elif trabajo.estado == ESTADO_ERROR:
+            st.error(f"❌ Error al ejecutar la auditoría: {str(trabajo.error)}")
+        return
+    
+    st.markdown("---")
+    st.markdown(f'<h2 class="sub-header">⏳ Auditoría en curso</h2>', unsafe_allow_html=True)
+    
+    if trabajo.estado == ESTADO_CANCELADO or trabajo.cancelacion_solicitada:
+        st.info("⏹️ Cancelando auditoría...")
+    elif trabajo.iniciado is None:
+        st.info(f"🕒 En cola: {gestor.posicion_en_cola(trabajo.id)} trabajo(s) antes del tuyo")
+    
+    instantanea = trabajo.instantanea
+    for nombre, datos in instantanea.get('etapas', {}).items():
+        if datos['terminada']:
+            st.write(f"✅ **{datos['nombre']}:** {describir_etapa(datos)}")
+        elif nombre == instantanea['etapa'] and trabajo.iniciado is not None:
+            st.progress(datos['fraccion'], text=f"🔍 {datos['nombre']}: {describir_etapa(datos)}")
+    
+    parciales = trabajo.parciales
+    if parciales:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("💰 Materiales hasta ahora", f"{parciales['asientos_materiales']:,}")
+        col2.metric("📋 Con criterios", f"{parciales['asientos_con_criterios']:,}")
+        col3.metric("⚠️ Irregularidades", f"{parciales['irregularidades']:,}")
+        
+        with st.expander("Ver conteo parcial por criterio"):
+            st.dataframe(
+                pd.DataFrame(
+                    [(criterio.replace('5.', '').replace('_', ' '), count)
+                     for criterio, count in parciales['criterios'].items()],
+                    columns=['Criterio', 'Cantidad']
+                ),
+                use_container_width=True
+            )
+    
+    if st.button("⏹️ Cancelar auditoría"):
+        gestor.cancelar(trabajo.id)
+    
+    resumen = gestor.resumen()
+    st.caption(f"Servidor: {resumen['en_curso']}/{resumen['trabajadores']} trabajadores ocupados, "
+               f"{resumen['pendientes']} trabajo(s) en cola")
+    
+    # Volver a consultar el estado en un momento (antes si el trabajo termina)
+    global _espera_sondeo
+    inicio_espera = time.perf_counter()
+    trabajo.esperar(1)
+    _espera_sondeo += time.perf_counter() - inicio_espera
+    st.rerun()
 
 # Función principal de Streamlit
 def main():
+    if 'sesion_id' not in st.session_state:
+        st.session_state['sesion_id'] = uuid.uuid4().hex
+    
     st.markdown(f'<h1 class="main-header">📊 HLB Ecuador - Dashboard de Auditoría Contable</h1>', unsafe_allow_html=True)
     
     # Sidebar para configuración
@@ -669,77 +263,166 @@ def main():
             help="Monto mínimo para considerar un asiento como material"
         )
         
+        cliente = st.text_input(
+            "🏢 Cliente (auditoría incremental)",
+            help="Si se indica, solo se auditan los asientos nuevos o modificados "
+                 "respecto de la última carga de este cliente"
+        ).strip()
+        
         st.markdown("---")
         
-        st.markdown("## 📁 Cargar Archivo")
-        uploaded_file = st.file_uploader(
-            "Selecciona tu archivo de asientos contables",
+        st.markdown("## 📁 Cargar Archivos")
+        uploaded_files = st.file_uploader(
+            "Selecciona tus archivos de asientos contables",
             type=['xlsx', 'xls', 'csv'],
-            help="Formatos soportados: Excel (.xlsx, .xls) o CSV"
+            accept_multiple_files=True,
+            help="Formatos soportados: Excel (.xlsx, .xls) o CSV. Varios archivos "
+                 "(p. ej. uno por subsidiaria) se consolidan en un solo libro"
+        )
+        todas_las_hojas = st.checkbox(
+            "Leer todas las hojas de cada Excel",
+            value=True,
+            help="Si se desmarca, solo se lee la primera hoja de cada archivo"
+        )
+        
+        archivo_paquete = st.file_uploader(
+            "📦 Abrir resultados exportados",
+            type=['zip'],
+            help="Paquete Parquet descargado desde la pestaña Exportar: se muestra "
+                 "directamente, sin volver a leer ni auditar el libro"
         )
         
         st.markdown("---")
         
         st.markdown("## 📋 Criterios de Auditoría HLB")
         with st.expander("Ver criterios aplicados"):
-            for criterio, config in SistemaAuditoriaAsientos().criterios_auditoria.items():
+            for criterio, config in CRITERIOS_AUDITORIA.items():
                 nombre_corto = criterio.replace('5.', '').replace('_', ' ')
                 riesgo_emoji = "🔴" if config.get('nivel_riesgo') == 'alto' else "🟡" if config.get('nivel_riesgo') == 'medio' else "🟢"
                 st.write(f"{riesgo_emoji} **{nombre_corto}**: {config['descripcion']}")
         
+        with st.expander("🧠 Memoria compartida del servidor"):
+            metricas = obtener_almacen_compartido().metricas()
+            st.write(f"**Residente:** {metricas['bytes_residentes'] / 1024**2:,.1f} MB "
+                     f"de {metricas['presupuesto_bytes'] / 1024**2:,.0f} MB")
+            st.write(f"**En disco:** {metricas['bytes_en_disco'] / 1024**2:,.1f} MB")
+            st.write(f"**Entradas:** {metricas['entradas']} ({metricas['referencias']} referencias)")
+            st.write(f"**Aciertos / fallos:** {metricas['aciertos']} / {metricas['fallos']}")
+            st.write(f"**Desalojos / volcados / recargas:** "
+                     f"{metricas['desalojos']} / {metricas['volcados']} / {metricas['recargas']}")
+            st.write(f"**Volcados por inactividad:** {metricas['volcados_inactividad']}")
+        
+        with st.expander("⏱️ Rendimiento de la página"):
+            mostrar_rendimiento()
+        
         st.markdown("---")
         st.markdown(f"**HLB Auditec Cía. Ltda.**")
         st.markdown(f"*Sistema de Auditoría Contable*")
     
     # Sección principal
-    if uploaded_file is not None:
+    if uploaded_files:
         try:
-            # Leer archivo
-            if uploaded_file.name.endswith('.csv'):
-                df = pd.read_csv(uploaded_file)
-            else:
-                df = pd.read_excel(uploaded_file)
+            # Leer archivos (todas las hojas en paralelo)
+            reporte = ReporteProgreso()
+            ref_libro = referenciar_libro(uploaded_files, todas_las_hojas, progreso=reporte)
+            df = ref_libro.valor
+            if 'ingesta' not in reporte.etapas:
+                # Libro ya leído (por esta u otra sesión): la etapa queda con sus filas
+                reporte.iniciar('ingesta')
+                reporte.finalizar(total=len(df))
+            
+            for omitida in df.attrs.get('partes_omitidas', []):
+                hoja = f" / hoja '{omitida['hoja']}'" if omitida['hoja'] else ""
+                st.warning(f"⚠️ Se omitió '{omitida['archivo']}'{hoja}: {omitida['motivo']}")
             
             # Mostrar vista previa
             with st.expander("👁️ Vista previa de los datos", expanded=False):
                 st.dataframe(df.head())
                 st.write(f"**Registros:** {len(df)} | **Columnas:** {len(df.columns)}")
+                partes = df.attrs.get('partes', [])
+                if len(partes) > 1:
+                    st.write("**Archivos y hojas consolidados:**")
+                    st.dataframe(pd.DataFrame(partes), hide_index=True)
             
             # Botón para ejecutar auditoría
-            if st.button("🚀 Ejecutar Auditoría Completa", type="primary"):
-                with st.spinner("Procesando datos y aplicando criterios de auditoría..."):
-                    # Inicializar sistema
-                    auditoria = SistemaAuditoriaAsientos(materialidad=materialidad)
-                    
-                    # Cargar datos
-                    df_procesado = auditoria.cargar_datos(df)
-                    
-                    # Aplicar auditoría
-                    resultados = auditoria.aplicar_auditoria()
-                    
-                    # Inicializar visualizador
-                    visualizador = VisualizadorAuditoria(auditoria)
-                    
-                    # Guardar en session state
-                    st.session_state['auditoria'] = auditoria
-                    st.session_state['visualizador'] = visualizador
-                    st.session_state['resultados'] = resultados
+            en_curso = 'trabajo_id' in st.session_state
+            if st.button("🚀 Ejecutar Auditoría Completa", type="primary", disabled=en_curso):
+                almacen = obtener_almacen_compartido()
+                clave_auditoria = hash_contenido(
+                    'auditoria', ref_libro.clave, cliente,
+                    version_criterios(SistemaAuditoriaAsientos(materialidad=materialidad))
+                )
+                ref_existente = almacen.buscar(clave_auditoria)
+                
+                if ref_existente is not None:
+                    # Otra sesión ya auditó este archivo con la misma configuración
+                    publicar_auditoria(ref_existente)
+                    st.success("✅ Resultados recuperados de una auditoría previa del mismo archivo")
+                else:
+                    # Cargar datos y aplicar auditoría en segundo plano
+                    def ejecutar(trabajo, df=df, materialidad=materialidad, reporte=reporte, cliente=cliente):
+                        reporte.destino = trabajo.reportar
+                        auditoria = SistemaAuditoriaAsientos(materialidad=materialidad)
+                        auditoria.cargar_datos(df, progreso=reporte)
+                        trabajo.verificar_cancelacion()
+                        if cliente:
+                            auditar_incremental(
+                                auditoria, cliente, obtener_almacen(),
+                                progreso=reporte,
+                                cancelacion=trabajo.verificar_cancelacion
+                            )
+                        else:
+                            auditoria.aplicar_auditoria(
+                                progreso=reporte,
+                                cancelacion=trabajo.verificar_cancelacion
+                            )
+                        return almacen.guardar(clave_auditoria, auditoria)
                     
-                    st.success("✅ Análisis completado!")
+                    trabajo = obtener_gestor().enviar(st.session_state['sesion_id'], ejecutar)
+                    st.session_state['trabajo_id'] = trabajo.id
+                    st.info("🔍 Aplicando criterios de auditoría...")
         
         except Exception as e:
-            st.error(f"❌ Error al procesar el archivo: {str(e)}")
+            st.error(f"❌ Error al procesar los archivos: {str(e)}")
             st.info("Asegúrate de que el archivo tenga el formato correcto con columnas como 'Suma de Debe', 'Fecha', etc.")
     
+    if archivo_paquete is not None:
+        try:
+            abrir_paquete(archivo_paquete)
+        except Exception as e:
+            st.error(f"❌ No se pudo abrir el paquete: {str(e)}")
+    
+    # Seguimiento de la auditoría en segundo plano
+    if 'trabajo_id' in st.session_state:
+        mostrar_trabajo_en_curso()
+    
     # Mostrar resultados si existen
-    if 'auditoria' in st.session_state:
-        auditoria = st.session_state['auditoria']
-        visualizador = st.session_state['visualizador']
-        resultados = st.session_state['resultados']
+    if 'ref_auditoria' in st.session_state:
+        auditoria = st.session_state['ref_auditoria'].valor
+        visualizador = VisualizadorAuditoria(auditoria)
+        resultados = auditoria.resultados
         
         st.markdown("---")
         st.markdown(f'<h2 class="sub-header">📈 Resultados del Análisis HLB</h2>', unsafe_allow_html=True)
         
+        if auditoria.resumen_delta is not None:
+            delta = auditoria.resumen_delta
+            if delta['carga_previa']:
+                st.info(f"🔁 Auditoría incremental de **{delta['cliente']}**: "
+                        f"{delta['nuevos']:,} asientos nuevos o modificados auditados, "
+                        f"{delta['reutilizados']:,} reutilizados de la carga anterior "
+                        f"({delta.get('atipicos_reevaluados', 0):,} con el criterio 5.12 recalculado "
+                        f"por cambios en el historial de su cuenta), "
+                        f"{delta['eliminados']:,} ya no presentes")
+            else:
+                st.info(f"🆕 Primera carga de **{delta['cliente']}**: se auditaron todos los asientos "
+                        f"y quedaron guardados para la próxima auditoría incremental")
+        
+        # Filtros sobre el cubo de agregados
+        cubo = visualizador.obtener_cubo()
+        vista = mostrar_filtros(cubo)
+        kpis = vista.kpis()
+        
         # Métricas principales con estilo HLB
         col1, col2, col3, col4 = st.columns(4)
         
@@ -750,7 +433,7 @@ def main():
                     📊 Total Asientos
                 </div>
                 <div style="font-size: 1.8rem; font-weight: bold; color: {HLB_BLUE};">
-                    {auditoria.estadisticas['total_asientos']:,}
+                    {kpis['total_asientos']:,}
                 </div>
             </div>
             """, unsafe_allow_html=True)
@@ -762,10 +445,10 @@ def main():
                     💰 Asientos Materiales
                 </div>
                 <div style="font-size: 1.8rem; font-weight: bold; color: {HLB_LIGHT_BLUE};">
-                    {auditoria.estadisticas['asientos_materiales']:,}
+                    {kpis['asientos_materiales']:,}
                 </div>
                 <div style="font-size: 0.8rem; color: {HLB_CHARCOAL};">
-                    ({auditoria.estadisticas['porcentaje_materiales']:.1f}%)
+                    ({kpis['porcentaje_materiales']:.1f}%)
                 </div>
             </div>
             """, unsafe_allow_html=True)
@@ -777,7 +460,7 @@ def main():
                     ⚠️ Asientos Críticos
                 </div>
                 <div style="font-size: 1.8rem; font-weight: bold; color: {HLB_GOLD};">
-                    {auditoria.estadisticas['asientos_criticos_count']:,}
+                    {kpis['asientos_criticos_count']:,}
                 </div>
                 <div style="font-size: 0.8rem; color: {HLB_CHARCOAL};">
                     Requieren revisión
@@ -786,7 +469,7 @@ def main():
             """, unsafe_allow_html=True)
         
         with col4:
-            riesgo_count = auditoria.estadisticas.get('asientos_alto_riesgo', 0)
+            riesgo_count = kpis['asientos_alto_riesgo']
             color_riesgo = HLB_GOLD if riesgo_count > 0 else HLB_LIGHT_BLUE
             texto_riesgo = "⚠️ Atención" if riesgo_count > 0 else "✅ OK"
             
@@ -806,7 +489,7 @@ def main():
         
         # Dashboard interactivo
         st.markdown("### 📊 Dashboard Interactivo HLB")
-        fig = visualizador.crear_dashboard_principal()
+        fig = visualizador.crear_dashboard_principal(vista)
         st.plotly_chart(fig, use_container_width=True)
         
         # Tabs para diferentes vistas
@@ -833,6 +516,7 @@ def main():
                 })
             
             criterios_df = pd.DataFrame(criterios_data)
+            import plotly.express as px
             fig_criterios = px.bar(
                 criterios_df.sort_values('Cantidad', ascending=True), 
                 x='Cantidad', 
@@ -909,6 +593,7 @@ def main():
                 irregularidades_por_criterio = visualizador.asientos_irregulares.groupby(
                     'Criterio').size().reset_index(name='Cantidad')
                 
+                import plotly.express as px
                 fig_irregularidades = px.bar(
                     irregularidades_por_criterio,
                     x='Criterio',
@@ -930,46 +615,57 @@ def main():
         with tab4:
             st.markdown("### 📥 Exportar Resultados HLB")
             
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                # Exportar a Excel
-                excel_data = visualizador.exportar_resultados_excel()
-                
-                st.download_button(
-                    label="📊 Descargar Reporte Completo (Excel)",
-                    data=excel_data,
-                    file_name=f"HLB_auditoria_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
-                
-                st.info("El archivo Excel contiene:\n"
-                       "1. Resultados detallados\n"
-                       "2. Asientos críticos\n"
-                       "3. Irregularidades\n"
-                       "4. Resumen ejecutivo\n"
-                       "5. Datos originales")
-            
-            with col2:
-                # Exportar reporte ejecutivo como TXT
-                reporte_txt = visualizador.generar_reporte_ejecutivo()
+            # Los archivos se generan al pedirlos, una vez por auditoría: filtrar no los reconstruye
+            exportaciones = obtener_exportaciones(visualizador)
+            if exportaciones is None:
+                st.info("Los archivos de exportación se generan al solicitarlos y quedan "
+                        "disponibles para esta auditoría.")
+            else:
+                col1, col2 = st.columns(2)
                 
-                st.download_button(
-                    label="📄 Descargar Reporte Ejecutivo (TXT)",
-                    data=reporte_txt,
-                    file_name=f"HLB_reporte_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
-                    mime="text/plain"
-                )
+                with col1:
+                    # Exportar a Excel
+                    st.download_button(
+                        label="📊 Descargar Reporte Completo (Excel)",
+                        data=exportaciones['excel'],
+                        file_name=f"HLB_auditoria_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    )
+                    
+                    st.info("El archivo Excel contiene:\n"
+                           "1. Resultados detallados\n"
+                           "2. Asientos críticos\n"
+                           "3. Irregularidades\n"
+                           "4. Resumen ejecutivo\n"
+                           "5. Datos originales")
+                    st.caption(f"Exportación: {describir_etapa(exportaciones['etapa_excel'])}")
                 
-                # Exportar asientos críticos como CSV
-                if visualizador.asientos_criticos is not None:
-                    csv_criticos = visualizador.asientos_criticos.to_csv(index=False)
+                with col2:
+                    # Exportar reporte ejecutivo como TXT
+                    st.download_button(
+                        label="📄 Descargar Reporte Ejecutivo (TXT)",
+                        data=exportaciones['reporte_txt'],
+                        file_name=f"HLB_reporte_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
+                        mime="text/plain"
+                    )
+                    
+                    # Exportar asientos críticos como CSV
+                    if exportaciones['csv_criticos'] is not None:
+                        st.download_button(
+                            label="⚠️ Descargar Asientos Críticos (CSV)",
+                            data=exportaciones['csv_criticos'],
+                            file_name=f"HLB_criticos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+                            mime="text/csv"
+                        )
                     
+                    # Exportar paquete columnar (Parquet) para BI y archivo
                     st.download_button(
-                        label="⚠️ Descargar Asientos Críticos (CSV)",
-                        data=csv_criticos,
-                        file_name=f"HLB_criticos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        mime="text/csv"
+                        label="📦 Descargar Paquete de Resultados (Parquet)",
+                        data=exportaciones['paquete'],
+                        file_name=f"HLB_paquete_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                        mime="application/zip",
+                        help="Resultados, irregularidades, libro procesado y estadísticas; "
+                             "se puede volver a abrir en este dashboard"
                     )
     
     else:
@@ -1002,4 +698,9 @@ def main():
             """, unsafe_allow_html=True)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    carga_inicial = not st.session_state.get('pagina_cargada', False)
+    st.session_state['pagina_cargada'] = True
+    try:
+        main()
+    finally:
+        registrar_ejecucion(time.perf_counter() - _inicio_ejecucion - _espera_sondeo, inicial=carga_inicial)
\ No newline at end of file
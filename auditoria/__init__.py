@@ -0,0 +1 @@
+"""Componentes del sistema de auditoría contable HLB."""
@@ -0,0 +1,78 @@
+"""Montos atípicos por cuenta: mediana y MAD móviles sobre el historial de cada cuenta.
+
+Los asientos se ordenan por cuenta y fecha y cada uno se compara con los
+`ventana` asientos anteriores de su misma cuenta. Las ventanas móviles de
+todas las cuentas se calculan en una sola pasada sobre el arreglo ordenado,
+con límites por fila que no cruzan de una cuenta a otra, sin recorrer las
+cuentas una por una.
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.indexers import BaseIndexer
+
+# Factor que hace la MAD comparable con la desviación estándar (distribución normal)
+FACTOR_MAD = 0.6745
+
+
+class _VentanaPorCuenta(BaseIndexer):
+    """Ventana móvil con inicio y fin precalculados para cada fila"""
+
+    def get_window_bounds(self, num_values=0, min_periods=None, center=None, closed=None, step=None):
+        return self.inicio, self.fin
+
+
+def detectar_atipicos(cuentas, fechas, centavos, ventana=30, minimo_observaciones=10,
+                      umbral=3.5, dispersion_minima=0.01):
+    """Marcar montos muy por encima de lo habitual en su cuenta
+
+    Para cada asiento se toma la mediana de los `ventana` montos anteriores
+    de la misma cuenta y la MAD (mediana de las desviaciones absolutas de esos
+    montos respecto de su propia mediana móvil). El puntaje robusto es
+    0.6745 * (monto - mediana) / MAD; la MAD no baja de `dispersion_minima`
+    veces la mediana para que cuentas con montos casi constantes no marquen
+    diferencias mínimas. Se evalúan los asientos cuya cuenta ya tiene
+    `minimo_observaciones` anteriores con mediana calculada (la MAD también
+    exige ese mínimo de desviaciones).
+
+    Devuelve un DataFrame alineado por posición con las entradas, con las
+    columnas 'Atipico', 'Mediana' (centavos) y 'Puntaje'.
+    """
+    montos = np.asarray(centavos, dtype='float64')
+    total = len(montos)
+    if total == 0:
+        return pd.DataFrame({'Atipico': np.array([], dtype=bool), 'Mediana': [], 'Puntaje': []})
+    codigos = pd.factorize(pd.Series(cuentas), sort=False)[0]
+
+    # Fechas faltantes al final de cada cuenta; a igual fecha se mantiene el orden del libro
+    instantes = pd.Series(fechas).to_numpy(dtype='datetime64[ns]').view(np.int64).copy()
+    instantes[pd.isna(pd.Series(fechas)).to_numpy()] = np.iinfo(np.int64).max
+    orden = np.lexsort((np.arange(total), instantes, codigos))
+
+    codigos_ordenados = codigos[orden]
+    montos_ordenados = montos[orden]
+    posicion = np.arange(total, dtype=np.int64)
+    nueva_cuenta = np.r_[True, codigos_ordenados[1:] != codigos_ordenados[:-1]]
+    inicio_cuenta = np.maximum.accumulate(np.where(nueva_cuenta, posicion, 0))
+
+    # Solo asientos anteriores de la misma cuenta (el propio asiento queda fuera)
+    indexador = _VentanaPorCuenta(
+        inicio=np.maximum(posicion - ventana, inicio_cuenta),
+        fin=posicion
+    )
+    mediana = pd.Series(montos_ordenados).rolling(indexador, min_periods=minimo_observaciones).median().to_numpy()
+    desviacion = np.abs(montos_ordenados - mediana)
+    mad = pd.Series(desviacion).rolling(indexador, min_periods=minimo_observaciones).median().to_numpy()
+
+    escala = np.maximum(mad, np.abs(mediana) * dispersion_minima)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        puntaje = FACTOR_MAD * (montos_ordenados - mediana) / escala
+    atipico = (codigos_ordenados >= 0) & (escala > 0) & (puntaje > umbral)
+
+    resultado = pd.DataFrame({
+        'Atipico': atipico,
+        'Mediana': mediana,
+        'Puntaje': puntaje
+    })
+    desordenar = np.empty(total, dtype=np.int64)
+    desordenar[orden] = posicion
+    return resultado.iloc[desordenar].reset_index(drop=True)
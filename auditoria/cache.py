@@ -0,0 +1,577 @@
+"""Almacén compartido entre sesiones para libros y resultados de auditoría.
+
+Las sesiones de Streamlit no guardan los DataFrames en `st.session_state`
+sino una `Referencia` a una entrada de este almacén, identificada por el hash
+del contenido. Varias sesiones que abren el mismo archivo comparten así una
+sola copia en memoria. El almacén respeta un presupuesto global de memoria:
+cuando se supera, las entradas menos usadas recientemente se descartan (si
+ninguna sesión las usa) o se vuelcan a disco y se recargan al volver a
+pedirlas. Las entradas sin uso durante un tiempo también se vuelcan (o se
+descartan si ninguna sesión las referencia), para que las sesiones inactivas
+casi no ocupen memoria ni disco.
+
+Los DataFrames se vuelcan como archivos Arrow IPC sin comprimir y se
+recargan mapeándolos en memoria: las columnas numéricas y de fechas quedan
+como vistas de solo lectura sobre el archivo (sin copia) y el sistema
+operativo puede liberar esas páginas cuando las necesita. Las columnas de
+texto se reconstruyen como objetos de Python (una copia) salvo con pandas 3,
+que las conserva en Arrow.
+"""
+import hashlib
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+PRESUPUESTO_MB = int(os.environ.get('HLB_AUDITORIA_MEMORIA_MB', 1024))
+
+# Segundos sin uso tras los cuales una entrada se vuelca a disco (0 desactiva)
+INACTIVIDAD_S = float(os.environ.get('HLB_AUDITORIA_INACTIVIDAD_S', 300))
+
+DIRECTORIO_VOLCADO = os.environ.get(
+    'HLB_AUDITORIA_VOLCADO_DIR',
+    os.path.join(tempfile.gettempdir(), 'hlb_auditoria_cache')
+)
+
+
+def hash_contenido(*partes):
+    """Clave estable a partir de bytes o valores simples"""
+    h = hashlib.sha256()
+    for parte in partes:
+        if not isinstance(parte, bytes):
+            parte = repr(parte).encode('utf-8')
+        h.update(len(parte).to_bytes(8, 'little'))
+        h.update(parte)
+    return h.hexdigest()
+
+
+def estimar_tamano(valor):
+    """Bytes aproximados de un DataFrame, de un diccionario o de un objeto con sus atributos
+
+    Se recorren los atributos anidados (p. ej. el cubo de una auditoría) y la
+    memoria que comparten varios DataFrames del mismo objeto, como un libro y
+    su copia superficial procesada, se cuenta una sola vez.
+    """
+    return _estimar(valor, set(), set())
+
+
+def _estimar(valor, vistos, memorias):
+    if id(valor) in vistos:
+        return 0
+    vistos.add(id(valor))
+    if isinstance(valor, pd.DataFrame):
+        return _memoria_indice(valor.index, memorias) + sum(
+            _memoria_columna(valor.iloc[:, i], memorias) for i in range(valor.shape[1])
+        )
+    if isinstance(valor, pd.Series):
+        return _memoria_indice(valor.index, memorias) + _memoria_columna(valor, memorias)
+    if isinstance(valor, np.ndarray):
+        return _memoria_arreglo(valor, memorias)
+    if isinstance(valor, dict):
+        return sum(_estimar(v, vistos, memorias) for v in valor.values()) + sys.getsizeof(valor)
+    if hasattr(valor, '__dict__') and not isinstance(valor, type):
+        return sum(_estimar(v, vistos, memorias) for v in vars(valor).values()) + sys.getsizeof(valor)
+    return sys.getsizeof(valor)
+
+
+def _memoria_arreglo(arreglo, memorias):
+    clave = (arreglo.__array_interface__['data'][0], arreglo.nbytes)
+    if clave in memorias:
+        return 0
+    memorias.add(clave)
+    return int(arreglo.nbytes)
+
+
+def _memoria_columna(serie, memorias):
+    # Las columnas numpy se identifican por su memoria (las vistas de una copia
+    # superficial la comparten); las de extensión, por el arreglo que las guarda
+    if isinstance(serie.dtype, np.dtype):
+        valores = serie.to_numpy()
+        clave = (valores.__array_interface__['data'][0], valores.nbytes)
+    else:
+        clave = id(serie.array)
+    if clave in memorias:
+        return 0
+    memorias.add(clave)
+    return int(serie.memory_usage(deep=True, index=False))
+
+
+def _memoria_indice(indice, memorias):
+    if id(indice) in memorias:
+        return 0
+    memorias.add(id(indice))
+    return int(indice.memory_usage(deep=True))
+
+
+def _firma(valor):
+    """Identidad de los atributos de `valor`: cambia si se le agrega o reemplaza alguno"""
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return None
+    if isinstance(valor, dict):
+        return tuple(map(id, valor.values()))
+    if hasattr(valor, '__dict__'):
+        return tuple(map(id, vars(valor).values()))
+    return None
+
+
+# ==============================================
+# VOLCADO A DISCO (ARROW IPC + PICKLE)
+# ==============================================
+class _TablaVolcada:
+    """Marcador de un DataFrame volcado a un archivo Arrow
+
+    `posiciones_arrow` son las columnas guardadas en el archivo; las demás
+    viajan en `columnas_pickle`, en el orden de `posiciones_pickle`.
+    """
+
+    def __init__(self, archivo, posiciones_arrow, columnas_pickle, posiciones_pickle, orden_columnas, attrs):
+        self.archivo = archivo
+        self.posiciones_arrow = posiciones_arrow
+        self.columnas_pickle = columnas_pickle
+        self.posiciones_pickle = posiciones_pickle
+        self.orden_columnas = orden_columnas
+        self.attrs = attrs
+
+
+def _columna_arrow(serie):
+    """True si la columna pasa a Arrow y vuelve igual (sin diccionarios, listas ni tipos mixtos)"""
+    if serie.dtype != object:
+        return True
+    return pd.api.types.infer_dtype(serie, skipna=True) in ('string', 'empty')
+
+
+def _volcar_tabla(df, directorio, nombre):
+    import pyarrow as pa
+
+    # Arrow solo admite nombres de columna de texto y sin repetir
+    posiciones_arrow = [] if df.columns.has_duplicates else [
+        i for i, c in enumerate(df.columns) if isinstance(c, str) and _columna_arrow(df.iloc[:, i])
+    ]
+    posiciones_pickle = [i for i in range(len(df.columns)) if i not in set(posiciones_arrow)]
+    tabla = pa.Table.from_pandas(df.iloc[:, posiciones_arrow])
+    archivo = f'{nombre}.arrow'
+    with pa.OSFile(os.path.join(directorio, archivo), 'wb') as f:
+        with pa.ipc.new_file(f, tabla.schema) as escritor:
+            escritor.write_table(tabla)
+    # Las columnas que Arrow no representa fielmente viajan en el pickle del marcador
+    return _TablaVolcada(
+        archivo, posiciones_arrow,
+        df.iloc[:, posiciones_pickle] if posiciones_pickle else None, posiciones_pickle,
+        list(df.columns), dict(df.attrs)
+    )
+
+
+def _cargar_tabla(marcador, directorio):
+    import pyarrow as pa
+
+    mapa = pa.memory_map(os.path.join(directorio, marcador.archivo), 'r')
+    df = pa.ipc.open_file(mapa).read_all().to_pandas(split_blocks=True)
+    if marcador.columnas_pickle is not None:
+        # Armar el DataFrame columna a columna, por posición, sin consolidar
+        # bloques (una selección `df[orden]` copiaría todas las columnas)
+        columnas = {}
+        for i, posicion in enumerate(marcador.posiciones_arrow):
+            columnas[posicion] = df.iloc[:, i]
+        for i, posicion in enumerate(marcador.posiciones_pickle):
+            columnas[posicion] = marcador.columnas_pickle.iloc[:, i]
+        df = pd.DataFrame({p: columnas[p] for p in range(len(columnas))}, index=df.index, copy=False)
+        df.columns = pd.Index(marcador.orden_columnas)
+    df.attrs.update(marcador.attrs)
+    return df
+
+
+def _escribir_volcado(valor, directorio):
+    """Volcar `valor` a `directorio`: sus DataFrames en Arrow y el resto en pickle"""
+    os.makedirs(directorio, exist_ok=True)
+    if isinstance(valor, pd.DataFrame):
+        esqueleto = _volcar_tabla(valor, directorio, 'valor')
+    elif hasattr(valor, '__dict__'):
+        esqueleto = object.__new__(type(valor))
+        for atributo, v in vars(valor).items():
+            if isinstance(v, pd.DataFrame):
+                v = _volcar_tabla(v, directorio, atributo)
+            esqueleto.__dict__[atributo] = v
+    else:
+        esqueleto = valor
+    with open(os.path.join(directorio, 'objeto.pkl.tmp'), 'wb') as f:
+        pickle.dump(esqueleto, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(os.path.join(directorio, 'objeto.pkl.tmp'), os.path.join(directorio, 'objeto.pkl'))
+
+
+def _leer_volcado(directorio):
+    with open(os.path.join(directorio, 'objeto.pkl'), 'rb') as f:
+        valor = pickle.load(f)
+    if isinstance(valor, _TablaVolcada):
+        return _cargar_tabla(valor, directorio)
+    if hasattr(valor, '__dict__'):
+        for atributo, v in list(vars(valor).items()):
+            if isinstance(v, _TablaVolcada):
+                valor.__dict__[atributo] = _cargar_tabla(v, directorio)
+    return valor
+
+
+# ==============================================
+# ALMACÉN
+# ==============================================
+class _Entrada:
+    __slots__ = ('clave', 'valor', 'tamano', 'firma', 'referencias', 'ruta_volcado', 'ultimo_uso',
+                 'debil', 'en_transito', 'bloqueo')
+
+    def __init__(self, clave, valor, tamano):
+        self.clave = clave
+        self.valor = valor
+        self.tamano = tamano
+        # Atributos con los que se estimó `tamano` (ver `_firma`)
+        self.firma = _firma(valor)
+        self.referencias = 0
+        self.ruta_volcado = None
+        self.ultimo_uso = time.monotonic()
+        # Tras volcarla, referencia débil al objeto que alguna sesión aún puede estar usando
+        self.debil = None
+        # Volcado o recarga en curso; `bloqueo` se mantiene tomado mientras dura la E/S
+        self.en_transito = False
+        self.bloqueo = threading.Lock()
+
+    @property
+    def residente(self):
+        return self.valor is not None or (self.debil is not None and self.debil() is not None)
+
+    @property
+    def prestada(self):
+        """True si algún objeto fuera del almacén usa el valor en memoria"""
+        if self.valor is None:
+            # Volcada pero todavía viva: la sostiene quien la tomó
+            return self.residente
+        # Las dos referencias propias son este atributo y el argumento de getrefcount
+        return sys.getrefcount(self.valor) > 2
+
+
+class Referencia:
+    """Manejador que guarda una sesión en lugar del objeto compartido
+
+    Mientras exista la referencia la entrada no se descarta (aunque sí puede
+    volcarse a disco). Se libera explícitamente con `liberar` o cuando el
+    objeto se recolecta al terminar la sesión.
+    """
+
+    def __init__(self, almacen, clave):
+        self.almacen = almacen
+        self.clave = clave
+        self._finalizador = weakref.finalize(self, almacen._liberar, clave)
+
+    @property
+    def valor(self):
+        return self.almacen._obtener(self.clave)
+
+    def liberar(self):
+        self._finalizador()
+
+
+class AlmacenCompartido:
+    """Almacén por proceso con conteo de referencias, LRU y volcado a disco
+
+    El lock global solo protege el índice de entradas: escribir un volcado o
+    recargarlo se hace fuera de él, con la entrada marcada `en_transito`, para
+    que un volcado grande no detenga las consultas de las demás sesiones. Solo
+    se vuelcan las entradas que nadie está usando en ese momento; si aun así
+    se pide una entrada volcada cuyo objeto sigue vivo, se recupera ese mismo
+    objeto en lugar de cargar una segunda copia.
+    """
+
+    def __init__(self, presupuesto_bytes=PRESUPUESTO_MB * 1024 * 1024, directorio=DIRECTORIO_VOLCADO,
+                 inactividad_s=INACTIVIDAD_S):
+        self.presupuesto_bytes = presupuesto_bytes
+        self.directorio = directorio
+        self.inactividad_s = inactividad_s
+        self._entradas = OrderedDict()
+        self._lock = threading.RLock()
+        self._creando = {}
+        self._metricas = {
+            'aciertos': 0,
+            'fallos': 0,
+            'desalojos': 0,
+            'volcados': 0,
+            'volcados_inactividad': 0,
+            'recargas': 0
+        }
+        if inactividad_s > 0:
+            vigilante = threading.Thread(target=self._vigilar_inactividad, name='almacen-inactividad', daemon=True)
+            vigilante.start()
+
+    def obtener_o_crear(self, clave, fabrica):
+        """Referencia a la entrada `clave`; si no existe se crea con `fabrica()`
+
+        Si varias sesiones piden la misma clave a la vez, `fabrica` se ejecuta
+        una sola vez y las demás esperan su resultado.
+        """
+        with self._lock:
+            if clave in self._entradas:
+                self._metricas['aciertos'] += 1
+                return self._referenciar(clave)
+            lock_clave = self._creando.setdefault(clave, threading.Lock())
+
+        with lock_clave:
+            with self._lock:
+                if clave in self._entradas:
+                    self._metricas['aciertos'] += 1
+                    return self._referenciar(clave)
+                self._metricas['fallos'] += 1
+            try:
+                valor = fabrica()
+            finally:
+                with self._lock:
+                    self._creando.pop(clave, None)
+            return self.guardar(clave, valor)
+
+    def buscar(self, clave):
+        """Referencia a una entrada existente o None (cuenta como acierto o fallo)"""
+        with self._lock:
+            if clave not in self._entradas:
+                self._metricas['fallos'] += 1
+                return None
+            self._metricas['aciertos'] += 1
+            return self._referenciar(clave)
+
+    def guardar(self, clave, valor):
+        """Registrar un valor inmutable y devolver una referencia a él"""
+        tamano = estimar_tamano(valor)
+        with self._lock:
+            if clave not in self._entradas:
+                self._entradas[clave] = _Entrada(clave, valor, tamano)
+            referencia = self._referenciar(clave)
+            liberacion = self._ajustar_presupuesto(proteger=clave)
+        self._completar(liberacion)
+        return referencia
+
+    def metricas(self):
+        with self._lock:
+            residentes = [e for e in self._entradas.values() if e.residente]
+            return {
+                **self._metricas,
+                'entradas': len(self._entradas),
+                'entradas_residentes': len(residentes),
+                'bytes_residentes': sum(e.tamano for e in residentes),
+                'bytes_en_disco': sum(e.tamano for e in self._entradas.values() if not e.residente),
+                'referencias': sum(e.referencias for e in self._entradas.values()),
+                'presupuesto_bytes': self.presupuesto_bytes
+            }
+
+    def volcar_inactivas(self, ahora=None):
+        """Liberar las entradas sin uso desde hace `inactividad_s` segundos
+
+        Las que alguna sesión referencia se vuelcan a disco; las que nadie
+        referencia se descartan, estén en memoria o ya volcadas, para que el
+        directorio de volcado no crezca sin límite.
+        """
+        ahora = time.monotonic() if ahora is None else ahora
+        volcar, borrar = [], []
+        with self._lock:
+            for entrada in list(self._entradas.values()):
+                if ahora - entrada.ultimo_uso < self.inactividad_s or entrada.en_transito:
+                    continue
+                if entrada.referencias <= 0:
+                    borrar.extend(self._descartar(entrada))
+                elif entrada.valor is not None and not entrada.prestada:
+                    volcar.append(self._marcar_volcado(entrada))
+        self._completar((volcar, borrar), inactividad=True)
+
+    # --- Uso interno ---
+    def _vigilar_inactividad(self):
+        while True:
+            time.sleep(max(self.inactividad_s / 2, 1))
+            self.volcar_inactivas()
+
+    def _referenciar(self, clave):
+        entrada = self._entradas[clave]
+        entrada.referencias += 1
+        entrada.ultimo_uso = time.monotonic()
+        self._entradas.move_to_end(clave)
+        return Referencia(self, clave)
+
+    def _obtener(self, clave):
+        while True:
+            with self._lock:
+                entrada = self._entradas[clave]
+                entrada.ultimo_uso = time.monotonic()
+                self._entradas.move_to_end(clave)
+                if entrada.valor is None and entrada.debil is not None:
+                    # Volcada mientras una sesión la usaba: se recupera el mismo objeto
+                    entrada.valor = entrada.debil()
+                valor = entrada.valor
+                if valor is not None and _firma(valor) == entrada.firma:
+                    return valor
+                if valor is not None:
+                    break
+                if not entrada.en_transito:
+                    entrada.en_transito = True
+                    entrada.bloqueo.acquire()
+                    break
+                bloqueo = entrada.bloqueo
+            # Otra sesión la está volcando o recargando: esperar a que termine
+            with bloqueo:
+                pass
+
+        if valor is not None:
+            # Se le agregaron atributos (p. ej. el ranking de críticos, que se
+            # arma al pedirlo) desde la última estimación
+            self._reestimar(entrada, valor)
+            return valor
+
+        try:
+            valor = _leer_volcado(entrada.ruta_volcado)
+        except BaseException:
+            with self._lock:
+                self._terminar_transito(entrada)
+            raise
+        with self._lock:
+            self._terminar_transito(entrada)
+            if self._entradas.get(clave) is not entrada:
+                # Se descartó mientras se leía: el valor sirve a quien lo pidió
+                liberacion = ([], [entrada.ruta_volcado])
+            else:
+                entrada.valor = valor
+                entrada.firma = _firma(valor)
+                entrada.debil = None
+                self._metricas['recargas'] += 1
+                liberacion = self._ajustar_presupuesto(proteger=clave)
+        self._completar(liberacion)
+        return valor
+
+    def _reestimar(self, entrada, valor):
+        firma = _firma(valor)
+        tamano = estimar_tamano(valor)
+        with self._lock:
+            if self._entradas.get(entrada.clave) is not entrada:
+                return
+            entrada.tamano = tamano
+            entrada.firma = firma
+            liberacion = self._ajustar_presupuesto(proteger=entrada.clave)
+        self._completar(liberacion)
+
+    def _liberar(self, clave):
+        borrar = []
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return
+            entrada.referencias -= 1
+            if entrada.referencias <= 0 and not entrada.residente:
+                # Nadie la usa y ya no está en memoria: no vale la pena conservarla
+                borrar = self._descartar(entrada)
+        self._borrar_volcados(borrar)
+
+    def _descartar(self, entrada):
+        """Quitar la entrada del índice (con el lock); devuelve los directorios a borrar"""
+        self._entradas.pop(entrada.clave, None)
+        entrada.valor = None
+        entrada.debil = None
+        self._metricas['desalojos'] += 1
+        # Con E/S en curso, quien la hace borra el directorio al terminar
+        if entrada.ruta_volcado is None or entrada.en_transito:
+            return []
+        return [entrada.ruta_volcado]
+
+    def _marcar_volcado(self, entrada):
+        """Reservar la entrada para volcarla fuera del lock (con el lock)"""
+        entrada.en_transito = True
+        entrada.bloqueo.acquire()
+        return entrada, entrada.valor
+
+    def _terminar_transito(self, entrada):
+        entrada.en_transito = False
+        entrada.bloqueo.release()
+
+    def _volcar(self, entrada, valor):
+        """Escribir el volcado sin el lock y soltar la copia en memoria"""
+        ruta = entrada.ruta_volcado or os.path.join(self.directorio, entrada.clave)
+        try:
+            # Los valores son inmutables: si ya se volcó una vez basta con soltar la copia en memoria
+            if entrada.ruta_volcado is None:
+                _escribir_volcado(valor, ruta)
+        except BaseException:
+            shutil.rmtree(ruta, ignore_errors=True)
+            with self._lock:
+                self._terminar_transito(entrada)
+            raise
+        with self._lock:
+            self._terminar_transito(entrada)
+            if self._entradas.get(entrada.clave) is not entrada:
+                # Se descartó mientras se escribía
+                borrar = [ruta]
+            else:
+                borrar = []
+                entrada.ruta_volcado = ruta
+                entrada.valor = None
+                try:
+                    entrada.debil = weakref.ref(valor)
+                except TypeError:
+                    entrada.debil = None
+                self._metricas['volcados'] += 1
+        self._borrar_volcados(borrar)
+        return not borrar
+
+    def _ajustar_presupuesto(self, proteger=None):
+        """Elegir, en orden LRU, qué liberar para quedar dentro del presupuesto (con el lock)
+
+        Devuelve (entradas a volcar, directorios a borrar) para `_completar`
+        fuera del lock. Las entradas en uso por alguna sesión no se vuelcan:
+        volcarlas no liberaría su memoria.
+        """
+        volcar, borrar = [], []
+        residentes = sum(e.tamano for e in self._entradas.values() if e.residente)
+        for entrada in list(self._entradas.values()):
+            if residentes <= self.presupuesto_bytes:
+                break
+            if entrada.valor is None or entrada.clave == proteger or entrada.en_transito:
+                continue
+            if entrada.referencias <= 0:
+                borrar.extend(self._descartar(entrada))
+            elif entrada.prestada:
+                continue
+            else:
+                volcar.append(self._marcar_volcado(entrada))
+            residentes -= entrada.tamano
+        return volcar, borrar
+
+    def _completar(self, liberacion, inactividad=False):
+        """Hacer fuera del lock la E/S elegida por `_ajustar_presupuesto` o `volcar_inactivas`"""
+        volcar, borrar = liberacion
+        self._borrar_volcados(borrar)
+        for i, (entrada, valor) in enumerate(volcar):
+            try:
+                volcada = self._volcar(entrada, valor)
+            except BaseException:
+                # Liberar las reservas que quedan antes de propagar el error
+                with self._lock:
+                    for pendiente, _ in volcar[i + 1:]:
+                        self._terminar_transito(pendiente)
+                raise
+            if volcada and inactividad:
+                with self._lock:
+                    self._metricas['volcados_inactividad'] += 1
+
+    @staticmethod
+    def _borrar_volcados(rutas):
+        for ruta in rutas:
+            shutil.rmtree(ruta, ignore_errors=True)
+
+
+_almacen = None
+_almacen_lock = threading.Lock()
+
+
+def obtener_almacen_compartido():
+    """Almacén único por proceso, compartido entre todas las sesiones de Streamlit"""
+    global _almacen
+    with _almacen_lock:
+        if _almacen is None:
+            _almacen = AlmacenCompartido()
+        return _almacen
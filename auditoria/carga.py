@@ -0,0 +1,377 @@
+"""Prueba de carga del dashboard: N sesiones simultáneas sin navegador.
+
+Cada sesión simulada recorre la página con el API de pruebas de Streamlit
+(`AppTest`): la abre, sube un libro sintético, ejecuta la auditoría, prepara
+los archivos de la pestaña Exportar, filtra el dashboard y lo vuelve a
+ejecutar con los resultados. `st.tabs` dibuja todas las pestañas en cada
+ejecución y cambiar de pestaña no llega al servidor, así que cada
+reejecución ya incluye el contenido de todas ellas (se verifica que sigan
+los botones de descarga). La auditoría corre en segundo plano y la página
+la consulta hasta que termina: `ejecutar_auditoria` mide el tiempo hasta
+los resultados, sin redondear al intervalo de consulta.
+
+Para cada nivel de concurrencia se informan p50/p95 por interacción, CPU y
+memoria. Con `--modo hilos` (predeterminado) las sesiones comparten un
+proceso, como en `streamlit run`, con el almacén compartido y la cola de
+trabajos reales; CPU y memoria son las del proceso. Con `--modo procesos`
+cada sesión corre en su propio proceso y se miden por sesión. El informe
+JSON lleva el commit y las versiones de las dependencias para compararlo
+entre versiones con `--comparar`.
+
+    python -m auditoria.carga --sesiones 1 2 4 8 --filas 5000
+    python -m auditoria.carga --comparar informe_base.json informe_nuevo.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from auditoria.medicion import percentiles
+
+DIRECTORIO_REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APLICACION = os.path.join(DIRECTORIO_REPO, 'WEB FINAL.py')
+
+INTERACCIONES = (
+    'carga_inicial', 'subir_libro', 'ejecutar_auditoria', 'preparar_exportaciones',
+    'filtrar', 'quitar_filtro', 'reejecucion'
+)
+ETIQUETA_CARGA = 'Selecciona tus archivos de asientos contables'
+ETIQUETA_EJECUTAR = '🚀 Ejecutar Auditoría Completa'
+ETIQUETA_EXPORTAR = '📦 Preparar archivos de exportación'
+ETIQUETA_FILTRO = '📋 Criterio'
+
+# Glosas con y sin palabras clave de los criterios de texto
+GLOSAS = [
+    'Pago a proveedor', 'Factura de venta a cliente', 'Ajuste de cierre mensual',
+    'Provisión de vacaciones', 'Retención en la fuente', 'Honorario legal abogado',
+    'Importación de mercadería', 'Préstamo a compañía afiliada', 'Baja de inventario',
+    'Compra de suministros', 'Depreciación mensual', 'Nómina quincenal', 'Servicios básicos'
+]
+
+
+# ==============================================
+# LIBRO SINTÉTICO
+# ==============================================
+def libro_sintetico(filas, semilla=0):
+    """Bytes de un CSV con un libro de `filas` asientos reproducible por `semilla`"""
+    rng = np.random.default_rng(semilla)
+    centavos = np.rint(rng.lognormal(mean=13, sigma=2, size=filas)).astype(np.int64)
+    # Una parte de montos redondos para que el criterio 5.10 tenga casos
+    redondos = rng.random(filas) < 0.05
+    centavos[redondos] = (centavos[redondos] // 100000 + 1) * 100000
+    es_debe = rng.random(filas) < 0.5
+    libro = pd.DataFrame({
+        'Asiento': np.arange(1, filas + 1),
+        'Fecha': (pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, 365, filas), unit='D')).strftime('%Y-%m-%d'),
+        'Cuenta': rng.integers(1000, 1200, filas),
+        'Descripción': rng.choice(GLOSAS, filas),
+        'Debe': np.where(es_debe, centavos, 0) / 100,
+        'Haber': np.where(es_debe, 0, centavos) / 100
+    })
+    return libro.to_csv(index=False).encode('utf-8')
+
+
+# ==============================================
+# RECURSOS
+# ==============================================
+def _uso_cpu():
+    uso = resource.getrusage(resource.RUSAGE_SELF)
+    return uso.ru_utime + uso.ru_stime
+
+
+def _memoria_maxima_mb():
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _memoria_residente_mb():
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024**2
+    except OSError:
+        return _memoria_maxima_mb()
+
+
+class _MonitorMemoria:
+    """Máximo de memoria residente del proceso mientras está activo"""
+
+    def __init__(self, intervalo_s=0.1):
+        self.intervalo_s = intervalo_s
+        self.maxima_mb = _memoria_residente_mb()
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+
+    def _muestrear(self):
+        while not self._detener.wait(self.intervalo_s):
+            self.maxima_mb = max(self.maxima_mb, _memoria_residente_mb())
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._detener.set()
+        self._hilo.join()
+        self.maxima_mb = max(self.maxima_mb, _memoria_residente_mb())
+
+
+# ==============================================
+# SESIÓN SIMULADA
+# ==============================================
+def simular_sesion(indice, filas, semilla, repeticiones=3, timeout=600, aplicacion=APLICACION, medir_proceso=False):
+    """Recorrer la página como un auditor y devolver latencias y errores
+
+    Con `medir_proceso` (una sesión por proceso) se agregan la CPU usada y la
+    memoria máxima del proceso.
+    """
+    from streamlit.testing.v1 import AppTest
+
+    cpu_inicial = _uso_cpu()
+    latencias = {nombre: [] for nombre in INTERACCIONES}
+    errores = []
+    at = AppTest.from_file(aplicacion, default_timeout=timeout)
+
+    def medir(nombre, accion):
+        inicio = time.perf_counter()
+        try:
+            accion()
+        except Exception as e:
+            errores.append({'interaccion': nombre, 'error': f"{type(e).__name__}: {e}"})
+            return False
+        latencias[nombre].append(time.perf_counter() - inicio)
+        fallas = [ex.message for ex in at.exception] + [err.value for err in at.error]
+        if fallas:
+            errores.append({'interaccion': nombre, 'error': str(fallas[0])})
+            return False
+        return True
+
+    def widget(elementos, etiqueta):
+        return next(elemento for elemento in elementos if elemento.label == etiqueta)
+
+    contenido = libro_sintetico(filas, semilla)
+    completa = (
+        medir('carga_inicial', at.run)
+        and medir('subir_libro', lambda: widget(at.file_uploader, ETIQUETA_CARGA).set_value(
+            [(f"libro_{semilla}.csv", contenido, 'text/csv')]
+        ).run())
+        and medir('ejecutar_auditoria', lambda: widget(at.button, ETIQUETA_EJECUTAR).click().run())
+    )
+    if completa and 'ref_auditoria' not in at.session_state:
+        errores.append({'interaccion': 'ejecutar_auditoria', 'error': 'la auditoría no terminó'})
+        completa = False
+    completa = completa and medir(
+        'preparar_exportaciones', lambda: widget(at.button, ETIQUETA_EXPORTAR).click().run()
+    )
+
+    for repeticion in range(repeticiones if completa else 0):
+        opciones = widget(at.multiselect, ETIQUETA_FILTRO).options
+        opcion = opciones[repeticion % len(opciones)]
+        if not (medir('filtrar', lambda: widget(at.multiselect, ETIQUETA_FILTRO).select(opcion).run())
+                and medir('quitar_filtro', lambda: widget(at.multiselect, ETIQUETA_FILTRO).unselect(opcion).run())
+                and medir('reejecucion', at.run)):
+            break
+        if len(at.get('download_button')) == 0:
+            errores.append({'interaccion': 'reejecucion', 'error': 'sin botones de descarga'})
+            break
+
+    sesion = {'sesion': indice, 'latencias': latencias, 'errores': errores}
+    if medir_proceso:
+        sesion['cpu_s'] = _uso_cpu() - cpu_inicial
+        sesion['memoria_maxima_mb'] = _memoria_maxima_mb()
+    return sesion
+
+
+# ==============================================
+# NIVELES DE CONCURRENCIA
+# ==============================================
+def resumir_latencias(sesiones):
+    """p50/p95/máximo por interacción con las latencias de todas las sesiones"""
+    resumen = {}
+    for nombre in INTERACCIONES:
+        valores = [v for sesion in sesiones for v in sesion['latencias'][nombre]]
+        resumen[nombre] = {
+            **percentiles(valores),
+            'max': max(valores) if valores else None,
+            'errores': sum(1 for sesion in sesiones for e in sesion['errores'] if e['interaccion'] == nombre)
+        }
+    return resumen
+
+
+def ejecutar_nivel(sesiones, filas, modo='hilos', repeticiones=3, timeout=600, semilla=0, mismo_libro=False):
+    """Simular `sesiones` sesiones a la vez y resumir sus mediciones"""
+    # Libros distintos por sesión salvo `mismo_libro` (lo comparte el almacén del servidor)
+    semillas = [semilla if mismo_libro else semilla + sesiones * 1000 + i for i in range(sesiones)]
+    parametros = dict(filas=filas, repeticiones=repeticiones, timeout=timeout, medir_proceso=modo == 'procesos')
+    if modo == 'procesos':
+        ejecutor = ProcessPoolExecutor(max_workers=sesiones, mp_context=multiprocessing.get_context('spawn'))
+    else:
+        ejecutor = ThreadPoolExecutor(max_workers=sesiones)
+
+    cpu_inicial = _uso_cpu()
+    inicio = time.perf_counter()
+    with _MonitorMemoria() as monitor, ejecutor:
+        futuros = [ejecutor.submit(simular_sesion, i, semilla=s, **parametros) for i, s in enumerate(semillas)]
+        resultados = [futuro.result() for futuro in futuros]
+    duracion = time.perf_counter() - inicio
+
+    if modo == 'procesos':
+        recursos = {
+            'cpu_s': sum(r['cpu_s'] for r in resultados),
+            'memoria_maxima_mb': max(r['memoria_maxima_mb'] for r in resultados)
+        }
+    else:
+        recursos = {'cpu_s': _uso_cpu() - cpu_inicial, 'memoria_maxima_mb': monitor.maxima_mb}
+    recursos['cpu_s_por_sesion'] = recursos['cpu_s'] / sesiones
+    recursos['uso_cpu'] = recursos['cpu_s'] / duracion if duracion else None
+
+    return {
+        'sesiones': sesiones,
+        'duracion_s': duracion,
+        'interacciones': resumir_latencias(resultados),
+        'recursos': recursos,
+        'detalle_sesiones': resultados
+    }
+
+
+# ==============================================
+# INFORME Y COMPARACIÓN
+# ==============================================
+def _commit_actual():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=DIRECTORIO_REPO,
+            capture_output=True, text=True, timeout=10, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _versiones():
+    import streamlit
+    return {
+        'commit': _commit_actual(),
+        'python': platform.python_version(),
+        'streamlit': streamlit.__version__,
+        'pandas': pd.__version__,
+        'numpy': np.__version__
+    }
+
+
+def comparar_informes(base, actual):
+    """Filas (sesiones, interacción, métrica, base, actual, variación %) de dos informes"""
+    niveles_base = {nivel['sesiones']: nivel for nivel in base['niveles']}
+    filas = []
+    for nivel in actual['niveles']:
+        anterior = niveles_base.get(nivel['sesiones'])
+        if anterior is None:
+            continue
+        for nombre, datos in nivel['interacciones'].items():
+            for metrica in ('p50', 'p95'):
+                valor_base = anterior['interacciones'].get(nombre, {}).get(metrica)
+                valor = datos[metrica]
+                variacion = (valor / valor_base - 1) * 100 if valor_base and valor is not None else None
+                filas.append((nivel['sesiones'], nombre, metrica, valor_base, valor, variacion))
+        for metrica in ('cpu_s_por_sesion', 'memoria_maxima_mb'):
+            valor_base, valor = anterior['recursos'][metrica], nivel['recursos'][metrica]
+            variacion = (valor / valor_base - 1) * 100 if valor_base else None
+            filas.append((nivel['sesiones'], 'recursos', metrica, valor_base, valor, variacion))
+    return filas
+
+
+def _formato(valor, decimales=3):
+    return '-' if valor is None else f"{valor:,.{decimales}f}"
+
+
+def imprimir_informe(informe, salida=sys.stdout):
+    for nivel in informe['niveles']:
+        recursos = nivel['recursos']
+        print(f"\n== {nivel['sesiones']} sesión(es) · {nivel['duracion_s']:.1f}s · "
+              f"CPU {recursos['cpu_s']:.1f}s ({recursos['cpu_s_por_sesion']:.1f}s/sesión) · "
+              f"memoria máx. {recursos['memoria_maxima_mb']:,.0f} MB", file=salida)
+        print(f"{'interacción':<24}{'n':>5}{'p50 s':>10}{'p95 s':>10}{'máx s':>10}{'errores':>9}", file=salida)
+        for nombre, datos in nivel['interacciones'].items():
+            print(f"{nombre:<24}{datos['n']:>5}{_formato(datos['p50']):>10}{_formato(datos['p95']):>10}"
+                  f"{_formato(datos['max']):>10}{datos['errores']:>9}", file=salida)
+
+
+def imprimir_comparacion(base, actual, salida=sys.stdout):
+    print(f"\nComparación {base['version']['commit']} -> {actual['version']['commit']}", file=salida)
+    distintos = [
+        clave for clave in ('filas', 'repeticiones', 'modo', 'mismo_libro')
+        if base['parametros'].get(clave) != actual['parametros'].get(clave)
+    ]
+    if distintos:
+        print(f"Aviso: los informes difieren en {', '.join(distintos)}", file=salida)
+    print(f"{'sesiones':>8}  {'interacción':<24}{'métrica':<20}{'base':>10}{'actual':>10}{'var. %':>9}", file=salida)
+    for sesiones, nombre, metrica, valor_base, valor, variacion in comparar_informes(base, actual):
+        print(f"{sesiones:>8}  {nombre:<24}{metrica:<20}{_formato(valor_base):>10}{_formato(valor):>10}"
+              f"{_formato(variacion, 1):>9}", file=salida)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del dashboard de auditoría HLB")
+    parser.add_argument('--sesiones', type=int, nargs='+', default=[1, 2, 4],
+                        help="Niveles de concurrencia a medir, en orden")
+    parser.add_argument('--filas', type=int, default=5000, help="Asientos del libro sintético de cada sesión")
+    parser.add_argument('--repeticiones', type=int, default=3,
+                        help="Ciclos de filtrar / quitar filtro / reejecutar por sesión")
+    parser.add_argument('--modo', choices=('hilos', 'procesos'), default='hilos')
+    parser.add_argument('--mismo-libro', action='store_true',
+                        help="Todas las sesiones suben el mismo libro (mide la reutilización entre sesiones)")
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=600, help="Segundos máximos por interacción")
+    parser.add_argument('--salida', default=None, help="Ruta del informe JSON")
+    parser.add_argument('--comparar', nargs='+', metavar='INFORME',
+                        help="Informe base con el que comparar esta ejecución, o dos informes para compararlos sin ejecutar")
+    args = parser.parse_args()
+
+    if args.comparar and len(args.comparar) > 2:
+        parser.error("--comparar admite uno o dos informes")
+    if args.comparar and len(args.comparar) == 2:
+        with open(args.comparar[0], encoding='utf-8') as base, open(args.comparar[1], encoding='utf-8') as actual:
+            imprimir_comparacion(json.load(base), json.load(actual))
+        return
+
+    from streamlit.testing.v1 import AppTest
+    if not hasattr(AppTest, 'file_uploader'):
+        parser.error("Esta versión de Streamlit no permite simular archivos subidos en AppTest; "
+                     "actualice Streamlit en el entorno de pruebas")
+
+    informe = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'version': _versiones(),
+        'maquina': {'cpus': os.cpu_count(), 'plataforma': platform.platform()},
+        'parametros': {k: v for k, v in vars(args).items() if k not in ('salida', 'comparar')},
+        'entorno': {k: v for k, v in os.environ.items() if k.startswith('HLB_AUDITORIA_')},
+        'niveles': []
+    }
+    for sesiones in args.sesiones:
+        print(f"Simulando {sesiones} sesión(es)...", file=sys.stderr)
+        informe['niveles'].append(ejecutar_nivel(
+            sesiones, args.filas, args.modo, args.repeticiones, args.timeout, args.semilla, args.mismo_libro
+        ))
+
+    salida = args.salida or f"informe_carga_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(salida, 'w', encoding='utf-8') as archivo:
+        json.dump(informe, archivo, ensure_ascii=False, indent=2)
+    imprimir_informe(informe)
+    print(f"\nInforme guardado en {salida}")
+
+    if args.comparar:
+        with open(args.comparar[0], encoding='utf-8') as base:
+            imprimir_comparacion(json.load(base), informe)
+
+
+if __name__ == '__main__':
+    main()
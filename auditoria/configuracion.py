@@ -0,0 +1,216 @@
+"""Configuración estática del sistema de auditoría: paleta, criterios, feriados y estilos.
+
+Todo lo definido aquí se construye una sola vez por proceso al importar el
+módulo, no en cada ejecución de la página.
+"""
+
+# ==============================================
+# PALETA DE COLORES HLB AUDITEC
+# ==============================================
+HLB_BLUE = "#005A77"       # HLB BLUE
+HLB_GOLD = "#FBBA00"       # HLB GOLD  
+HLB_LIGHT_BLUE = "#0093A7" # HLB LIGHT BLUE
+HLB_CHARCOAL = "#3C3C3B"   # HLB CHARCOAL
+HLB_BLACK = "#1D1D1B"      # BLACK
+HLB_GREY = "#C6D3D9"       # HLB GREY
+
+# ==============================================
+# CRITERIOS DE AUDITORÍA
+# ==============================================
+CRITERIOS_AUDITORIA = {
+    '5.1_Pagos': {
+        'palabras_clave': ['pago', 'payment', 'pagó', 'pagado', 'cheque', 'transferencia', 'abono', 'remesa'],
+        'columnas_busqueda': ['Comentario', 'Tipo', 'Cuenta', 'Descripción', 'Asiento', 'Saltos'],
+        'descripcion': 'Movimientos que en su detalle tengan algún pago',
+        'nivel_riesgo': 'medio'
+    },
+    '5.2_Cobros_Ventas': {
+        'palabras_clave': ['cobro', 'venta', 'facturación', 'factura', 'sale', 'invoice', 'ingreso', 'recibo', 'cliente'],
+        'columnas_busqueda': ['Comentario', 'Tipo', 'Cuenta', 'Descripción', 'Asiento', 'Saltos'],
+        'descripcion': 'Registros que contengan en su tipo los cobros en ventas y facturación',
+        'nivel_riesgo': 'bajo'
+    },
+    '5.3_Importaciones': {
+        'palabras_clave': ['importación', 'importacion', 'import', 'custom', 'aduana', 'arancel', 'impuesto importación'],
+        'columnas_busqueda': ['Comentario', 'Tipo', 'Descripción', 'Asiento'],
+        'descripcion': 'Movimientos efectuados que en su tipo contengan importaciones',
+        'nivel_riesgo': 'alto'
+    },
+    '5.4_Baja_Inventarios': {
+        'palabras_clave': ['baja inventario', 'baja de inventario', 'inventory write-off', 'low inventory', 'obsolescencia', 'deterioro'],
+        'columnas_busqueda': ['Comentario', 'Tipo', 'Descripción', 'Asiento'],
+        'descripcion': 'Aquellos que su detalle contengan baja de inventarios',
+        'nivel_riesgo': 'alto'
+    },
+    '5.5_Provisiones_Ajustes': {
+        'palabras_clave': ['provisión', 'provision', 'cierre', 'ajuste', 'reclassificación', 'reclasificacion', 'adjustment', 'closing'],
+        'columnas_busqueda': ['Comentario', 'Tipo', 'Descripción', 'Asiento'],
+        'descripcion': 'Valores en las que su detalle tengan: provisiones, cierres, ajustes, reclassificaciones',
+        'nivel_riesgo': 'medio'
+    },
+    '5.6_Retenciones_Depositos': {
+        'palabras_clave': ['retención', 'retencion', 'depósito', 'deposito', 'withholding', 'deposit', 'retiene', 'consignación'],
+        'columnas_busqueda': ['Comentario', 'Tipo', 'Descripción', 'Asiento'],
+        'descripcion': 'Registros que contengan retención, depósito',
+        'nivel_riesgo': 'medio'
+    },
+    '5.7_Fines_Semana_Feriados': {
+        'palabras_clave': [],
+        'columnas_busqueda': ['Fecha de contabilización', 'Fecha'],
+        'descripcion': 'Aquellos que contengan su fecha: fines de semana y feriados',
+        'nivel_riesgo': 'alto'
+    },
+    '5.8_Partes_Relacionadas': {
+        'palabras_clave': ['parte relacionada', 'related party', 'afiliada', 'affiliate', 'subsidiaria', 'matriz', 'controladora'],
+        'columnas_busqueda': ['Comentario', 'Cuenta', 'Descripción', 'Asiento'],
+        'descripcion': 'Ingreso o salida de dinero en donde intervengan transacciones con partes relacionadas',
+        'nivel_riesgo': 'alto'
+    },
+    '5.9_Asesores_Legales': {
+        'palabras_clave': ['asesor legal', 'abogado', 'lawyer', 'legal counsel', 'attorney', 'honorario legal', 'consultoría legal'],
+        'columnas_busqueda': ['Comentario', 'Cuenta', 'Descripción', 'Asiento'],
+        'descripcion': 'Desembolso de dinero con concepto pago a asesores legales',
+        'nivel_riesgo': 'alto'
+    },
+    '5.10_Montos_Sospechosos': {
+        'palabras_clave': [],
+        'columnas_busqueda': [],
+        'descripcion': 'Montos redondos: múltiplos exactos de 1,000, 10,000 o 100,000, o terminados en dígitos repetidos (ej: 9,999)',
+        'nivel_riesgo': 'medio',
+        # Magnitudes (en unidades monetarias) y cantidad de dígitos finales repetidos; 0 desactiva
+        'magnitudes': [1000, 10000, 100000],
+        'digitos_repetidos': 4
+    },
+    '5.11_Diferencias_Saldo': {
+        'palabras_clave': [],
+        'columnas_busqueda': [],
+        'descripcion': 'Diferencias significativas entre debe y haber',
+        'nivel_riesgo': 'alto',
+        # Diferencia máxima tolerada, en centavos
+        'tolerancia_centavos': 1
+    },
+    '5.12_Montos_Atipicos_Cuenta': {
+        'palabras_clave': [],
+        'columnas_busqueda': [],
+        'descripcion': 'Montos inusualmente altos para su cuenta según la mediana y dispersión móviles de sus asientos anteriores',
+        'nivel_riesgo': 'medio',
+        # Asientos anteriores de la cuenta que se comparan, mínimo para evaluar y puntaje robusto
+        'ventana': 30,
+        'minimo_observaciones': 10,
+        'umbral': 3.5
+    }
+}
+
+# Feriados (puedes expandir esta lista)
+FERIADOS = (
+    '2022-01-01', '2022-04-14', '2022-04-15', '2022-05-01',
+    '2022-05-26', '2022-08-10', '2022-10-09', '2022-11-02',
+    '2022-11-03', '2022-12-25', '2022-12-31'
+)
+
+# ==============================================
+# COLUMNAS RECONOCIDAS EN LOS LIBROS
+# ==============================================
+COLUMNAS_DEBE = ['Suma de Debe', 'Debe', 'Monto', 'Amount', 'Importe', 'Valor']
+COLUMNAS_HABER = ['Suma de Haber', 'Haber']
+COLUMNAS_FECHA = ['Fecha de contabilización', 'Fecha', 'Date', 'Fecha contable']
+COLUMNAS_CUENTA = ['Cuenta', 'Cuenta contable', 'Código cuenta', 'Account']
+
+# Nombres alternativos de las columnas de búsqueda de los criterios. Se
+# comparan sin tildes, mayúsculas ni signos; si ninguno coincide se acepta el
+# encabezado más parecido a uno de ellos con al menos SIMILITUD_MINIMA_ENCABEZADO.
+# Solo columnas de texto: los números de asiento o códigos de cuenta no tienen
+# palabras clave que buscar. Las columnas sin alias ('Asiento', 'Saltos') solo
+# se reconocen por su nombre.
+ALIAS_COLUMNAS = {
+    'Descripción': ['Glosa', 'Detalle', 'Concepto', 'Descripción del asiento', 'Description'],
+    'Comentario': ['Comentarios', 'Observación', 'Observaciones', 'Nota', 'Notas', 'Comment'],
+    'Tipo': ['Tipo de asiento', 'Tipo de documento', 'Tipo de comprobante', 'Type'],
+    'Cuenta': ['Nombre cuenta', 'Nombre de la cuenta', 'Cuenta contable', 'Account']
+}
+SIMILITUD_MINIMA_ENCABEZADO = 0.9
+
+# Bandas de monto como fracción de la materialidad: (desde, hasta, etiqueta)
+BANDAS_MATERIALIDAD = [
+    (0.0, 0.1, '< 10% materialidad'),
+    (0.1, 0.5, '10% - 50% materialidad'),
+    (0.5, 1.0, '50% - 100% materialidad'),
+    (1.0, float('inf'), '≥ materialidad')
+]
+
+# ==============================================
+# CSS PERSONALIZADO CON PALETA HLB
+# ==============================================
+CSS_PERSONALIZADO = f"""
+<style>
+    .main-header {{
+        font-size: 2.5rem;
+        color: {HLB_BLUE};
+        text-align: center;
+        margin-bottom: 2rem;
+        border-bottom: 4px solid {HLB_GOLD};
+        padding-bottom: 1rem;
+    }}
+    .sub-header {{
+        font-size: 1.5rem;
+        color: {HLB_BLUE};
+        margin-top: 2rem;
+        margin-bottom: 1rem;
+        border-left: 5px solid {HLB_GOLD};
+        padding-left: 1rem;
+    }}
+    .metric-card {{
+        background-color: {HLB_GREY};
+        padding: 1.5rem;
+        border-radius: 10px;
+        border-left: 5px solid {HLB_BLUE};
+        margin-bottom: 1rem;
+        box-shadow: 0 2px 8px rgba(0, 0, 0, 0.1);
+    }}
+    .warning-card {{
+        background-color: rgba(251, 186, 0, 0.1);
+        padding: 1rem;
+        border-radius: 10px;
+        border-left: 5px solid {HLB_GOLD};
+        margin-bottom: 1rem;
+    }}
+    .error-card {{
+        background-color: rgba(60, 60, 59, 0.1);
+        padding: 1rem;
+        border-radius: 10px;
+        border-left: 5px solid {HLB_CHARCOAL};
+        margin-bottom: 1rem;
+    }}
+    .stButton>button {{
+        background-color: {HLB_BLUE};
+        color: white;
+        font-weight: bold;
+        border: none;
+        border-radius: 5px;
+        padding: 0.5rem 1.5rem;
+    }}
+    .stDownloadButton>button {{
+        background-color: {HLB_LIGHT_BLUE};
+        color: white;
+        font-weight: bold;
+        border: none;
+        border-radius: 5px;
+        padding: 0.5rem 1.5rem;
+    }}
+    .stSidebar {{
+        background-color: {HLB_GREY};
+    }}
+    .stTabs [data-baseweb="tab-list"] {{
+        gap: 2rem;
+    }}
+    .stTabs [data-baseweb="tab"] {{
+        background-color: {HLB_GREY};
+        border-radius: 5px 5px 0 0;
+        padding: 0.5rem 1rem;
+    }}
+    .stTabs [aria-selected="true"] {{
+        background-color: {HLB_BLUE};
+        color: white;
+    }}
+</style>
+"""
@@ -0,0 +1,226 @@
+"""Cubo de agregados de una auditoría para filtrar el dashboard sin recorrer los resultados."""
+import numpy as np
+import pandas as pd
+
+from auditoria.configuracion import BANDAS_MATERIALIDAD
+from auditoria.ranking import indices_top
+
+SIN_FECHA = 'Sin fecha'
+SIN_CUENTA = 'Sin cuenta'
+NIVELES_RIESGO = ('alto', 'medio', 'bajo')
+DIMENSIONES = ('Mes', 'Cuenta', 'Banda', 'Mascara')
+ETIQUETAS_BANDAS = [etiqueta for _, _, etiqueta in BANDAS_MATERIALIDAD]
+
+
+def _categorizar(valores, etiquetas, sin_valor):
+    """Categórico a partir de valores (NaN -> `sin_valor`) sin convertir cada fila a texto"""
+    codigos, unicos = pd.factorize(valores, sort=True)
+    categorias = [etiquetas(u) for u in unicos]
+    if len(set(categorias)) < len(categorias):
+        # Valores distintos con la misma etiqueta (1101 y '1101') comparten categoría
+        remapeo, categorias = pd.factorize(np.array(categorias, dtype=object))
+        codigos = np.where(codigos < 0, -1, remapeo[codigos])
+        categorias = list(categorias)
+    if (codigos < 0).any():
+        codigos = np.where(codigos < 0, len(categorias), codigos)
+        categorias.append(sin_valor)
+    return pd.Categorical.from_codes(codigos, categories=categorias)
+
+
+def _contar_bits(mascaras, bits):
+    total = np.zeros(len(mascaras), dtype=np.int64)
+    for i in range(bits):
+        total += (mascaras >> i) & 1
+    return total
+
+
+class CuboAuditoria:
+    """Conteos y montos por mes × cuenta × banda de materialidad × combinación de criterios.
+
+    La combinación de criterios que cumple cada asiento se guarda como una
+    máscara de bits (bit i = i-ésimo criterio). Así el cubo permite filtrar
+    por criterio o por nivel de riesgo y seguir calculando conteos exactos
+    por asiento (materiales, críticos, alto riesgo) sin contar dos veces los
+    asientos que cumplen varios criterios. Se construye una vez por
+    ejecución; filtrar y agregar opera sobre el cubo, no sobre `resultados`.
+    """
+
+    def __init__(self, datos, criterios, niveles_riesgo, materialidad, seleccion_criterios=None):
+        self.datos = datos
+        self.criterios = list(criterios)
+        self.niveles_riesgo = niveles_riesgo
+        self.materialidad = materialidad
+        self.seleccion_criterios = seleccion_criterios
+        self._mascaras = datos['Mascara'].to_numpy(dtype=np.int64)
+        self._num_criterios = _contar_bits(self._mascaras, len(self.criterios))
+        self._opciones = None
+        self.bits_riesgo = {
+            nivel: sum(1 << i for i, c in enumerate(self.criterios) if niveles_riesgo.get(c) == nivel)
+            for nivel in NIVELES_RIESGO
+        }
+
+    @classmethod
+    def desde_sistema(cls, sistema):
+        """Agregar los resultados de una auditoría terminada"""
+        resultados = sistema.resultados
+        criterios = [c for c in sistema.criterios_auditoria if c in resultados.columns]
+        niveles = {c: cfg.get('nivel_riesgo', 'medio') for c, cfg in sistema.criterios_auditoria.items()}
+
+        if len(resultados) == 0:
+            datos = pd.DataFrame({
+                'Mes': pd.Categorical([]), 'Cuenta': pd.Categorical([]),
+                'Banda': pd.Categorical([], categories=ETIQUETAS_BANDAS, ordered=True),
+                'Mascara': pd.Series(dtype=np.int64), 'Asientos': pd.Series(dtype=np.int64),
+                'Monto': pd.Series(dtype=float), 'Materiales': pd.Series(dtype=np.int64),
+                'Monto_Material': pd.Series(dtype=float)
+            })
+            return cls(datos, criterios, niveles, sistema.materialidad)
+
+        # Los resultados siguen el orden de las filas del libro procesado
+        libro = sistema.df_procesado
+        if len(libro) != len(resultados):
+            libro = libro.loc[resultados['ID_Asiento']]
+
+        fechas = libro['Fecha_Procesada']
+        mes = _categorizar(
+            (fechas.dt.year * 100 + fechas.dt.month).to_numpy(),
+            lambda periodo: f"{int(periodo) // 100:04d}-{int(periodo) % 100:02d}",
+            SIN_FECHA
+        )
+        columna_cuenta = sistema.columnas_detectadas.get('cuenta')
+        if columna_cuenta:
+            cuenta = _categorizar(libro[columna_cuenta].to_numpy(), str, SIN_CUENTA)
+        else:
+            cuenta = pd.Categorical.from_codes(np.zeros(len(libro), dtype=np.int64), categories=[SIN_CUENTA])
+
+        monto = resultados['Monto_Absoluto'].to_numpy(dtype=float)
+        bordes = [desde for desde, _, _ in BANDAS_MATERIALIDAD[1:]]
+        banda = pd.Categorical.from_codes(
+            np.searchsorted(bordes, monto / sistema.materialidad, side='right'),
+            categories=ETIQUETAS_BANDAS, ordered=True
+        )
+
+        mascara = np.zeros(len(resultados), dtype=np.int64)
+        for i, criterio in enumerate(criterios):
+            mascara |= resultados[criterio].to_numpy(dtype=np.int64) << i
+
+        material = sistema.mascara_material()
+        tabla = pd.DataFrame({
+            'Mes': mes,
+            'Cuenta': cuenta,
+            'Banda': banda,
+            'Mascara': mascara,
+            'Asientos': np.ones(len(resultados), dtype=np.int64),
+            'Monto': monto,
+            'Materiales': material.astype(np.int64),
+            'Monto_Material': np.where(material, monto, 0.0)
+        })
+        datos = tabla.groupby(list(DIMENSIONES), observed=True, sort=True).sum().reset_index()
+        return cls(datos, criterios, niveles, sistema.materialidad)
+
+    # --- Filtros ---
+    def opciones(self):
+        """Valores disponibles de cada dimensión para los controles de filtro"""
+        if self._opciones is None:
+            presentes = lambda col: [str(v) for v in self.datos[col].cat.remove_unused_categories().cat.categories]
+            self._opciones = {
+                'meses': presentes('Mes'),
+                'cuentas': presentes('Cuenta'),
+                'bandas': presentes('Banda'),
+                'criterios': list(self.criterios),
+                'riesgos': [n for n in NIVELES_RIESGO if self.bits_riesgo[n]]
+            }
+        return self._opciones
+
+    def filtrar(self, meses=None, cuentas=None, bandas=None, criterios=None, riesgos=None):
+        """Sub-cubo con los asientos que cumplen todos los filtros indicados
+
+        Un filtro vacío o None no restringe. Con `criterios` o `riesgos` se
+        conservan los asientos que cumplen al menos uno de los criterios
+        seleccionados (o de ese nivel de riesgo).
+        """
+        seleccion = np.ones(len(self.datos), dtype=bool)
+        if meses:
+            seleccion &= self.datos['Mes'].isin(meses).to_numpy()
+        if cuentas:
+            seleccion &= self.datos['Cuenta'].isin(cuentas).to_numpy()
+        if bandas:
+            seleccion &= self.datos['Banda'].isin(bandas).to_numpy()
+        if criterios:
+            bits = sum(1 << self.criterios.index(c) for c in criterios if c in self.criterios)
+            seleccion &= (self._mascaras & bits) != 0
+        if riesgos:
+            bits = sum(self.bits_riesgo.get(n, 0) for n in riesgos)
+            seleccion &= (self._mascaras & bits) != 0
+
+        return CuboAuditoria(
+            self.datos[seleccion],
+            self.criterios,
+            self.niveles_riesgo,
+            self.materialidad,
+            seleccion_criterios=list(criterios) if criterios else self.seleccion_criterios
+        )
+
+    # --- Agregados ---
+    def kpis(self):
+        """Indicadores de las tarjetas del dashboard"""
+        asientos = self.datos['Asientos'].to_numpy()
+        materiales = self.datos['Materiales'].to_numpy()
+        total = int(asientos.sum())
+        total_materiales = int(materiales.sum())
+        return {
+            'total_asientos': total,
+            'asientos_materiales': total_materiales,
+            'porcentaje_materiales': total_materiales / total * 100 if total else 0.0,
+            'asientos_criticos_count': int(materiales[self._num_criterios > 0].sum()),
+            'asientos_alto_riesgo': int(materiales[self._num_criterios >= 2].sum()),
+            'asientos_multiple_criterio': int(asientos[self._num_criterios > 1].sum()),
+            'monto_total': float(self.datos['Monto'].sum()),
+            'monto_total_material': float(self.datos['Monto_Material'].sum())
+        }
+
+    def por_criterio(self):
+        """Asientos y monto por criterio (un asiento cuenta en cada criterio que cumple)"""
+        asientos = self.datos['Asientos'].to_numpy()
+        monto = self.datos['Monto'].to_numpy()
+        filas = []
+        for i, criterio in enumerate(self.criterios):
+            if self.seleccion_criterios and criterio not in self.seleccion_criterios:
+                continue
+            cumple = ((self._mascaras >> i) & 1).astype(bool)
+            filas.append({
+                'Criterio': criterio,
+                'Cantidad': int(asientos[cumple].sum()),
+                'Monto': float(monto[cumple].sum()),
+                'Riesgo': self.niveles_riesgo.get(criterio, 'medio')
+            })
+        return pd.DataFrame(filas, columns=['Criterio', 'Cantidad', 'Monto', 'Riesgo'])
+
+    def por_numero_criterios(self):
+        """Asientos y monto según cuántos criterios cumplen"""
+        return (
+            self.datos[['Asientos', 'Monto']]
+            .groupby(self._num_criterios).sum()
+            .rename_axis('Total_Criterios').reset_index()
+        )
+
+    def por_materialidad(self):
+        """Asientos materiales y no materiales"""
+        materiales = int(self.datos['Materiales'].sum())
+        return pd.Series(
+            {'Sí': materiales, 'No': int(self.datos['Asientos'].sum()) - materiales},
+            name='Asientos'
+        )
+
+    def por_dimension(self, dimension):
+        """Asientos, materiales y montos agrupados por 'Mes', 'Cuenta' o 'Banda'"""
+        return (
+            self.datos.groupby(dimension, observed=True, sort=True)
+            [['Asientos', 'Materiales', 'Monto', 'Monto_Material']].sum()
+            .reset_index()
+        )
+    
+    def top(self, dimension, n=10, medida='Monto_Material'):
+        """Los `n` valores de 'Mes', 'Cuenta' o 'Banda' con mayor `medida`, sin ordenar todos"""
+        agregado = self.por_dimension(dimension)
+        return agregado.iloc[indices_top(agregado[medida].to_numpy(), n)].reset_index(drop=True)
@@ -0,0 +1,333 @@
+"""Auditorías incrementales: solo se auditan los asientos nuevos o modificados.
+
+Cada fila del libro recibe una huella (hash estable de las columnas que leen
+los criterios: montos, fecha, cuenta y columnas de búsqueda). Los resultados
+de la última carga de cada cliente se guardan en disco indexados por huella;
+en la siguiente carga solo las filas con huellas desconocidas pasan por los
+criterios y las estadísticas se actualizan sumando y restando conteos en
+lugar de recalcularse desde cero. El criterio 5.12 depende del historial de
+la cuenta, así que se vuelve a evaluar en las filas reutilizadas de las
+cuentas que ganaron o perdieron asientos.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+from auditoria.configuracion import ALIAS_COLUMNAS, SIMILITUD_MINIMA_ENCABEZADO
+from auditoria.ingesta import COLUMNAS_ORIGEN
+from auditoria.plan import CRITERIO_ATIPICOS
+from auditoria.progreso import ReporteProgreso
+
+# Versión del formato del almacén; cambiarla invalida los resultados guardados
+VERSION_ALMACEN = 2
+
+# Cuenta de cada fila guardada, para saber qué cuentas perdieron asientos
+COLUMNA_CUENTA_HISTORIAL = 'Cuenta_Historial'
+
+DIRECTORIO_DELTA = os.environ.get(
+    'HLB_AUDITORIA_DELTA_DIR',
+    os.path.join(os.path.expanduser('~'), '.hlb_auditoria', 'delta')
+)
+
+
+def columnas_clave(sistema):
+    """Columnas del libro que leen los criterios
+
+    Son las de monto, fecha y cuenta identificadas al cargar y las columnas
+    de búsqueda resueltas por el plan (descripción, comentario...). Una
+    columna que ningún criterio lee no cambia los resultados de la fila.
+    """
+    columnas = [col for col in sistema.columnas_detectadas.values() if col]
+    plan = sistema.plan_evaluacion or sistema.planificar_evaluacion()
+    columnas += [col for col in plan['columnas'].values() if col is not None]
+    return list(dict.fromkeys(columnas))
+
+
+def calcular_huellas(df, columnas=None):
+    """Huella estable por fila a partir de las columnas clave del libro original
+
+    `columnas` son las columnas que entran en la huella (ver `columnas_clave`);
+    sin ellas se usan todas salvo las de origen y las sin nombre. No depende
+    del orden de las columnas ni del índice. Las filas idénticas reciben
+    huellas distintas según su número de aparición, para que un asiento
+    duplicado en la nueva carga cuente como nuevo.
+    """
+    if columnas is None:
+        columnas = [c for c in df.columns if not str(c).startswith('Unnamed:') and c not in COLUMNAS_ORIGEN]
+    normalizado = pd.DataFrame(index=df.index)
+    for col in sorted(columnas, key=str):
+        serie = df[col]
+        if pd.api.types.is_bool_dtype(serie) or pd.api.types.is_numeric_dtype(serie):
+            # 5 y 5.0 deben producir la misma huella entre cargas
+            normalizado[str(col)] = serie.astype('float64')
+        else:
+            normalizado[str(col)] = serie.astype(str)
+
+    huella = pd.util.hash_pandas_object(normalizado, index=False)
+    ocurrencia = huella.groupby(huella).cumcount()
+    combinado = pd.DataFrame({'huella': huella.values, 'ocurrencia': ocurrencia.values})
+    return pd.Series(
+        pd.util.hash_pandas_object(combinado, index=False).values,
+        index=df.index,
+        name='Huella'
+    )
+
+
+def version_criterios(sistema):
+    """Identificador de la configuración de criterios, alias de columnas, materialidad y feriados"""
+    configuracion = json.dumps({
+        'criterios': sistema.criterios_auditoria,
+        'alias_columnas': ALIAS_COLUMNAS,
+        'similitud_encabezado': SIMILITUD_MINIMA_ENCABEZADO,
+        'feriados': sorted(sistema.feriados),
+        'materialidad': sistema.materialidad
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(configuracion.encode('utf-8')).hexdigest()[:16]
+
+
+def combinar_conteos(base, sumar=None, restar=None):
+    """Sumar y restar conteos producidos por `contar_resultados`"""
+    combinado = {k: v for k, v in base.items() if k != 'criterios'}
+    combinado['criterios'] = dict(base['criterios'])
+    for conteos, signo in ((sumar, 1), (restar, -1)):
+        if conteos is None:
+            continue
+        for clave, valor in conteos.items():
+            if clave == 'criterios':
+                for criterio, count in valor.items():
+                    combinado['criterios'][criterio] = combinado['criterios'].get(criterio, 0) + signo * count
+            else:
+                combinado[clave] = combinado.get(clave, 0) + signo * valor
+    return combinado
+
+
+class AlmacenResultados:
+    """Resultados persistidos por cliente en un directorio local"""
+
+    def __init__(self, directorio=DIRECTORIO_DELTA):
+        self.directorio = directorio
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    @staticmethod
+    def normalizar_cliente(cliente):
+        return re.sub(r'[^\w\-]+', '_', cliente.strip().lower()).strip('_')
+
+    def bloqueo(self, cliente):
+        """Lock por cliente para que dos sesiones no actualicen el mismo almacén a la vez"""
+        with self._locks_lock:
+            return self._locks.setdefault(self.normalizar_cliente(cliente), threading.Lock())
+
+    def _ruta(self, cliente, archivo):
+        return os.path.join(self.directorio, self.normalizar_cliente(cliente), archivo)
+
+    def cargar(self, cliente):
+        """Devolver (resultados, irregularidades, metadatos) o None si no hay carga previa"""
+        ruta_meta = self._ruta(cliente, 'metadatos.json')
+        if not os.path.exists(ruta_meta):
+            return None
+        with open(ruta_meta, encoding='utf-8') as f:
+            metadatos = json.load(f)
+        if metadatos.get('version_almacen') != VERSION_ALMACEN:
+            return None
+        resultados = pd.read_pickle(self._ruta(cliente, 'resultados.pkl'))
+        irregulares = pd.read_pickle(self._ruta(cliente, 'irregularidades.pkl'))
+        return resultados, irregulares, metadatos
+
+    def guardar(self, cliente, resultados, irregulares, metadatos):
+        os.makedirs(os.path.dirname(self._ruta(cliente, 'x')), exist_ok=True)
+        # Escritura atómica: primero los datos y al final los metadatos
+        for nombre, df in (('resultados.pkl', resultados), ('irregularidades.pkl', irregulares)):
+            ruta = self._ruta(cliente, nombre)
+            df.to_pickle(ruta + '.tmp')
+            os.replace(ruta + '.tmp', ruta)
+        ruta_meta = self._ruta(cliente, 'metadatos.json')
+        with open(ruta_meta + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({**metadatos, 'version_almacen': VERSION_ALMACEN}, f, ensure_ascii=False, indent=2)
+        os.replace(ruta_meta + '.tmp', ruta_meta)
+
+
+def _remapear_ids(df, huella_a_id):
+    """Asignar a resultados guardados el ID del asiento en la carga actual"""
+    df = df.copy()
+    df['ID_Asiento'] = df['Huella'].map(huella_a_id)
+    return df
+
+
+def _concatenar_en_orden(frames, posicion):
+    """Concatenar resultados y devolverlos en el orden de las filas del libro actual"""
+    frames = [df for df in frames if len(df) > 0]
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True)
+    orden = posicion[df['Huella']].to_numpy().argsort(kind='stable')
+    return df.iloc[orden].reset_index(drop=True)
+
+
+def _reevaluar_atipicos(sistema, resultados, irregulares, ids):
+    """Volver a evaluar el criterio 5.12 en las filas reutilizadas con ID en `ids`
+
+    Devuelve los resultados e irregularidades actualizados y los conteos de
+    esas filas antes y después, para corregir las estadísticas acumuladas.
+    """
+    nivel_riesgo = sistema.criterios_auditoria[CRITERIO_ATIPICOS].get('nivel_riesgo', 'medio')
+    filas = resultados['ID_Asiento'].isin(ids).to_numpy()
+    antes = resultados[filas]
+    detalles = sistema._montos_atipicos(
+        sistema.df_procesado.loc[antes['ID_Asiento']]
+    )[CRITERIO_ATIPICOS]
+
+    criterios_detalle = []
+    for previo, detalle in zip(antes['Criterios_Detalle'], detalles):
+        actual = {c: d for c, d in previo.items() if c != CRITERIO_ATIPICOS}
+        if detalle is not None:
+            actual[CRITERIO_ATIPICOS] = {'detalle': detalle, 'riesgo': nivel_riesgo}
+        # Mismo orden en que `evaluar_asientos` aplica los criterios
+        criterios_detalle.append({c: actual[c] for c in sistema.criterios_auditoria if c in actual})
+
+    despues = antes.copy()
+    despues['Criterios_Detalle'] = criterios_detalle
+    despues['Total_Criterios'] = [len(cd) for cd in criterios_detalle]
+    despues['Detalles_Criterios'] = [
+        ' | '.join(f"{c}: {d['detalle']}" for c, d in cd.items()) or 'Ninguno' for cd in criterios_detalle
+    ]
+    despues[CRITERIO_ATIPICOS] = [int(CRITERIO_ATIPICOS in cd) for cd in criterios_detalle]
+
+    # Las irregularidades del 5.12 de esas filas se rehacen con el nuevo detalle
+    irregulares = irregulares[
+        ~(irregulares['ID_Asiento'].isin(ids) & (irregulares['Criterio'] == CRITERIO_ATIPICOS))
+    ] if len(irregulares) > 0 else irregulares
+    if nivel_riesgo == 'alto':
+        nuevas = despues[(despues[CRITERIO_ATIPICOS] == 1) & (despues['Material'] == 'Sí')]
+        irregulares = pd.concat([irregulares, pd.DataFrame({
+            'ID_Asiento': nuevas['ID_Asiento'],
+            'Criterio': CRITERIO_ATIPICOS,
+            'Detalle': [cd[CRITERIO_ATIPICOS]['detalle'] for cd in nuevas['Criterios_Detalle']],
+            'Monto': nuevas['Monto_Absoluto'],
+            'Nivel_Riesgo': nivel_riesgo,
+            'Huella': nuevas['Huella']
+        })], ignore_index=True)
+
+    resultados = pd.concat([resultados[~filas], despues], ignore_index=True)
+    return resultados, irregulares, sistema.contar_resultados(antes), sistema.contar_resultados(despues)
+
+
+def auditar_incremental(sistema, cliente, almacen=None, progreso=None, cancelacion=None):
+    """Auditar `sistema.df_procesado` reutilizando la última carga del cliente
+
+    Deja `resultados`, `asientos_irregulares` y `estadisticas` en el sistema
+    como lo haría `aplicar_auditoria` y guarda la carga para la próxima vez.
+    Devuelve un resumen con las filas reutilizadas, nuevas y eliminadas.
+    """
+    if sistema.df_procesado is None:
+        raise ValueError("Primero debe cargar los datos")
+
+    almacen = almacen or AlmacenResultados()
+    progreso = progreso or ReporteProgreso()
+    version = version_criterios(sistema)
+
+    huellas = calcular_huellas(sistema.df_original, columnas_clave(sistema))
+    huella_a_id = pd.Series(huellas.index, index=huellas.values)
+
+    columna_cuenta = sistema.columnas_detectadas.get('cuenta')
+    cuentas = sistema.df_procesado[columna_cuenta].astype(str) if columna_cuenta else None
+
+    with almacen.bloqueo(cliente):
+        previo = almacen.cargar(cliente)
+        if previo is not None and previo[2].get('version_criterios') != version:
+            previo = None
+
+        if previo is None:
+            res_previos = pd.DataFrame(columns=['Huella'])
+            irr_previos = pd.DataFrame(columns=['Huella'])
+            conteos_previos = sistema.contar_resultados(pd.DataFrame())
+        else:
+            res_previos, irr_previos, metadatos = previo
+            conteos_previos = metadatos['conteos']
+
+        conocidas = huellas.isin(res_previos['Huella'])
+        eliminados = res_previos[~res_previos['Huella'].isin(huellas)]
+        reutilizados = res_previos[res_previos['Huella'].isin(huellas)]
+
+        # Solo los asientos nuevos o modificados pasan por los criterios
+        res_nuevos, irr_nuevos = sistema.evaluar_asientos(
+            sistema.df_procesado[~conocidas.values], progreso, cancelacion
+        )
+        if len(res_nuevos) > 0:
+            res_nuevos['Huella'] = huellas[~conocidas.values].values
+        if len(irr_nuevos) > 0:
+            irr_nuevos['Huella'] = irr_nuevos['ID_Asiento'].map(huellas)
+
+        progreso.iniciar('estadisticas', total=len(huellas))
+        conteos = combinar_conteos(
+            conteos_previos,
+            sumar=sistema.contar_resultados(res_nuevos),
+            restar=sistema.contar_resultados(eliminados)
+        )
+
+        reutilizados = _remapear_ids(reutilizados, huella_a_id)
+        irr_reutilizados = _remapear_ids(irr_previos[irr_previos['Huella'].isin(huellas)], huella_a_id)
+
+        # Un asiento agregado o quitado (aunque sea de otra fecha) cambia el
+        # historial de su cuenta y con él el 5.12 de los asientos reutilizados
+        reevaluados = 0
+        if cuentas is not None and CRITERIO_ATIPICOS in sistema.plan_evaluacion['activos'] and len(reutilizados):
+            afectadas = set(cuentas[~conocidas.values])
+            if COLUMNA_CUENTA_HISTORIAL in eliminados.columns:
+                afectadas.update(eliminados[COLUMNA_CUENTA_HISTORIAL])
+            ids = reutilizados['ID_Asiento'][
+                cuentas.loc[reutilizados['ID_Asiento']].isin(afectadas).to_numpy()
+            ]
+            if len(ids) > 0:
+                reutilizados, irr_reutilizados, antes, despues = _reevaluar_atipicos(
+                    sistema, reutilizados, irr_reutilizados, ids
+                )
+                conteos = combinar_conteos(conteos, sumar=despues, restar=antes)
+                reevaluados = len(ids)
+
+        posicion = pd.Series(range(len(huellas)), index=huellas.values)
+        resultados = _concatenar_en_orden([reutilizados, res_nuevos], posicion)
+        irregulares = _concatenar_en_orden([irr_reutilizados, irr_nuevos], posicion)
+        if cuentas is not None and len(resultados) > 0:
+            resultados[COLUMNA_CUENTA_HISTORIAL] = cuentas.loc[resultados['ID_Asiento']].to_numpy()
+
+        almacen.guardar(cliente, resultados, irregulares, {
+            'cliente': cliente,
+            'version_criterios': version,
+            'fecha': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'conteos': conteos
+        })
+
+    sistema.resultados = resultados.drop(columns=['Huella', COLUMNA_CUENTA_HISTORIAL], errors='ignore')
+    sistema.asientos_irregulares = irregulares.drop(columns=['Huella'], errors='ignore')
+    sistema._calcular_estadisticas(conteos)
+    progreso.finalizar()
+
+    resumen = {
+        'cliente': cliente,
+        'reutilizados': int(len(reutilizados)),
+        'nuevos': int(len(res_nuevos)),
+        'eliminados': int(len(eliminados)),
+        'atipicos_reevaluados': int(reevaluados),
+        'carga_previa': previo is not None
+    }
+    sistema.resumen_delta = resumen
+    return resumen
+
+
+_almacen = None
+_almacen_lock = threading.Lock()
+
+
+def obtener_almacen():
+    """Almacén único por proceso, para que los locks por cliente sean compartidos"""
+    global _almacen
+    with _almacen_lock:
+        if _almacen is None:
+            _almacen = AlmacenResultados()
+        return _almacen
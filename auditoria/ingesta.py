@@ -0,0 +1,195 @@
+"""Lectura de uno o varios libros (todas sus hojas) en un único libro consolidado.
+
+Cada archivo CSV o cada hoja de Excel es una parte. Las partes se leen en
+paralelo en un pool de procesos, de modo que el tiempo total depende de la
+parte más grande y no de la suma. Las columnas de monto, fecha y cuenta se
+identifican con la misma lógica que `cargar_datos` y se renombran a un nombre
+común antes de concatenar; cada fila queda etiquetada con su archivo y hoja.
+"""
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+from auditoria.configuracion import COLUMNAS_CUENTA, COLUMNAS_DEBE, COLUMNAS_FECHA, COLUMNAS_HABER
+
+COLUMNA_ARCHIVO = 'Archivo_Origen'
+COLUMNA_HOJA = 'Hoja_Origen'
+COLUMNAS_ORIGEN = (COLUMNA_ARCHIVO, COLUMNA_HOJA)
+
+PROCESOS_INGESTA = int(os.environ.get('HLB_AUDITORIA_PROCESOS_INGESTA', os.cpu_count() or 2))
+
+
+def detectar_columnas(columnas):
+    """Columnas de debe, haber, fecha y cuenta entre `columnas` (None si no hay)"""
+    primera = lambda candidatas: next((col for col in candidatas if col in columnas), None)
+    return {
+        'debe': primera(COLUMNAS_DEBE),
+        'haber': primera(COLUMNAS_HABER),
+        'fecha': primera(COLUMNAS_FECHA),
+        'cuenta': primera(COLUMNAS_CUENTA)
+    }
+
+
+def es_csv(nombre):
+    return nombre.lower().endswith('.csv')
+
+
+def listar_hojas(nombre, contenido):
+    """Hojas de un libro Excel; [None] para un CSV"""
+    if es_csv(nombre):
+        return [None]
+    with pd.ExcelFile(io.BytesIO(contenido)) as libro:
+        return list(libro.sheet_names)
+
+
+def leer_parte(nombre, contenido, hoja=None):
+    """Leer un CSV o una hoja de Excel a un DataFrame
+
+    `contenido` son los bytes del archivo o la ruta a una copia en disco.
+    """
+    fuente = io.BytesIO(contenido) if isinstance(contenido, bytes) else contenido
+    if es_csv(nombre):
+        return pd.read_csv(fuente)
+    return pd.read_excel(fuente, sheet_name=hoja if hoja is not None else 0)
+
+
+def conciliar_columnas(partes):
+    """Renombrar en cada parte las columnas detectadas al nombre usado en la primera que las tiene"""
+    detectadas = [detectar_columnas(df.columns) for df in partes]
+    comunes = {}
+    for columnas in detectadas:
+        for tipo, col in columnas.items():
+            if col is not None:
+                comunes.setdefault(tipo, col)
+
+    conciliadas = []
+    for df, columnas in zip(partes, detectadas):
+        renombrar = {
+            col: comunes[tipo] for tipo, col in columnas.items()
+            # Si la parte ya tiene otra columna con el nombre común, se deja como está
+            if col is not None and col != comunes[tipo] and comunes[tipo] not in df.columns
+        }
+        conciliadas.append(df.rename(columns=renombrar) if renombrar else df)
+    return conciliadas
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def obtener_pool():
+    """Pool de procesos único por proceso para leer partes en paralelo"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PROCESOS_INGESTA,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+
+def descartar_pool(pool):
+    """Dejar de usar un pool roto; el próximo `obtener_pool` crea otro"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _leer_en_pool(trabajos, progreso=None):
+    """Leer las partes en el pool de procesos, en el orden de `trabajos`
+
+    Cada libro se escribe una vez en un directorio temporal y los procesos
+    reciben su ruta: los bytes no se copian al proceso por cada hoja. Si un
+    proceso del pool muere (p. ej. sin memoria con una hoja grande), el pool
+    se reemplaza y la lectura se reintenta una vez.
+    """
+    with tempfile.TemporaryDirectory(prefix='hlb_ingesta_') as directorio:
+        rutas = {}
+        tareas = []
+        for nombre, contenido, hoja in trabajos:
+            if id(contenido) not in rutas:
+                rutas[id(contenido)] = os.path.join(directorio, f'{len(rutas)}{os.path.splitext(nombre)[1]}')
+                with open(rutas[id(contenido)], 'wb') as f:
+                    f.write(contenido)
+            tareas.append((nombre, rutas[id(contenido)], hoja))
+
+        for intento in range(2):
+            pool = obtener_pool()
+            if progreso is not None:
+                progreso.iniciar('ingesta')
+            try:
+                futuros = [pool.submit(leer_parte, *tarea) for tarea in tareas]
+                leidas = []
+                for futuro in futuros:
+                    leidas.append(futuro.result())
+                    if progreso is not None:
+                        progreso.avanzar(len(leidas[-1]))
+                return leidas
+            except BrokenProcessPool:
+                descartar_pool(pool)
+                if intento == 1:
+                    raise
+
+
+def leer_libros(archivos, todas_las_hojas=True, procesos=None, progreso=None):
+    """Leer y consolidar `archivos`, una lista de pares (nombre, contenido en bytes)
+
+    Con `todas_las_hojas` se leen todas las hojas de cada Excel (si no, solo
+    la primera). Con una sola parte o `procesos=1` se lee en este proceso.
+    Las partes sin columna de monto identificable o sin filas se omiten y se
+    listan en `df.attrs['partes_omitidas']`; `df.attrs['partes']` resume las
+    leídas. Lanza ValueError si ninguna parte tiene columna de monto.
+    `progreso` cuenta las filas leídas a medida que termina cada parte.
+    """
+    trabajos = []
+    for nombre, contenido in archivos:
+        hojas = listar_hojas(nombre, contenido) if todas_las_hojas else [None]
+        trabajos.extend((nombre, contenido, hoja) for hoja in hojas)
+
+    # El total de filas no se conoce hasta leer cada parte
+    if progreso is not None:
+        progreso.iniciar('ingesta')
+
+    procesos = procesos or PROCESOS_INGESTA
+    if len(trabajos) == 1 or procesos == 1:
+        leidas = []
+        for trabajo in trabajos:
+            leidas.append(leer_parte(*trabajo))
+            if progreso is not None:
+                progreso.avanzar(len(leidas[-1]))
+    else:
+        leidas = _leer_en_pool(trabajos, progreso)
+
+    partes, resumen, omitidas = [], [], []
+    for (nombre, _, hoja), df in zip(trabajos, leidas):
+        etiqueta_hoja = hoja if hoja is not None else ''
+        if len(df) == 0:
+            omitidas.append({'archivo': nombre, 'hoja': etiqueta_hoja, 'motivo': 'sin filas'})
+            continue
+        if detectar_columnas(df.columns)['debe'] is None:
+            omitidas.append({'archivo': nombre, 'hoja': etiqueta_hoja, 'motivo': 'sin columna de monto'})
+            continue
+        df = df.copy()
+        df[COLUMNA_ARCHIVO] = nombre
+        df[COLUMNA_HOJA] = etiqueta_hoja
+        partes.append(df)
+        resumen.append({'archivo': nombre, 'hoja': etiqueta_hoja, 'filas': len(df)})
+
+    if not partes:
+        raise ValueError("Ningún archivo u hoja tiene una columna de monto identificable")
+
+    libro = pd.concat(conciliar_columnas(partes), ignore_index=True, sort=False)
+    libro.attrs['partes'] = resumen
+    libro.attrs['partes_omitidas'] = omitidas
+    if progreso is not None:
+        progreso.finalizar(total=sum(len(df) for df in leidas))
+    return libro
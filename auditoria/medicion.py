@@ -0,0 +1,48 @@
+"""Tiempos de ejecución de la página: primera carga y reejecuciones."""
+import logging
+import threading
+from collections import deque
+
+import numpy as np
+
+logger = logging.getLogger('auditoria.medicion')
+
+_lock = threading.Lock()
+_primera_carga_proceso = None
+_cargas_iniciales = deque(maxlen=500)
+_reejecuciones = deque(maxlen=500)
+
+
+def registrar_ejecucion(duracion, inicial):
+    """Registrar la duración de una ejecución del script
+
+    `inicial` indica la primera ejecución de una sesión (carga de la página);
+    la primera de todo el proceso incluye además la importación de módulos.
+    """
+    global _primera_carga_proceso
+    with _lock:
+        if _primera_carga_proceso is None:
+            _primera_carga_proceso = duracion
+            logger.info("Primera carga de página del proceso: %.3fs", duracion)
+        (_cargas_iniciales if inicial else _reejecuciones).append(duracion)
+
+
+def percentiles(valores):
+    """Cantidad, p50 y p95 de una colección de duraciones (None si está vacía)"""
+    if not valores:
+        return {'n': 0, 'p50': None, 'p95': None}
+    arreglo = np.fromiter(valores, dtype=float)
+    return {
+        'n': len(arreglo),
+        'p50': float(np.percentile(arreglo, 50)),
+        'p95': float(np.percentile(arreglo, 95))
+    }
+
+
+def resumen_ejecuciones():
+    with _lock:
+        return {
+            'primera_carga_proceso': _primera_carga_proceso,
+            'cargas_iniciales': percentiles(_cargas_iniciales),
+            'reejecuciones': percentiles(_reejecuciones)
+        }
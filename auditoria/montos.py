@@ -0,0 +1,169 @@
+"""Montos en centavos enteros (int64) para que los criterios de monto sean exactos.
+
+Los importes se convierten una sola vez al cargar el libro. Los textos se
+interpretan según la configuración regional más probable: coma o punto como
+separador decimal, separadores de miles y paréntesis o signo para negativos.
+Sobre el arreglo entero los criterios 5.10 y 5.11 se evalúan vectorizados,
+sin errores de redondeo de float64.
+"""
+import numpy as np
+import pandas as pd
+
+# Potencias de 10 para contar dígitos de forma exacta (int64 admite hasta 10**18)
+_POTENCIAS_10 = 10 ** np.arange(19, dtype=np.int64)
+
+# Mayor monto admitido, en centavos: lo que no es finito o lo supera se
+# trata como un texto sin importe (0) en lugar de desbordar int64
+MAXIMO_CENTAVOS = 9 * 10 ** 18
+
+# Notación científica ("1.5E+05", "2,5e3"), como la que exporta Excel en CSV
+_PATRON_EXPONENTE = r'^[-+]?(?:\d+(?:[.,]\d*)?|[.,]\d+)[eE][-+]?\d+$'
+
+
+def _redondear_centavos(centavos):
+    """int64 de centavos en float, con 0 para NaN, infinitos y montos fuera de rango"""
+    centavos = np.round(np.asarray(centavos, dtype='float64'))
+    valido = np.isfinite(centavos) & (np.abs(centavos) < MAXIMO_CENTAVOS)
+    return np.where(valido, centavos, 0).astype(np.int64)
+
+
+def _texto_a_centavos(texto, decimal=None):
+    """Centavos int64 de una serie de textos (0 si no hay dígitos)"""
+    # El signo se busca después de quitar símbolos de moneda, letras y
+    # espacios ("$-1,234.56", "USD -1.234,56"); la "e" de un exponente se
+    # conserva y el signo menos Unicode cuenta como "-"
+    texto = (
+        texto.str.replace('\u2212', '-', regex=False)
+        .str.replace(r'(?<=[\d.,])[eE](?=[-+]?\d)', '\x00', regex=True)
+        .str.replace(r'[^\d.,()+\-\x00]', '', regex=True)
+        .str.replace('\x00', 'e', regex=False)
+    )
+    negativo = (
+        texto.str.startswith('(') & texto.str.endswith(')')
+    ) | texto.str.startswith('-') | texto.str.endswith('-')
+    limpio = texto.str.replace(r'[^\d.,]', '', regex=True)
+
+    ultimo_punto = limpio.str.rfind('.').to_numpy()
+    ultima_coma = limpio.str.rfind(',').to_numpy()
+    if decimal is None:
+        # El último separador es decimal si hay de ambos tipos; con uno solo,
+        # es de miles si se repite o si lo siguen exactamente tres dígitos
+        # ("1.234" o "1,234"), y decimal en otro caso ("1234,5") o si la parte
+        # entera es cero ("0.500"), que nunca es un grupo de miles.
+        ultimo = np.maximum(ultimo_punto, ultima_coma)
+        ambos = (ultimo_punto >= 0) & (ultima_coma >= 0)
+        repetido = (limpio.str.count(r'[.,]') > 1).to_numpy()
+        digitos_despues = limpio.str.len().to_numpy() - ultimo - 1
+        entero_cero = limpio.str.match(r'^0*[.,]\d+$').to_numpy(dtype=bool)
+        es_decimal = (ultimo >= 0) & (ambos | (~repetido & ((digitos_despues != 3) | entero_cero)))
+        punto_decimal = es_decimal & (ultimo_punto > ultima_coma)
+        coma_decimal = es_decimal & (ultima_coma > ultimo_punto)
+    else:
+        punto_decimal = np.full(len(limpio), decimal == '.') & (ultimo_punto >= 0)
+        coma_decimal = np.full(len(limpio), decimal == ',') & (ultima_coma >= 0)
+
+    # Quitar separadores de miles y dejar el punto como único separador decimal
+    normalizado = limpio.str.replace(r'[.,]', '', regex=True)
+    normalizado[punto_decimal] = limpio[punto_decimal].str.replace(',', '', regex=False)
+    normalizado[coma_decimal] = (
+        limpio[coma_decimal].str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    )
+    # Para redondear al centavo bastan tres decimales
+    normalizado = normalizado.str.replace(r'(\.\d{3})\d+$', r'\1', regex=True)
+    punto = normalizado.str.find('.').to_numpy()
+    longitud = normalizado.str.len().to_numpy()
+    decimales = np.where(punto >= 0, longitud - punto - 1, 0)
+    digitos = normalizado.str.replace('.', '', regex=False)
+    digitos = digitos.where(digitos != '', '0')
+
+    # Lo que no cabe en int64 (como número o ya en centavos) se descarta
+    aproximado = pd.to_numeric(digitos).to_numpy(dtype='float64')
+    en_rango = (aproximado < MAXIMO_CENTAVOS) & (aproximado * 10.0 ** (2 - decimales) < MAXIMO_CENTAVOS)
+    valor = pd.to_numeric(digitos.where(en_rango, '0')).to_numpy(dtype=np.int64)
+
+    # Escalar a centavos; con tres decimales se redondea mitad hacia arriba
+    centavos = np.where(
+        decimales <= 2,
+        valor * _POTENCIAS_10[np.clip(2 - decimales, 0, None)],
+        (valor + 5) // 10
+    )
+
+    # La notación científica no tiene separadores de miles: se interpreta como float
+    exponente = texto.str.match(_PATRON_EXPONENTE).to_numpy(dtype=bool)
+    if exponente.any():
+        numeros = pd.to_numeric(texto[exponente].str.replace(',', '.', regex=False), errors='coerce')
+        centavos[exponente] = np.abs(_redondear_centavos(numeros.to_numpy(dtype='float64') * 100))
+    return pd.Series(np.where(negativo.to_numpy(), -centavos, centavos), index=texto.index)
+
+
+def a_centavos(serie, decimal=None):
+    """Convertir una columna de importes a centavos int64 (0 si no es un importe)
+
+    Los valores numéricos se redondean al centavo; los textos se interpretan
+    con `decimal` como separador decimal o, si es None, deduciéndolo de cada
+    valor. Los importes no finitos o mayores que MAXIMO_CENTAVOS también dan 0.
+    """
+    if pd.api.types.is_bool_dtype(serie) or pd.api.types.is_numeric_dtype(serie):
+        valores = pd.to_numeric(serie, errors='coerce').to_numpy(dtype='float64')
+        return pd.Series(_redondear_centavos(valores * 100), index=serie.index)
+
+    # Columnas mixtas (p. ej. Excel): números tal cual, textos con el parser regional
+    es_texto = (serie.str.len().notna() if serie.dtype == object else serie.notna()).to_numpy()
+    centavos = np.zeros(len(serie), dtype=np.int64)
+    if (~es_texto).any():
+        numeros = pd.to_numeric(serie[~es_texto], errors='coerce').to_numpy(dtype='float64')
+        centavos[~es_texto] = _redondear_centavos(numeros * 100)
+    if es_texto.any():
+        # Los importes se repiten mucho en un libro: se interpreta cada texto distinto una vez
+        codigos, unicos = pd.factorize(serie[es_texto].astype(str))
+        centavos[es_texto] = _texto_a_centavos(pd.Series(unicos), decimal).to_numpy()[codigos]
+    return pd.Series(centavos, index=serie.index)
+
+
+def _cantidad_digitos(valores):
+    return np.searchsorted(_POTENCIAS_10, valores, side='right')
+
+
+def montos_redondos(centavos, magnitudes=(10000,), digitos_repetidos=0):
+    """Máscara de montos redondos y la magnitud o patrón que los hace sospechosos
+
+    Un monto es redondo si es múltiplo exacto de alguna de las `magnitudes`
+    (en unidades monetarias) o si sus últimos `digitos_repetidos` dígitos
+    enteros son el mismo dígito distinto de cero (9.999, 149.999, 77.777).
+    Devuelve (máscara, magnitud) donde magnitud es la mayor que se cumple, -1
+    para dígitos repetidos y 0 si no aplica.
+    """
+    centavos = np.abs(np.asarray(centavos, dtype=np.int64))
+    positivo = centavos > 0
+    magnitud = np.zeros(len(centavos), dtype=np.int64)
+
+    for valor in sorted(magnitudes):
+        paso = int(round(valor * 100))
+        if paso > 0:
+            magnitud = np.where(positivo & (centavos % paso == 0), valor, magnitud)
+
+    if digitos_repetidos:
+        k = int(digitos_repetidos)
+        pesos, resto = np.divmod(centavos, 100)
+        repunit = (10 ** k - 1) // 9
+        cola = pesos % 10 ** k
+        repetido = (
+            (resto == 0) & (_cantidad_digitos(pesos) >= k)
+            & (cola % repunit == 0) & (cola // repunit >= 1)
+        )
+        magnitud = np.where((magnitud == 0) & repetido, -1, magnitud)
+
+    return magnitud != 0, magnitud
+
+
+def diferencias_saldo(centavos_debe, centavos_haber, tolerancia_centavos=1):
+    """Máscara de asientos cuya diferencia debe - haber supera la tolerancia"""
+    diferencia = np.asarray(centavos_debe, dtype=np.int64) - np.asarray(centavos_haber, dtype=np.int64)
+    return np.abs(diferencia) > tolerancia_centavos
+
+
+def formatear_centavos(centavos):
+    """'$1,234.56' a partir de centavos enteros, sin pasar por float"""
+    signo = '-' if centavos < 0 else ''
+    pesos, resto = divmod(abs(int(centavos)), 100)
+    return f"{signo}${pesos:,}.{resto:02d}"
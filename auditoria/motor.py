@@ -0,0 +1,489 @@
+"""Motor de auditoría de asientos contables (sin dependencias de la interfaz)."""
+import copy
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from auditoria.configuracion import CRITERIOS_AUDITORIA, FERIADOS
+from auditoria.atipicos import detectar_atipicos
+from auditoria.cubo import CuboAuditoria
+from auditoria.ingesta import detectar_columnas
+from auditoria.montos import a_centavos, diferencias_saldo, formatear_centavos, montos_redondos
+from auditoria.plan import CRITERIO_FECHAS, planificar_criterios
+from auditoria.progreso import ReporteProgreso
+from auditoria.ranking import top_criticos
+
+
+class SistemaAuditoriaAsientos:
+    def __init__(self, materialidad=170000):
+        self.materialidad = materialidad
+        self.df_original = None
+        self.df_procesado = None
+        self.resultados = None
+        self.estadisticas = None
+        self.asientos_irregulares = None
+        self.resumen_delta = None
+        self.fecha_ejecucion = None
+
+        # Criterios de auditoría (copia propia para poder ajustarlos por instancia)
+        self.criterios_auditoria = copy.deepcopy(CRITERIOS_AUDITORIA)
+        
+        # Feriados
+        self.feriados = list(FERIADOS)
+        
+        # Columnas identificadas al cargar los datos
+        self.columnas_detectadas = {}
+        
+        # Criterios aplicables al libro y columnas reales que evalúa cada uno
+        self.plan_evaluacion = None
+        
+        # Agregados para filtrar el dashboard
+        self.cubo = None
+        
+        # Derivados de `resultados`, calculados una vez por ejecución
+        self._mascara_material = None
+        self._asientos_criticos = None
+
+    def cargar_datos(self, df, progreso=None):
+        """Cargar y preparar datos para auditoría"""
+        progreso = progreso or ReporteProgreso()
+        progreso.iniciar('normalizacion', total=len(df))
+        
+        # El libro no se modifica: se guarda el mismo objeto (el que ya comparte
+        # el almacén) y la versión procesada es una copia superficial a la que
+        # solo se le agregan columnas
+        self.df_original = df
+        self.df_procesado = df.copy(deep=False)
+        
+        # Identificar columnas de monto, fecha y cuenta
+        columnas = detectar_columnas(df.columns)
+        columna_debe = columnas['debe']
+        columna_haber = columnas['haber']
+        
+        if not columna_debe:
+            raise ValueError("No se pudo identificar columna de monto")
+        
+        # Montos en centavos enteros: los criterios de monto comparan enteros
+        # exactos; las columnas Monto_* (float) quedan para mostrar y agregar
+        centavos_debe = a_centavos(self.df_procesado[columna_debe])
+        if columna_haber:
+            centavos_haber = a_centavos(self.df_procesado[columna_haber])
+            centavos_auditoria = centavos_debe - centavos_haber
+        else:
+            centavos_haber = pd.Series(0, index=self.df_procesado.index, dtype=np.int64)
+            centavos_auditoria = centavos_debe
+        
+        self.df_procesado['Centavos_Debe'] = centavos_debe
+        self.df_procesado['Centavos_Haber'] = centavos_haber
+        self.df_procesado['Centavos_Absoluto'] = centavos_auditoria.abs()
+        self.df_procesado['Monto_Debe'] = centavos_debe / 100
+        if columna_haber:
+            self.df_procesado['Monto_Haber'] = centavos_haber / 100
+        
+        # Calcular monto absoluto para auditoría
+        self.df_procesado['Monto_Auditoria'] = centavos_auditoria / 100
+        self.df_procesado['Monto_Absoluto'] = self.df_procesado['Centavos_Absoluto'] / 100
+        
+        # Preparar fechas
+        columna_fecha = columnas['fecha']
+        if columna_fecha:
+            self.df_procesado['Fecha_Procesada'] = pd.to_datetime(
+                self.df_procesado[columna_fecha], errors='coerce'
+            )
+        else:
+            self.df_procesado['Fecha_Procesada'] = pd.NaT
+        
+        self.columnas_detectadas = columnas
+        self.planificar_evaluacion()
+        
+        progreso.finalizar()
+        return self.df_procesado
+    
+    def planificar_evaluacion(self):
+        """Resolver qué criterios aplican a las columnas del libro cargado"""
+        libro = self.df_original if self.df_original is not None else self.df_procesado
+        columnas = libro.columns if libro is not None else []
+        self.plan_evaluacion = planificar_criterios(
+            self.criterios_auditoria, columnas, self.columnas_detectadas
+        )
+        return self.plan_evaluacion
+    
+    def aplicar_auditoria(self, progreso=None, cancelacion=None, tam_bloque=2000):
+        """Aplicar todos los criterios de auditoría
+
+        Los asientos se procesan en bloques de `tam_bloque` filas. Tras cada
+        bloque se informa el avance y las estadísticas parciales a `progreso`
+        (un `ReporteProgreso`) y se invoca `cancelacion()`, que puede lanzar
+        una excepción para detener la ejecución.
+        """
+        if self.df_procesado is None:
+            raise ValueError("Primero debe cargar los datos")
+        
+        progreso = progreso or ReporteProgreso()
+        self.resultados, self.asientos_irregulares = self.evaluar_asientos(
+            self.df_procesado, progreso, cancelacion, tam_bloque
+        )
+        
+        progreso.iniciar('estadisticas', total=len(self.resultados))
+        self._calcular_estadisticas()
+        progreso.finalizar()
+        return self.resultados
+    
+    def evaluar_asientos(self, df, progreso=None, cancelacion=None, tam_bloque=2000):
+        """Evaluar los criterios sobre `df` sin modificar el estado del sistema
+        
+        Devuelve el DataFrame de resultados por asiento y el de irregularidades.
+        """
+        progreso = progreso or ReporteProgreso()
+        resultados = []
+        detalles_irregulares = []
+        
+        total_asientos = len(df)
+        progreso.iniciar('criterios', total=total_asientos)
+        parciales = {
+            'asientos_materiales': 0,
+            'asientos_con_criterios': 0,
+            'irregularidades': 0,
+            'criterios': {criterio: 0 for criterio in self.criterios_auditoria}
+        }
+        
+        # Los criterios pueden haberse ajustado después de cargar los datos
+        plan = self.planificar_evaluacion()
+        
+        # Criterios vectorizados: se evalúan una vez sobre todo `df`
+        vectorizados = {**self._criterios_monto(df), **self._montos_atipicos(df)}
+        vectorizados = {c: d for c, d in vectorizados.items() if c in plan['activos']}
+        
+        for inicio in range(0, total_asientos, tam_bloque):
+            bloque = df.iloc[inicio:inicio + tam_bloque]
+            detalles_bloque = {c: d[inicio:inicio + tam_bloque] for c, d in vectorizados.items()}
+            self._auditar_bloque(bloque, resultados, detalles_irregulares, parciales, detalles_bloque, plan)
+            parciales['irregularidades'] = len(detalles_irregulares)
+            
+            if cancelacion is not None:
+                cancelacion()
+            progreso.avanzar(len(bloque), {**parciales, 'criterios': dict(parciales['criterios'])})
+        progreso.finalizar()
+        
+        return pd.DataFrame(resultados), pd.DataFrame(detalles_irregulares)
+    
+    def _criterios_monto(self, df):
+        """Criterios 5.10 y 5.11 evaluados de una vez sobre los centavos
+        
+        Devuelve {criterio: arreglo de detalles} con None donde no aplica.
+        """
+        centavos = df['Centavos_Absoluto'].to_numpy()
+        evaluados = {}
+        
+        config = self.criterios_auditoria.get('5.10_Montos_Sospechosos')
+        if config is not None:
+            aplica, magnitud = montos_redondos(
+                centavos,
+                config.get('magnitudes', (10000,)),
+                config.get('digitos_repetidos', 0)
+            )
+            detalles = np.full(len(df), None, dtype=object)
+            for i in np.flatnonzero(aplica):
+                patron = 'dígitos repetidos' if magnitud[i] < 0 else f"múltiplo de {magnitud[i]:,}"
+                detalles[i] = f"Monto sospechoso: {formatear_centavos(centavos[i])} ({patron})"
+            evaluados['5.10_Montos_Sospechosos'] = detalles
+        
+        config = self.criterios_auditoria.get('5.11_Diferencias_Saldo')
+        if config is not None:
+            debe = df['Centavos_Debe'].to_numpy()
+            haber = df['Centavos_Haber'].to_numpy()
+            aplica = diferencias_saldo(debe, haber, config.get('tolerancia_centavos', 1))
+            detalles = np.full(len(df), None, dtype=object)
+            for i in np.flatnonzero(aplica):
+                detalles[i] = (
+                    f"Diferencia: Debe={formatear_centavos(debe[i])}, "
+                    f"Haber={formatear_centavos(haber[i])}"
+                )
+            evaluados['5.11_Diferencias_Saldo'] = detalles
+        
+        return evaluados
+    
+    def _montos_atipicos(self, df):
+        """Criterio 5.12: montos atípicos respecto del historial de su cuenta
+        
+        El historial se toma del libro completo (`df_procesado`), aunque solo
+        se evalúen las filas de `df` (auditorías incrementales).
+        """
+        config = self.criterios_auditoria.get('5.12_Montos_Atipicos_Cuenta')
+        columna_cuenta = self.columnas_detectadas.get('cuenta')
+        if config is None or not columna_cuenta:
+            return {}
+        detalles = np.full(len(df), None, dtype=object)
+        if len(df) == 0:
+            return {'5.12_Montos_Atipicos_Cuenta': detalles}
+        
+        libro = self.df_procesado if self.df_procesado is not None else df
+        atipicos = detectar_atipicos(
+            libro[columna_cuenta],
+            libro['Fecha_Procesada'],
+            libro['Centavos_Absoluto'],
+            ventana=config.get('ventana', 30),
+            minimo_observaciones=config.get('minimo_observaciones', 10),
+            umbral=config.get('umbral', 3.5)
+        )
+        if df is not libro:
+            atipicos.index = libro.index
+            atipicos = atipicos.loc[df.index]
+        
+        centavos = df['Centavos_Absoluto'].to_numpy()
+        cuentas = df[columna_cuenta].to_numpy()
+        mediana = atipicos['Mediana'].to_numpy()
+        puntaje = atipicos['Puntaje'].to_numpy()
+        for i in np.flatnonzero(atipicos['Atipico'].to_numpy()):
+            detalles[i] = (
+                f"Monto atípico en cuenta {cuentas[i]}: {formatear_centavos(centavos[i])} "
+                f"vs mediana {formatear_centavos(round(mediana[i]))} (puntaje {puntaje[i]:.1f})"
+            )
+        return {'5.12_Montos_Atipicos_Cuenta': detalles}
+    
+    def _auditar_bloque(self, bloque, resultados, detalles_irregulares, parciales, vectorizados, plan):
+        """Evaluar los criterios activos del `plan` sobre un bloque de asientos
+        
+        `vectorizados` trae, para los criterios ya evaluados sobre todo el
+        libro, el detalle de cada fila del bloque (None si no aplica). Los
+        criterios omitidos por el plan quedan en 0 sin evaluarse.
+        """
+        activos = [
+            (criterio, self.criterios_auditoria[criterio], columnas)
+            for criterio, columnas in plan['activos'].items()
+        ]
+        for posicion, (idx, asiento) in enumerate(bloque.iterrows()):
+            detalles_criterios = []
+            criterios_detalle = {}
+            
+            monto = asiento.get('Monto_Absoluto', 0)
+            es_material = monto >= self.materialidad
+            
+            # Aplicar cada criterio
+            for criterio, config, columnas in activos:
+                aplica_criterio = False
+                detalle_aplicacion = ""
+                nivel_riesgo = config.get('nivel_riesgo', 'medio')
+                
+                if criterio == CRITERIO_FECHAS:
+                    # Criterio especial para fechas
+                    fecha = asiento.get('Fecha_Procesada')
+                    if not pd.isna(fecha):
+                        # Verificar fin de semana
+                        if fecha.weekday() >= 5:
+                            aplica_criterio = True
+                            detalle_aplicacion = f"Fin de semana: {fecha.strftime('%Y-%m-%d')}"
+                        # Verificar feriado
+                        fecha_str = fecha.strftime('%Y-%m-%d')
+                        if fecha_str in self.feriados:
+                            aplica_criterio = True
+                            detalle_aplicacion = f"Feriado: {fecha_str}"
+                
+                elif criterio in vectorizados:
+                    # Montos redondos, diferencias de saldo y montos atípicos
+                    detalle = vectorizados[criterio][posicion]
+                    if detalle is not None:
+                        aplica_criterio = True
+                        detalle_aplicacion = detalle
+                
+                else:
+                    # Criterios basados en texto, solo sobre las columnas presentes
+                    for columna in columnas:
+                        if pd.notna(asiento[columna]):
+                            texto = str(asiento[columna]).lower()
+                            for palabra in config['palabras_clave']:
+                                if palabra.lower() in texto:
+                                    aplica_criterio = True
+                                    detalle_aplicacion = f"'{palabra}' encontrado en {columna}"
+                                    break
+                        if aplica_criterio:
+                            break
+                
+                if aplica_criterio:
+                    detalles_criterios.append(f"{criterio}: {detalle_aplicacion}")
+                    criterios_detalle[criterio] = {
+                        'detalle': detalle_aplicacion,
+                        'riesgo': nivel_riesgo
+                    }
+                    
+                    # Registrar como irregular si es de alto riesgo y material
+                    if nivel_riesgo == 'alto' and es_material:
+                        detalles_irregulares.append({
+                            'ID_Asiento': idx,
+                            'Criterio': criterio,
+                            'Detalle': detalle_aplicacion,
+                            'Monto': monto,
+                            'Nivel_Riesgo': nivel_riesgo
+                        })
+            
+            # Crear registro de resultado
+            resultado = {
+                'ID_Asiento': idx,
+                'Monto_Original': asiento.get('Monto_Auditoria', 0),
+                'Monto_Absoluto': monto,
+                'Material': 'Sí' if es_material else 'No',
+                'Total_Criterios': len(criterios_detalle),
+                'Criterios_Detalle': criterios_detalle,
+                'Detalles_Criterios': ' | '.join(detalles_criterios) if detalles_criterios else 'Ninguno'
+            }
+            
+            # Agregar cada criterio individualmente
+            for criterio in self.criterios_auditoria:
+                resultado[criterio] = 1 if criterio in criterios_detalle else 0
+            
+            resultados.append(resultado)
+            
+            # Estadísticas parciales
+            parciales['asientos_materiales'] += int(es_material)
+            parciales['asientos_con_criterios'] += int(resultado['Total_Criterios'] > 0)
+            for criterio in criterios_detalle:
+                parciales['criterios'][criterio] += 1
+    
+    def contar_resultados(self, resultados, material=None):
+        """Conteos y montos aditivos de un conjunto de resultados
+        
+        Los conteos de dos conjuntos disjuntos se pueden sumar (o restar) para
+        actualizar las estadísticas sin recorrer de nuevo todos los resultados.
+        `material` es la máscara de asientos materiales, si ya está calculada.
+        """
+        conteos = {
+            'total_asientos': len(resultados),
+            'asientos_materiales': 0,
+            'asientos_multiple_criterio': 0,
+            'asientos_alto_riesgo': 0,
+            'asientos_criticos_count': 0,
+            'monto_total_material': 0.0,
+            'monto_total': 0.0,
+            'criterios': {criterio: 0 for criterio in self.criterios_auditoria}
+        }
+        if len(resultados) == 0:
+            return conteos
+        
+        if material is None:
+            material = (resultados['Material'] == 'Sí').to_numpy()
+        total_criterios = resultados['Total_Criterios'].to_numpy()
+        monto = resultados['Monto_Absoluto'].to_numpy(dtype='float64')
+        
+        conteos['asientos_materiales'] = int(material.sum())
+        conteos['asientos_multiple_criterio'] = int((total_criterios > 1).sum())
+        conteos['asientos_alto_riesgo'] = int((material & (total_criterios >= 2)).sum())
+        conteos['asientos_criticos_count'] = int((material & (total_criterios > 0)).sum())
+        conteos['monto_total_material'] = float(monto[material].sum())
+        conteos['monto_total'] = float(monto.sum())
+        
+        # Todos los criterios en una sola suma por columnas
+        criterios = [c for c in self.criterios_auditoria if c in resultados.columns]
+        if criterios:
+            por_criterio = resultados[criterios].to_numpy(dtype=np.int64).sum(axis=0)
+            for criterio, count in zip(criterios, por_criterio):
+                conteos['criterios'][criterio] = int(count)
+        return conteos
+    
+    def mascara_material(self):
+        """Máscara booleana de asientos materiales de `resultados` (se calcula una vez por ejecución)"""
+        if self._mascara_material is None:
+            self._mascara_material = (self.resultados['Material'] == 'Sí').to_numpy(dtype=bool)
+        return self._mascara_material
+    
+    @property
+    def asientos_criticos(self):
+        """Asientos materiales con algún criterio, del más al menos crítico
+        
+        Se ordenan la primera vez que se piden; las estadísticas y los top-N
+        del reporte no necesitan el orden completo (ver `ranking`).
+        """
+        if self._asientos_criticos is None and self.resultados is not None:
+            if len(self.resultados) > 0:
+                criticos = self.mascara_material() & (self.resultados['Total_Criterios'].to_numpy() > 0)
+                self._asientos_criticos = top_criticos(self.resultados, int(criticos.sum()), criticos)
+            else:
+                self._asientos_criticos = self.resultados
+        return self._asientos_criticos
+    
+    def ranking(self, n=10, criterio=None, cuenta=None, mes=None, solo_criticos=True):
+        """Los `n` asientos más críticos (más criterios y, a igualdad, mayor monto)
+        
+        Se puede restringir a un criterio, a una cuenta o a un mes ('AAAA-MM').
+        Los filtros son vectoriales y la selección es parcial, por lo que el
+        costo es lineal en la cantidad de asientos.
+        """
+        resultados = self.resultados
+        if resultados is None or len(resultados) == 0:
+            return resultados
+        
+        mascara = np.ones(len(resultados), dtype=bool)
+        if solo_criticos:
+            mascara &= self.mascara_material() & (resultados['Total_Criterios'].to_numpy() > 0)
+        if criterio is not None:
+            mascara &= resultados[criterio].to_numpy() == 1
+        if cuenta is not None or mes is not None:
+            # Los resultados siguen el orden de las filas del libro procesado
+            libro = self.df_procesado
+            if len(libro) != len(resultados):
+                libro = libro.loc[resultados['ID_Asiento']]
+            if cuenta is not None:
+                columna_cuenta = self.columnas_detectadas.get('cuenta')
+                if columna_cuenta is None:
+                    mascara[:] = False
+                else:
+                    mascara &= (libro[columna_cuenta].astype(str) == str(cuenta)).to_numpy()
+            if mes is not None:
+                anio, numero_mes = (int(parte) for parte in mes.split('-'))
+                fechas = libro['Fecha_Procesada']
+                mascara &= ((fechas.dt.year == anio) & (fechas.dt.month == numero_mes)).to_numpy()
+        
+        return top_criticos(resultados, n, mascara)
+    
+    def _calcular_estadisticas(self, conteos=None):
+        """Calcular estadísticas detalladas del análisis
+        
+        Si se entregan `conteos` (ver `contar_resultados`) se usan directamente
+        en lugar de recalcularlos sobre todos los resultados.
+        """
+        self._mascara_material = None
+        self._asientos_criticos = None
+        if conteos is None:
+            material = self.mascara_material() if len(self.resultados) > 0 else None
+            conteos = self.contar_resultados(self.resultados, material)
+        
+        stats = {}
+        total = conteos['total_asientos']
+        
+        stats['total_asientos'] = total
+        stats['asientos_materiales'] = conteos['asientos_materiales']
+        stats['porcentaje_materiales'] = (stats['asientos_materiales'] / total) * 100 if total else 0.0
+        
+        # Estadísticas por criterio
+        criterios_stats = {}
+        for criterio in self.criterios_auditoria.keys():
+            if criterio in conteos['criterios']:
+                count = conteos['criterios'][criterio]
+                porcentaje = (count / total) * 100 if total else 0.0
+                nivel_riesgo = self.criterios_auditoria[criterio].get('nivel_riesgo', 'medio')
+                criterios_stats[criterio] = {
+                    'count': count,
+                    'porcentaje': porcentaje,
+                    'descripcion': self.criterios_auditoria[criterio]['descripcion'],
+                    'nivel_riesgo': nivel_riesgo
+                }
+        
+        stats['criterios'] = criterios_stats
+        stats['criterios_omitidos'] = dict(self.plan_evaluacion['omitidos']) if self.plan_evaluacion else {}
+        stats['asientos_multiple_criterio'] = conteos['asientos_multiple_criterio']
+        stats['asientos_alto_riesgo'] = conteos['asientos_alto_riesgo']
+        
+        # Asientos críticos (alto riesgo + material); la tabla ordenada se arma al pedirla
+        stats['asientos_criticos_count'] = conteos['asientos_criticos_count']
+        
+        # Montos totales
+        stats['monto_total_material'] = conteos['monto_total_material']
+        stats['monto_total'] = conteos['monto_total']
+        stats['conteos'] = conteos
+        
+        self.estadisticas = stats
+        self.fecha_ejecucion = datetime.now()
+        
+        # Agregados para el dashboard, una sola vez por ejecución
+        self.cubo = CuboAuditoria.desde_sistema(self)
+        return stats
@@ -0,0 +1,164 @@
+"""Paquete columnar de una auditoría: tablas en Parquet y metadatos, en un solo .zip.
+
+El paquete guarda los resultados, las irregularidades, el libro procesado y
+las estadísticas. Cada Parquet lleva en los metadatos de su esquema la
+materialidad, la versión de criterios y la fecha de ejecución, de modo que
+las herramientas de BI pueden leer las tablas sin abrir el resto. Un paquete
+se puede volver a abrir en el dashboard sin repetir la ingesta ni la
+auditoría. Requiere pyarrow.
+"""
+import io
+import json
+import zipfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from auditoria.delta import version_criterios
+from auditoria.motor import SistemaAuditoriaAsientos
+from auditoria.progreso import ReporteProgreso
+
+VERSION_PAQUETE = 1
+CLAVE_METADATOS = b'hlb_auditoria'
+
+# Archivo del paquete -> atributo del sistema
+TABLAS_PAQUETE = {
+    'resultados.parquet': 'resultados',
+    'irregularidades.parquet': 'asientos_irregulares',
+    'libro.parquet': 'df_procesado'
+}
+
+
+def a_json(valor):
+    """Convertir tipos de numpy/pandas a tipos nativos para json.dumps"""
+    if isinstance(valor, np.integer):
+        return int(valor)
+    if isinstance(valor, np.floating):
+        return float(valor)
+    if isinstance(valor, (pd.Timestamp, np.datetime64)):
+        return str(valor)
+    return str(valor)
+
+
+def preparar_para_parquet(df):
+    """Convertir columnas de objetos a tipos que Parquet puede almacenar"""
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object:
+            # Los faltantes (None, NaN, NaT) quedan como nulos, no como el texto 'nan'
+            df[col] = df[col].map(
+                lambda v: json.dumps(v, ensure_ascii=False, default=a_json) if isinstance(v, (dict, list))
+                else None if pd.api.types.is_scalar(v) and pd.isna(v)
+                else str(v)
+            )
+    return df
+
+
+def _columnas_json(df):
+    """Columnas de objetos que contienen diccionarios o listas (se guardan como JSON)"""
+    columnas = []
+    for col in df.columns:
+        if df[col].dtype == object:
+            valores = df[col].dropna()
+            if len(valores) > 0 and isinstance(valores.iloc[0], (dict, list)):
+                columnas.append(str(col))
+    return columnas
+
+
+def _metadatos(sistema):
+    fecha = sistema.fecha_ejecucion
+    return {
+        'version_paquete': VERSION_PAQUETE,
+        'materialidad': sistema.materialidad,
+        'version_criterios': version_criterios(sistema),
+        'fecha_ejecucion': fecha.isoformat() if fecha is not None else None,
+        'fecha_exportacion': datetime.now().isoformat(timespec='seconds'),
+        'criterios_auditoria': sistema.criterios_auditoria,
+        'feriados': list(sistema.feriados),
+        'columnas_detectadas': sistema.columnas_detectadas,
+        'plan_evaluacion': sistema.plan_evaluacion,
+        'columnas_originales': [str(c) for c in sistema.df_original.columns] if sistema.df_original is not None else None,
+        'resumen_delta': sistema.resumen_delta
+    }
+
+
+def exportar_paquete(sistema, progreso=None):
+    """Bytes del paquete .zip de una auditoría terminada"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if sistema.resultados is None:
+        raise ValueError("Primero debe ejecutar la auditoría")
+
+    tablas = {archivo: getattr(sistema, atributo) for archivo, atributo in TABLAS_PAQUETE.items()}
+    progreso = progreso or ReporteProgreso()
+    progreso.iniciar('exportacion', total=sum(len(df) for df in tablas.values() if df is not None))
+
+    metadatos = _metadatos(sistema)
+    salida = io.BytesIO()
+    # Los Parquet ya van comprimidos con zstd: el zip solo los agrupa
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_STORED) as paquete:
+        for archivo, df in tablas.items():
+            if df is None:
+                continue
+            tabla = pa.Table.from_pandas(preparar_para_parquet(df))
+            meta_tabla = {**metadatos, 'columnas_json': _columnas_json(df)}
+            tabla = tabla.replace_schema_metadata({
+                **(tabla.schema.metadata or {}),
+                CLAVE_METADATOS: json.dumps(meta_tabla, ensure_ascii=False, default=a_json).encode('utf-8')
+            })
+            buffer = io.BytesIO()
+            pq.write_table(tabla, buffer, compression='zstd')
+            paquete.writestr(archivo, buffer.getvalue())
+            progreso.avanzar(len(df))
+
+        paquete.writestr('estadisticas.json', json.dumps(sistema.estadisticas, ensure_ascii=False, default=a_json))
+        paquete.writestr('metadatos.json', json.dumps(metadatos, ensure_ascii=False, indent=2, default=a_json))
+
+    progreso.finalizar()
+    return salida.getvalue()
+
+
+def importar_paquete(contenido):
+    """Reconstruir un `SistemaAuditoriaAsientos` a partir de los bytes de un paquete"""
+    import pyarrow.parquet as pq
+
+    try:
+        paquete = zipfile.ZipFile(io.BytesIO(contenido))
+        metadatos = json.loads(paquete.read('metadatos.json'))
+    except (zipfile.BadZipFile, KeyError, ValueError):
+        raise ValueError("El archivo no es un paquete de auditoría HLB")
+    if metadatos.get('version_paquete') != VERSION_PAQUETE:
+        raise ValueError(f"Versión de paquete no soportada: {metadatos.get('version_paquete')}")
+
+    sistema = SistemaAuditoriaAsientos(materialidad=metadatos['materialidad'])
+    sistema.criterios_auditoria = metadatos['criterios_auditoria']
+    sistema.feriados = metadatos['feriados']
+    sistema.columnas_detectadas = metadatos['columnas_detectadas']
+    sistema.plan_evaluacion = metadatos.get('plan_evaluacion')
+
+    with paquete:
+        for archivo, atributo in TABLAS_PAQUETE.items():
+            if archivo not in paquete.namelist():
+                continue
+            tabla = pq.read_table(io.BytesIO(paquete.read(archivo)))
+            meta_tabla = json.loads((tabla.schema.metadata or {}).get(CLAVE_METADATOS, b'{}'))
+            df = tabla.to_pandas()
+            for col in meta_tabla.get('columnas_json', []):
+                df[col] = df[col].map(lambda v: json.loads(v) if isinstance(v, str) else v)
+            setattr(sistema, atributo, df)
+        estadisticas = json.loads(paquete.read('estadisticas.json'))
+
+    columnas_originales = metadatos.get('columnas_originales')
+    if sistema.df_procesado is not None and columnas_originales:
+        presentes = [c for c in sistema.df_procesado.columns if str(c) in columnas_originales]
+        sistema.df_original = sistema.df_procesado[presentes]
+
+    # Críticos y cubo se derivan de los resultados con los conteos guardados
+    sistema._calcular_estadisticas(estadisticas['conteos'])
+    sistema.estadisticas = estadisticas
+    sistema.resumen_delta = metadatos.get('resumen_delta')
+    if metadatos.get('fecha_ejecucion'):
+        sistema.fecha_ejecucion = datetime.fromisoformat(metadatos['fecha_ejecucion'])
+    return sistema
@@ -0,0 +1,103 @@
+"""Plan de evaluación: qué criterios pueden aplicarse a un libro y sobre qué columnas.
+
+Antes de recorrer los asientos se resuelve, una sola vez, a qué encabezado
+real del libro corresponde cada columna de búsqueda de los criterios
+(comparando sin tildes ni mayúsculas, con los alias de `ALIAS_COLUMNAS` y,
+en último caso, por similitud con ellos). Los criterios que no pueden cumplirse con
+las columnas presentes se omiten con su motivo y no se evalúan.
+"""
+import difflib
+import re
+import unicodedata
+
+from auditoria.configuracion import ALIAS_COLUMNAS, SIMILITUD_MINIMA_ENCABEZADO
+
+CRITERIO_FECHAS = '5.7_Fines_Semana_Feriados'
+CRITERIO_ATIPICOS = '5.12_Montos_Atipicos_Cuenta'
+
+# Criterios que dependen de una columna identificada por `detectar_columnas`
+REQUISITOS_DETECTADOS = {
+    CRITERIO_FECHAS: ('fecha', 'sin columna de fecha'),
+    CRITERIO_ATIPICOS: ('cuenta', 'sin columna de cuenta')
+}
+
+# Criterios que solo usan los montos (siempre presentes tras `cargar_datos`)
+CRITERIOS_MONTO = ('5.10_Montos_Sospechosos', '5.11_Diferencias_Saldo')
+
+
+def normalizar_encabezado(nombre):
+    """'Descripción ' -> 'descripcion': sin tildes, mayúsculas, espacios ni signos"""
+    texto = unicodedata.normalize('NFKD', str(nombre))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r'[^0-9a-z]', '', texto.lower())
+
+
+def resolver_columna(nombre, columnas):
+    """Encabezado de `columnas` que corresponde a `nombre` (None si no hay)
+
+    Primero el nombre exacto, luego el nombre o sus alias normalizados y por
+    último el encabezado más parecido al nombre o a sus alias. Solo los nombres
+    con alias en `ALIAS_COLUMNAS` admiten esta última búsqueda aproximada.
+    """
+    if nombre in columnas:
+        return nombre
+    normalizadas = {}
+    for col in columnas:
+        normalizadas.setdefault(normalizar_encabezado(col), col)
+    candidatos = [normalizar_encabezado(c) for c in [nombre, *ALIAS_COLUMNAS.get(nombre, [])]]
+    for clave in candidatos:
+        if clave in normalizadas:
+            return normalizadas[clave]
+    if nombre not in ALIAS_COLUMNAS:
+        return None
+    mejor, similitud = None, SIMILITUD_MINIMA_ENCABEZADO
+    for clave in candidatos:
+        parecidas = difflib.get_close_matches(clave, list(normalizadas), n=1, cutoff=similitud)
+        if parecidas:
+            mejor = parecidas[0]
+            similitud = difflib.SequenceMatcher(None, clave, mejor).ratio()
+    return normalizadas[mejor] if mejor else None
+
+
+def planificar_criterios(criterios, columnas, columnas_detectadas):
+    """Plan de evaluación de `criterios` sobre un libro con `columnas`
+
+    Devuelve un diccionario con:
+    - 'activos': {criterio: columnas reales que evalúa} en el orden de `criterios`
+    - 'omitidos': {criterio: motivo}
+    - 'columnas': {columna de búsqueda: encabezado real o None}
+    """
+    columnas = list(columnas)
+    resueltas = {}
+    activos, omitidos = {}, {}
+
+    for criterio, config in criterios.items():
+        if criterio in REQUISITOS_DETECTADOS:
+            tipo, motivo = REQUISITOS_DETECTADOS[criterio]
+            columna = columnas_detectadas.get(tipo)
+            if columna:
+                activos[criterio] = [columna]
+            else:
+                omitidos[criterio] = motivo
+            continue
+        if criterio in CRITERIOS_MONTO:
+            activos[criterio] = []
+            continue
+
+        busqueda = config.get('columnas_busqueda', [])
+        if not config.get('palabras_clave'):
+            omitidos[criterio] = 'sin palabras clave'
+            continue
+        reales = []
+        for nombre in busqueda:
+            if nombre not in resueltas:
+                resueltas[nombre] = resolver_columna(nombre, columnas)
+            # Dos nombres pueden resolver al mismo encabezado: se revisa una vez
+            if resueltas[nombre] is not None and resueltas[nombre] not in reales:
+                reales.append(resueltas[nombre])
+        if reales:
+            activos[criterio] = reales
+        else:
+            omitidos[criterio] = f"ninguna columna de búsqueda presente ({', '.join(busqueda)})"
+
+    return {'activos': activos, 'omitidos': omitidos, 'columnas': resueltas}
@@ -0,0 +1,137 @@
+"""Reporte de avance por etapas para ejecuciones por bloques."""
+import logging
+import time
+from collections import OrderedDict
+
+# Etapas de una ejecución completa, en orden
+ETAPAS = ('ingesta', 'normalizacion', 'criterios', 'estadisticas', 'exportacion')
+
+NOMBRES_ETAPAS = {
+    'ingesta': 'Lectura del archivo',
+    'normalizacion': 'Normalización de datos',
+    'criterios': 'Aplicación de criterios',
+    'estadisticas': 'Cálculo de estadísticas',
+    'exportacion': 'Exportación'
+}
+
+
+class ReporteProgreso:
+    """Contadores de filas procesadas por etapa con envío limitado por tiempo.
+
+    El código que procesa los datos llama a `avanzar` tras cada bloque; las
+    instantáneas se envían a `destino` como máximo una vez cada `intervalo`
+    segundos, además de al iniciar y finalizar cada etapa. El mismo reporte
+    sirve para la interfaz (a través de un trabajo en segundo plano) y para
+    ejecuciones sin interfaz (por ejemplo con `destino_registro`).
+    """
+
+    def __init__(self, destino=None, intervalo=0.5, reloj=time.monotonic):
+        self.destino = destino
+        self.intervalo = intervalo
+        self.reloj = reloj
+        self.etapas = OrderedDict()
+        self.etapa_actual = None
+        self.parciales = {}
+        self._ultimo_envio = None
+
+    def iniciar(self, etapa, total=None):
+        """Comenzar una etapa con el total de filas esperado (si se conoce)"""
+        self.etapa_actual = etapa
+        self.etapas[etapa] = {
+            'procesados': 0,
+            'total': total,
+            'inicio': self.reloj(),
+            'fin': None
+        }
+        self._emitir(forzar=True)
+
+    def avanzar(self, filas, parciales=None):
+        """Sumar filas procesadas a la etapa actual"""
+        etapa = self.etapas[self.etapa_actual]
+        etapa['procesados'] += filas
+        if parciales is not None:
+            self.parciales = parciales
+        self._emitir()
+
+    def finalizar(self, total=None):
+        """Cerrar la etapa actual; `total` corrige el conteo si no se conocía al iniciar"""
+        etapa = self.etapas[self.etapa_actual]
+        if total is not None:
+            etapa['total'] = total
+            etapa['procesados'] = total
+        elif etapa['total'] is not None:
+            etapa['procesados'] = etapa['total']
+        etapa['fin'] = self.reloj()
+        self._emitir(forzar=True)
+
+    def instantanea(self):
+        """Estado actual como diccionario simple (seguro para compartir entre hilos)"""
+        ahora = self.reloj()
+        etapas = OrderedDict()
+        for nombre, etapa in self.etapas.items():
+            transcurrido = (etapa['fin'] or ahora) - etapa['inicio']
+            procesados = etapa['procesados']
+            total = etapa['total']
+            filas_por_segundo = procesados / transcurrido if transcurrido > 0 else 0.0
+
+            if etapa['fin'] is not None:
+                eta = 0.0
+            elif total and filas_por_segundo > 0:
+                eta = max(0.0, (total - procesados) / filas_por_segundo)
+            else:
+                eta = None
+
+            etapas[nombre] = {
+                'nombre': NOMBRES_ETAPAS.get(nombre, nombre),
+                'procesados': procesados,
+                'total': total,
+                'fraccion': min(1.0, procesados / total) if total else (1.0 if etapa['fin'] is not None else 0.0),
+                'filas_por_segundo': filas_por_segundo,
+                'transcurrido': transcurrido,
+                'eta_segundos': eta,
+                'terminada': etapa['fin'] is not None
+            }
+
+        return {
+            'etapa': self.etapa_actual,
+            'etapas': etapas,
+            'parciales': self.parciales
+        }
+
+    def _emitir(self, forzar=False):
+        if self.destino is None:
+            return
+        ahora = self.reloj()
+        if not forzar and self._ultimo_envio is not None and ahora - self._ultimo_envio < self.intervalo:
+            return
+        self._ultimo_envio = ahora
+        self.destino(self.instantanea())
+
+
+def describir_etapa(datos):
+    """Texto breve de una etapa: filas, velocidad y tiempo estimado restante"""
+    if datos['total']:
+        texto = f"{datos['procesados']:,} de {datos['total']:,} filas"
+    else:
+        texto = f"{datos['procesados']:,} filas"
+    if datos['filas_por_segundo'] > 0:
+        texto += f" · {datos['filas_por_segundo']:,.0f} filas/s"
+    if datos['terminada']:
+        texto += f" · {datos['transcurrido']:.1f}s"
+    elif datos['eta_segundos'] is not None:
+        texto += f" · faltan ~{datos['eta_segundos']:.0f}s"
+    return texto
+
+
+def destino_registro(logger=None, nivel=logging.INFO):
+    """Destino para ejecuciones sin interfaz que escribe cada instantánea en el log"""
+    logger = logger or logging.getLogger('auditoria.progreso')
+
+    def registrar(instantanea):
+        etapa = instantanea['etapa']
+        if etapa is None:
+            return
+        datos = instantanea['etapas'][etapa]
+        logger.log(nivel, "%s: %s", datos['nombre'], describir_etapa(datos))
+
+    return registrar
@@ -0,0 +1,69 @@
+"""Selección de los N primeros sin ordenar todo el conjunto.
+
+Las claves de orden se combinan en un único entero y los N mayores se eligen
+con una selección parcial (`np.argpartition`, tiempo lineal); solo esos N se
+ordenan. Los empates se resuelven por posición, igual que un ordenamiento
+estable.
+"""
+import numpy as np
+
+_MAXIMO_INT64 = np.iinfo(np.int64).max
+
+
+def a_centavos_enteros(montos):
+    """Montos no negativos (float) como centavos int64 para usarlos en una clave"""
+    return np.rint(np.asarray(montos, dtype='float64') * 100).astype(np.int64)
+
+
+def clave_compuesta(primaria, secundaria):
+    """Clave int64 que ordena por `primaria` y luego por `secundaria` (enteros no negativos)
+
+    Devuelve None si la combinación no cabe en int64.
+    """
+    primaria = np.asarray(primaria, dtype=np.int64)
+    secundaria = np.asarray(secundaria, dtype=np.int64)
+    if len(primaria) == 0:
+        return primaria
+    base = int(secundaria.max()) + 1
+    if (int(primaria.max()) + 1) * base > _MAXIMO_INT64:
+        return None
+    return primaria * base + secundaria
+
+
+def indices_top(claves, n):
+    """Posiciones de las `n` claves mayores, de mayor a menor
+
+    Con empates en el límite se eligen las posiciones más bajas, de modo que
+    el resultado coincide con los primeros `n` de un orden estable
+    descendente.
+    """
+    claves = np.asarray(claves)
+    total = len(claves)
+    if n <= 0 or total == 0:
+        return np.array([], dtype=np.int64)
+    if n < total:
+        umbral = np.partition(claves, total - n)[total - n]
+        mayores = np.flatnonzero(claves > umbral)
+        iguales = np.flatnonzero(claves == umbral)[:n - len(mayores)]
+        candidatos = np.concatenate([mayores, iguales])
+    else:
+        candidatos = np.arange(total)
+    # Orden descendente por clave y ascendente por posición, solo sobre los elegidos
+    return candidatos[np.lexsort((candidatos, -claves[candidatos]))]
+
+
+def top_criticos(resultados, n, mascara=None):
+    """Los `n` asientos más críticos (Total_Criterios, luego Monto_Absoluto) entre los de `mascara`"""
+    posiciones = np.arange(len(resultados)) if mascara is None else np.flatnonzero(mascara)
+    if len(posiciones) == 0:
+        return resultados.iloc[0:0]
+    clave = clave_compuesta(
+        resultados['Total_Criterios'].to_numpy()[posiciones],
+        a_centavos_enteros(resultados['Monto_Absoluto'].to_numpy()[posiciones])
+    )
+    if clave is None:
+        subconjunto = resultados.iloc[posiciones]
+        return subconjunto.sort_values(
+            ['Total_Criterios', 'Monto_Absoluto'], ascending=[False, False], kind='stable'
+        ).head(n)
+    return resultados.iloc[posiciones[indices_top(clave, n)]]
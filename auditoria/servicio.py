@@ -0,0 +1,418 @@
+"""Servicio HTTP local para ejecutar el motor de auditoría desde otras herramientas.
+
+Uso:
+    python -m auditoria.servicio --puerto 8600 --trabajadores 2
+
+Rutas:
+    POST   /trabajos                      Libro en el cuerpo (cabecera X-Nombre-Archivo)
+                                          o JSON {"ruta": ..., "materialidad": ...}; la ruta
+                                          debe estar dentro de --directorio-permitido
+    GET    /trabajos                      Lista de trabajos
+    GET    /trabajos/<id>                 Estado (con la posición en cola si está pendiente) y estadísticas
+    GET    /trabajos/<id>/resultados      ?formato=json (NDJSON) | parquet
+    GET    /trabajos/<id>/irregularidades ?formato=json (NDJSON) | parquet
+    GET    /trabajos/<id>/estadisticas
+    DELETE /trabajos/<id>                 Cancela el trabajo (entre bloques de asientos) y borra sus archivos
+    GET    /salud
+
+Las auditorías se ejecutan en un pool acotado de procesos; las conexiones
+HTTP/1.1 se mantienen abiertas entre peticiones (keep-alive).
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from auditoria.ingesta import leer_libros
+from auditoria.motor import SistemaAuditoriaAsientos
+from auditoria.paquete import a_json, preparar_para_parquet
+from auditoria.progreso import ReporteProgreso, destino_registro
+from auditoria.trabajos import TrabajoCancelado
+
+logger = logging.getLogger('auditoria.servicio')
+
+TAM_LOTE_JSON = 5000
+TAM_BLOQUE_ENVIO = 1024 * 1024
+
+TABLAS = ('resultados', 'irregularidades')
+
+# Único directorio desde el que se aceptan libros por ruta si no se indica otro
+DIRECTORIO_LIBROS = os.path.join(tempfile.gettempdir(), 'hlb_auditoria_libros')
+
+# Marca en el directorio del trabajo que pide al proceso trabajador detenerse
+ARCHIVO_CANCELACION = 'cancelar'
+
+# Marca que deja el proceso trabajador al empezar: el pool puede haber
+# despachado un trabajo a su cola interna sin que ningún proceso lo ejecute aún
+ARCHIVO_INICIO = 'iniciado'
+
+
+# ==============================================
+# EJECUCIÓN EN LOS PROCESOS TRABAJADORES
+# ==============================================
+def _ejecutar_auditoria(ruta, materialidad, directorio):
+    """Auditar el libro en `ruta` y dejar las tablas en `directorio` como Parquet
+
+    Si aparece la marca de cancelación en `directorio`, el trabajo se detiene
+    con `TrabajoCancelado` en el siguiente punto de control.
+    """
+    logging.basicConfig(level=logging.INFO)
+    with open(os.path.join(directorio, ARCHIVO_INICIO), 'w') as f:
+        f.write(str(time.time()))
+    marca = os.path.join(directorio, ARCHIVO_CANCELACION)
+
+    def cancelacion():
+        if os.path.exists(marca):
+            raise TrabajoCancelado()
+
+    cancelacion()
+    progreso = ReporteProgreso(destino=destino_registro(logger), intervalo=5)
+    with open(ruta, 'rb') as f:
+        df = leer_libros([(os.path.basename(ruta), f.read())], procesos=1, progreso=progreso)
+
+    sistema = SistemaAuditoriaAsientos(materialidad=materialidad)
+    cancelacion()
+    sistema.cargar_datos(df, progreso=progreso)
+    sistema.aplicar_auditoria(progreso=progreso, cancelacion=cancelacion)
+    cancelacion()
+
+    tablas = {'resultados': sistema.resultados, 'irregularidades': sistema.asientos_irregulares}
+    for nombre, tabla in tablas.items():
+        preparar_para_parquet(tabla).to_parquet(
+            os.path.join(directorio, f'{nombre}.parquet'), index=False, compression='zstd'
+        )
+
+    estadisticas = json.loads(json.dumps(sistema.estadisticas, default=a_json))
+    with open(os.path.join(directorio, 'estadisticas.json'), 'w', encoding='utf-8') as f:
+        json.dump(estadisticas, f, ensure_ascii=False)
+    return estadisticas
+
+
+# ==============================================
+# REGISTRO DE TRABAJOS DEL SERVIDOR
+# ==============================================
+class RegistroTrabajos:
+    def __init__(self, max_trabajadores, directorio, retencion=3600):
+        self.directorio = directorio
+        self.retencion = retencion
+        self.pool = ProcessPoolExecutor(
+            max_workers=max_trabajadores,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+        self._trabajos = {}
+        self._lock = threading.Lock()
+        os.makedirs(directorio, exist_ok=True)
+
+    def crear(self, materialidad, ruta=None, contenido=None, nombre_archivo=None):
+        trabajo_id = uuid.uuid4().hex
+        directorio = os.path.join(self.directorio, trabajo_id)
+        os.makedirs(directorio)
+
+        if contenido is not None:
+            # El libro se guarda en disco para no copiarlo entre procesos
+            extension = os.path.splitext(nombre_archivo or '')[1].lower() or '.xlsx'
+            ruta = os.path.join(directorio, f'libro{extension}')
+            with open(ruta, 'wb') as f:
+                f.write(contenido)
+
+        futuro = self.pool.submit(_ejecutar_auditoria, ruta, materialidad, directorio)
+        trabajo = {
+            'id': trabajo_id,
+            'futuro': futuro,
+            'directorio': directorio,
+            'materialidad': materialidad,
+            'creado': time.time(),
+            'finalizado': None
+        }
+        futuro.add_done_callback(lambda _: trabajo.update(finalizado=time.time()))
+        with self._lock:
+            self._trabajos[trabajo_id] = trabajo
+        self._purgar()
+        return trabajo
+
+    def obtener(self, trabajo_id):
+        with self._lock:
+            return self._trabajos.get(trabajo_id)
+
+    def listar(self):
+        with self._lock:
+            return list(self._trabajos.values())
+
+    def eliminar(self, trabajo_id):
+        with self._lock:
+            trabajo = self._trabajos.pop(trabajo_id, None)
+        if trabajo is None:
+            return False
+        trabajo['futuro'].cancel()
+        if trabajo['futuro'].done() or trabajo['futuro'].cancelled():
+            shutil.rmtree(trabajo['directorio'], ignore_errors=True)
+        else:
+            # `cancel()` no detiene un trabajo en curso: el proceso ve la marca
+            # en su siguiente punto de control y el directorio se borra al terminar
+            with open(os.path.join(trabajo['directorio'], ARCHIVO_CANCELACION), 'w'):
+                pass
+            trabajo['futuro'].add_done_callback(
+                lambda _: shutil.rmtree(trabajo['directorio'], ignore_errors=True)
+            )
+        return True
+
+    @staticmethod
+    def estado(trabajo):
+        futuro = trabajo['futuro']
+        if futuro.cancelled() or (futuro.done() and isinstance(futuro.exception(), TrabajoCancelado)):
+            return 'cancelado'
+        if not futuro.done():
+            iniciado = os.path.exists(os.path.join(trabajo['directorio'], ARCHIVO_INICIO))
+            return 'en_curso' if iniciado else 'pendiente'
+        return 'error' if futuro.exception() is not None else 'completado'
+
+    def descripcion(self, trabajo, con_estadisticas=False):
+        estado = self.estado(trabajo)
+        datos = {
+            'id': trabajo['id'],
+            'estado': estado,
+            'materialidad': trabajo['materialidad'],
+            'creado': trabajo['creado'],
+            'finalizado': trabajo['finalizado']
+        }
+        if estado == 'pendiente':
+            datos['posicion_cola'] = self.posicion_cola(trabajo)
+        if estado == 'error':
+            datos['error'] = str(trabajo['futuro'].exception())
+        if estado == 'completado' and con_estadisticas:
+            datos['estadisticas'] = trabajo['futuro'].result()
+        return datos
+
+    def posicion_cola(self, trabajo):
+        """1 para el próximo trabajo pendiente en empezar, 2 para el siguiente..."""
+        anteriores = [
+            t for t in self.listar()
+            if t['creado'] < trabajo['creado'] and self.estado(t) == 'pendiente'
+        ]
+        return len(anteriores) + 1
+
+    def _purgar(self):
+        """Eliminar trabajos terminados hace más de `retencion` segundos"""
+        limite = time.time() - self.retencion
+        for trabajo in self.listar():
+            if trabajo['finalizado'] is not None and trabajo['finalizado'] < limite:
+                self.eliminar(trabajo['id'])
+
+    def cerrar(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ==============================================
+# SERVIDOR HTTP
+# ==============================================
+class ManejadorAuditoria(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'HLBAuditoria/1.0'
+
+    @property
+    def registro(self):
+        return self.server.registro
+
+    def log_message(self, formato, *args):
+        logger.info("%s - %s", self.address_string(), formato % args)
+
+    # --- Respuestas ---
+    def _responder_json(self, codigo, datos):
+        cuerpo = json.dumps(datos, ensure_ascii=False, default=a_json).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _error(self, codigo, mensaje):
+        self._responder_json(codigo, {'error': mensaje})
+
+    def _enviar_archivo(self, ruta, tipo):
+        self.send_response(200)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(os.path.getsize(ruta)))
+        self.end_headers()
+        with open(ruta, 'rb') as f:
+            shutil.copyfileobj(f, self.wfile, TAM_BLOQUE_ENVIO)
+
+    def _enviar_ndjson(self, ruta):
+        """Transmitir una tabla Parquet como JSON por líneas, en lotes y con chunked encoding"""
+        import pyarrow.parquet as pq
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for lote in pq.ParquetFile(ruta).iter_batches(batch_size=TAM_LOTE_JSON):
+            lineas = ''.join(
+                json.dumps(fila, ensure_ascii=False, default=a_json) + '\n'
+                for fila in lote.to_pylist()
+            ).encode('utf-8')
+            self.wfile.write(f'{len(lineas):X}\r\n'.encode('ascii') + lineas + b'\r\n')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _leer_cuerpo(self):
+        longitud = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(longitud) if longitud else b''
+
+    def _descartar_cuerpo(self):
+        """Consumir un cuerpo que no se usará para no desalinear la conexión keep-alive"""
+        pendiente = int(self.headers.get('Content-Length') or 0)
+        while pendiente > 0:
+            bloque = self.rfile.read(min(pendiente, TAM_BLOQUE_ENVIO))
+            if not bloque:
+                break
+            pendiente -= len(bloque)
+
+    # --- Rutas ---
+    def _partes(self):
+        url = urlparse(self.path)
+        return [p for p in url.path.split('/') if p], parse_qs(url.query)
+
+    def do_GET(self):
+        partes, consulta = self._partes()
+
+        if partes == ['salud']:
+            return self._responder_json(200, {'estado': 'ok', 'trabajos': len(self.registro.listar())})
+
+        if partes == ['trabajos']:
+            return self._responder_json(200, [self.registro.descripcion(t) for t in self.registro.listar()])
+
+        if len(partes) < 2 or partes[0] != 'trabajos':
+            return self._error(404, 'Ruta no encontrada')
+
+        trabajo = self.registro.obtener(partes[1])
+        if trabajo is None:
+            return self._error(404, 'Trabajo no encontrado')
+
+        if len(partes) == 2:
+            return self._responder_json(200, self.registro.descripcion(trabajo, con_estadisticas=True))
+
+        estado = self.registro.estado(trabajo)
+        if estado != 'completado':
+            return self._error(409, f'El trabajo está {estado}')
+
+        if partes[2:] == ['estadisticas']:
+            return self._enviar_archivo(
+                os.path.join(trabajo['directorio'], 'estadisticas.json'), 'application/json; charset=utf-8'
+            )
+
+        if len(partes) == 3 and partes[2] in TABLAS:
+            ruta = os.path.join(trabajo['directorio'], f'{partes[2]}.parquet')
+            formato = consulta.get('formato', ['json'])[0]
+            if formato == 'parquet':
+                return self._enviar_archivo(ruta, 'application/vnd.apache.parquet')
+            if formato == 'json':
+                return self._enviar_ndjson(ruta)
+            return self._error(400, "Formato no soportado; use 'json' o 'parquet'")
+
+        return self._error(404, 'Ruta no encontrada')
+
+    def do_POST(self):
+        partes, consulta = self._partes()
+        if partes != ['trabajos']:
+            self._descartar_cuerpo()
+            return self._error(404, 'Ruta no encontrada')
+
+        cuerpo = self._leer_cuerpo()
+        tipo = self.headers.get('Content-Type', '')
+
+        try:
+            if tipo.startswith('application/json'):
+                datos = json.loads(cuerpo or b'{}')
+                if not isinstance(datos, dict):
+                    return self._error(400, 'El cuerpo JSON debe ser un objeto')
+                ruta = datos.get('ruta')
+                if not ruta:
+                    return self._error(400, "Falta 'ruta' del libro contable")
+                if not isinstance(ruta, str):
+                    return self._error(400, "'ruta' debe ser texto")
+                # realpath: un enlace simbólico no sirve para salir del directorio
+                ruta = os.path.realpath(ruta)
+                permitido = self.server.directorio_permitido
+                if not permitido:
+                    return self._error(403, 'El servidor no acepta libros por ruta')
+                if os.path.commonpath([ruta, permitido]) != permitido:
+                    return self._error(403, 'Ruta fuera del directorio permitido')
+                if not os.path.isfile(ruta):
+                    return self._error(404, f'No existe el archivo: {ruta}')
+                materialidad = float(datos.get('materialidad', 170000))
+                trabajo = self.registro.crear(materialidad, ruta=ruta)
+            else:
+                if not cuerpo:
+                    return self._error(400, 'El cuerpo de la petición está vacío')
+                materialidad = float(consulta.get('materialidad', [170000])[0])
+                trabajo = self.registro.crear(
+                    materialidad,
+                    contenido=cuerpo,
+                    nombre_archivo=self.headers.get('X-Nombre-Archivo')
+                )
+        except (ValueError, TypeError) as e:
+            # JSON inválido o materialidad que no es un número
+            return self._error(400, str(e))
+
+        self._responder_json(202, self.registro.descripcion(trabajo))
+
+    def do_DELETE(self):
+        partes, _ = self._partes()
+        self._descartar_cuerpo()
+        if len(partes) != 2 or partes[0] != 'trabajos':
+            return self._error(404, 'Ruta no encontrada')
+        if not self.registro.eliminar(partes[1]):
+            return self._error(404, 'Trabajo no encontrado')
+        self._responder_json(200, {'id': partes[1], 'eliminado': True})
+
+
+class ServidorAuditoria(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, direccion, registro, directorio_permitido=None):
+        super().__init__(direccion, ManejadorAuditoria)
+        self.registro = registro
+        # Sin directorio permitido no se aceptan libros por ruta
+        self.directorio_permitido = os.path.realpath(directorio_permitido) if directorio_permitido else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio HTTP del motor de auditoría HLB")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8600)
+    parser.add_argument('--trabajadores', type=int, default=max(1, (os.cpu_count() or 2) // 2))
+    parser.add_argument('--directorio-trabajos', default=os.path.join(tempfile.gettempdir(), 'hlb_auditoria_servicio'))
+    parser.add_argument('--directorio-permitido', default=DIRECTORIO_LIBROS,
+                        help="Solo se aceptan rutas de libros dentro de este directorio (se crea si no existe)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        parser.error("El servicio requiere pyarrow (pip install pyarrow)")
+
+    os.makedirs(args.directorio_permitido, exist_ok=True)
+    registro = RegistroTrabajos(args.trabajadores, args.directorio_trabajos)
+    servidor = ServidorAuditoria((args.host, args.puerto), registro, args.directorio_permitido)
+    logger.info("Servicio de auditoría en http://%s:%s con %s trabajadores", args.host, args.puerto, args.trabajadores)
+    logger.info("Libros por ruta aceptados solo desde %s", servidor.directorio_permitido)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        registro.cerrar()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+"""Cola local de trabajos de auditoría ejecutados en segundo plano."""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+# ==============================================
+# ESTADOS DE UN TRABAJO
+# ==============================================
+ESTADO_PENDIENTE = 'pendiente'
+ESTADO_EN_CURSO = 'en_curso'
+ESTADO_COMPLETADO = 'completado'
+ESTADO_CANCELADO = 'cancelado'
+ESTADO_ERROR = 'error'
+
+ESTADOS_FINALES = (ESTADO_COMPLETADO, ESTADO_CANCELADO, ESTADO_ERROR)
+
+
+class TrabajoCancelado(Exception):
+    """Se lanza dentro de un trabajo cuando el usuario solicita cancelarlo"""
+
+
+class Trabajo:
+    def __init__(self, sesion, funcion):
+        self.id = uuid.uuid4().hex
+        self.sesion = sesion
+        self.funcion = funcion
+        self.estado = ESTADO_PENDIENTE
+        self.resultado = None
+        self.error = None
+        self.instantanea = {}
+        self.creado = time.time()
+        self.iniciado = None
+        self.finalizado = None
+        self._evento_cancelar = threading.Event()
+        self._evento_terminado = threading.Event()
+
+    @property
+    def progreso(self):
+        """Fracción completada de la etapa en curso, entre 0 y 1"""
+        if self.estado == ESTADO_COMPLETADO:
+            return 1.0
+        etapa = self.instantanea.get('etapa')
+        if etapa is None:
+            return 0.0
+        return self.instantanea['etapas'][etapa]['fraccion']
+
+    @property
+    def parciales(self):
+        return self.instantanea.get('parciales', {})
+
+    @property
+    def terminado(self):
+        return self.estado in ESTADOS_FINALES
+
+    @property
+    def cancelacion_solicitada(self):
+        return self._evento_cancelar.is_set()
+
+    def cancelar(self):
+        """Solicitar la cancelación; el trabajo se detiene en su siguiente verificación"""
+        self._evento_cancelar.set()
+
+    def esperar(self, timeout=None):
+        """Esperar hasta `timeout` segundos a que termine; devuelve si terminó"""
+        return self._evento_terminado.wait(timeout)
+
+    def _terminar(self, estado):
+        self.estado = estado
+        self.finalizado = time.time()
+        self._evento_terminado.set()
+
+    def verificar_cancelacion(self):
+        """Punto de control que la función del trabajo debe invocar periódicamente"""
+        if self._evento_cancelar.is_set():
+            raise TrabajoCancelado()
+
+    def reportar(self, instantanea):
+        """Destino de un `ReporteProgreso`: guarda la última instantánea del avance"""
+        self.instantanea = instantanea
+
+
+class GestorTrabajos:
+    """Pool acotado de trabajadores compartido por todas las sesiones del servidor.
+
+    Los trabajos pendientes se agrupan por sesión y se despachan por turnos
+    (round-robin), de modo que un auditor con varias ejecuciones en cola no
+    bloquea a los demás.
+    """
+
+    def __init__(self, max_trabajadores=2, max_historial=100):
+        self.max_trabajadores = max_trabajadores
+        self.max_historial = max_historial
+        self._condicion = threading.Condition()
+        self._colas = OrderedDict()
+        self._trabajos = OrderedDict()
+        self._en_curso = 0
+        self._hilos = []
+        for i in range(max_trabajadores):
+            hilo = threading.Thread(
+                target=self._bucle_trabajador,
+                name=f"auditoria-trabajador-{i}",
+                daemon=True
+            )
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def enviar(self, sesion, funcion):
+        """Encolar `funcion(trabajo)` para la sesión indicada y devolver el trabajo"""
+        trabajo = Trabajo(sesion, funcion)
+        with self._condicion:
+            self._trabajos[trabajo.id] = trabajo
+            self._colas.setdefault(sesion, deque()).append(trabajo)
+            self._purgar_historial()
+            self._condicion.notify()
+        return trabajo
+
+    def obtener(self, trabajo_id):
+        with self._condicion:
+            return self._trabajos.get(trabajo_id)
+
+    def cancelar(self, trabajo_id):
+        """Cancelar un trabajo; si aún no empezó se retira directamente de la cola"""
+        with self._condicion:
+            trabajo = self._trabajos.get(trabajo_id)
+            if trabajo is None or trabajo.terminado:
+                return trabajo
+            trabajo.cancelar()
+            cola = self._colas.get(trabajo.sesion)
+            if trabajo.estado == ESTADO_PENDIENTE and cola is not None and trabajo in cola:
+                cola.remove(trabajo)
+                if not cola:
+                    del self._colas[trabajo.sesion]
+                trabajo._terminar(ESTADO_CANCELADO)
+            return trabajo
+
+    def posicion_en_cola(self, trabajo_id):
+        """Cantidad de trabajos pendientes que se despacharán antes que el indicado"""
+        with self._condicion:
+            trabajo = self._trabajos.get(trabajo_id)
+            if trabajo is None or trabajo.estado != ESTADO_PENDIENTE:
+                return 0
+            propia = self._colas.get(trabajo.sesion, deque())
+            turno = list(propia).index(trabajo)
+            # Cada sesión despacha un trabajo por vuelta
+            otras = sum(min(len(cola), turno + 1) for s, cola in self._colas.items() if s != trabajo.sesion)
+            return turno + otras
+
+    def resumen(self):
+        """Estado agregado del pool para mostrar en la interfaz"""
+        with self._condicion:
+            return {
+                'trabajadores': self.max_trabajadores,
+                'en_curso': self._en_curso,
+                'pendientes': sum(len(cola) for cola in self._colas.values()),
+                'sesiones_en_espera': len(self._colas)
+            }
+
+    def _siguiente(self):
+        """Tomar el próximo trabajo respetando el turno entre sesiones"""
+        sesion, cola = next(iter(self._colas.items()))
+        trabajo = cola.popleft()
+        del self._colas[sesion]
+        if cola:
+            # La sesión pasa al final de la ronda
+            self._colas[sesion] = cola
+        return trabajo
+
+    def _purgar_historial(self):
+        terminados = [t for t in self._trabajos.values() if t.terminado]
+        for trabajo in terminados[:max(0, len(terminados) - self.max_historial)]:
+            del self._trabajos[trabajo.id]
+
+    def _bucle_trabajador(self):
+        while True:
+            with self._condicion:
+                while not self._colas:
+                    self._condicion.wait()
+                trabajo = self._siguiente()
+                trabajo.estado = ESTADO_EN_CURSO
+                trabajo.iniciado = time.time()
+                self._en_curso += 1
+
+            try:
+                trabajo.verificar_cancelacion()
+                trabajo.resultado = trabajo.funcion(trabajo)
+                estado = ESTADO_COMPLETADO
+            except TrabajoCancelado:
+                estado = ESTADO_CANCELADO
+            except Exception as e:
+                trabajo.error = e
+                estado = ESTADO_ERROR
+
+            with self._condicion:
+                trabajo.funcion = None
+                trabajo._terminar(estado)
+                self._en_curso -= 1
+
+
+_gestor = None
+_gestor_lock = threading.Lock()
+
+
+def obtener_gestor():
+    """Gestor único por proceso, compartido entre todas las sesiones de Streamlit"""
+    global _gestor
+    with _gestor_lock:
+        if _gestor is None:
+            max_trabajadores = int(os.environ.get(
+                'HLB_AUDITORIA_TRABAJADORES', max(1, (os.cpu_count() or 2) // 2)
+            ))
+            _gestor = GestorTrabajos(max_trabajadores=max_trabajadores)
+        return _gestor
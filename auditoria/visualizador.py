@@ -0,0 +1,283 @@
+"""Gráficos, reporte ejecutivo y exportaciones de una auditoría.
+
+Las librerías de gráficos y de exportación se importan al usarse, para no
+cargarlas en procesos que solo ejecutan el motor.
+"""
+import io
+from datetime import datetime
+
+import pandas as pd
+
+from auditoria.configuracion import (
+    HLB_BLUE, HLB_CHARCOAL, HLB_GOLD, HLB_LIGHT_BLUE
+)
+from auditoria.cubo import CuboAuditoria
+from auditoria.paquete import exportar_paquete
+from auditoria.progreso import ReporteProgreso
+
+
+class VisualizadorAuditoria:
+    def __init__(self, sistema_auditoria):
+        self.auditoria = sistema_auditoria
+        self.resultados = sistema_auditoria.resultados
+        self.estadisticas = sistema_auditoria.estadisticas
+        self.asientos_irregulares = sistema_auditoria.asientos_irregulares
+    
+    @property
+    def asientos_criticos(self):
+        return self.auditoria.asientos_criticos
+    
+    def obtener_cubo(self):
+        """Cubo de agregados de la auditoría (se construye si el sistema no lo trae)"""
+        if self.auditoria.cubo is None:
+            self.auditoria.cubo = CuboAuditoria.desde_sistema(self.auditoria)
+        return self.auditoria.cubo
+    
+    def crear_dashboard_principal(self, cubo=None):
+        """Crear dashboard principal interactivo con colores HLB
+        
+        Los gráficos se dibujan desde el cubo de agregados; `cubo` puede ser
+        una vista filtrada (ver `CuboAuditoria.filtrar`).
+        """
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
+        
+        cubo = cubo if cubo is not None else self.obtener_cubo()
+        
+        # Crear subplots
+        fig = make_subplots(
+            rows=2, cols=2,
+            subplot_titles=(
+                'Distribución por Materialidad',
+                'Top Criterios de Auditoría',
+                'Asientos por Número de Criterios',
+                'Monto por Número de Criterios'
+            ),
+            specs=[
+                [{"type": "pie"}, {"type": "bar"}],
+                [{"type": "bar"}, {"type": "bar"}]
+            ]
+        )
+        
+        # 1. Distribución por Materialidad - Usando colores HLB
+        material_counts = cubo.por_materialidad()
+        material_counts = material_counts[material_counts > 0].sort_values(ascending=False)
+        fig.add_trace(
+            go.Pie(
+                labels=material_counts.index,
+                values=material_counts.values,
+                hole=0.4,
+                marker=dict(colors=[HLB_GOLD, HLB_LIGHT_BLUE]),  # HLB Gold y Light Blue
+                name="Materialidad",
+                textinfo='percent+label',
+                hoverinfo='label+value+percent'
+            ),
+            row=1, col=1
+        )
+        
+        # 2. Top Criterios
+        criterios_df = cubo.por_criterio().rename(columns={'Cantidad': 'Count'})
+        criterios_df['Criterio'] = criterios_df['Criterio'].str.replace('5.', '', regex=False).str.replace('_', ' ')
+        criterios_df = criterios_df.sort_values('Count', ascending=True)
+        
+        # Colores según nivel de riesgo usando paleta HLB
+        colors = []
+        for riesgo in criterios_df['Riesgo']:
+            if riesgo == 'alto':
+                colors.append(HLB_GOLD)  # HLB Gold para alto riesgo
+            elif riesgo == 'medio':
+                colors.append(HLB_LIGHT_BLUE)  # HLB Light Blue para medio riesgo
+            else:
+                colors.append(HLB_BLUE)  # HLB Blue para bajo riesgo
+        
+        fig.add_trace(
+            go.Bar(
+                y=criterios_df['Criterio'],
+                x=criterios_df['Count'],
+                orientation='h',
+                marker_color=colors,
+                text=criterios_df['Count'],
+                textposition='auto',
+                name="Criterios",
+                hovertemplate='<b>%{y}</b><br>Cantidad: %{x}<br>Nivel de Riesgo: %{customdata[0]}<extra></extra>',
+                customdata=criterios_df[['Riesgo']].values
+            ),
+            row=1, col=2
+        )
+        
+        # 3. Distribución de número de criterios
+        por_numero = cubo.por_numero_criterios()
+        fig.add_trace(
+            go.Bar(
+                x=por_numero['Total_Criterios'],
+                y=por_numero['Asientos'],
+                marker_color=HLB_BLUE,  # HLB Blue
+                name="Número de Criterios",
+                hovertemplate='<b>%{x} criterios</b><br>Cantidad: %{y}<extra></extra>'
+            ),
+            row=2, col=1
+        )
+        
+        # 4. Montos por número de criterios
+        fig.add_trace(
+            go.Bar(
+                x=por_numero['Total_Criterios'],
+                y=por_numero['Monto'],
+                marker=dict(
+                    color=por_numero['Total_Criterios'],
+                    colorscale=[[0, HLB_BLUE], [0.5, HLB_LIGHT_BLUE], [1, HLB_GOLD]],  # Escala HLB
+                    showscale=True,
+                    colorbar=dict(title="Criterios")
+                ),
+                customdata=por_numero[['Asientos']].values,
+                hovertemplate='<b>%{x} criterios</b><br>Monto: $%{y:,.2f}<br>Asientos: %{customdata[0]}<extra></extra>',
+                name="Montos vs Criterios"
+            ),
+            row=2, col=2
+        )
+        
+        fig.update_layout(
+            height=800,
+            title_text=f"Dashboard de Auditoría HLB - Materialidad: ${self.auditoria.materialidad:,}",
+            showlegend=False,
+            template="plotly_white",
+            font=dict(color=HLB_CHARCOAL)
+        )
+        
+        return fig
+    
+    def generar_reporte_ejecutivo(self):
+        """Generar reporte ejecutivo de auditoría"""
+        stats = self.estadisticas
+        
+        reporte = f"""
+INFORME EJECUTIVO DE AUDITORÍA - HLB AUDITEC
+{'='*60}
+
+RESUMEN GENERAL:
+• Total de asientos analizados: {stats['total_asientos']:,}
+• Asientos materiales (>${self.auditoria.materialidad:,}): {stats['asientos_materiales']:,} ({stats['porcentaje_materiales']:.1f}%)
+• Asientos con múltiples criterios: {stats['asientos_multiple_criterio']:,}
+• Asientos de alto riesgo: {stats['asientos_alto_riesgo']:,}
+• Asientos críticos identificados: {stats['asientos_criticos_count']:,}
+• Monto total material: ${stats['monto_total_material']:,.2f}
+
+DISTRIBUCIÓN POR CRITERIO DE AUDITORÍA:
+"""
+        
+        for criterio, data in sorted(stats['criterios'].items(), 
+                                    key=lambda x: (x[1]['nivel_riesgo'] == 'alto', x[1]['count']), 
+                                    reverse=True):
+            nombre_corto = criterio.replace('5.', '').replace('_', ' ')
+            riesgo_emoji = "🔴" if data['nivel_riesgo'] == 'alto' else "🟡" if data['nivel_riesgo'] == 'medio' else "🟢"
+            reporte += f"• {riesgo_emoji} {nombre_corto}: {data['count']} asientos ({data['porcentaje']:.1f}%)\n"
+            reporte += f"  {data['descripcion']}\n"
+
+        omitidos = stats.get('criterios_omitidos', {})
+        if omitidos:
+            reporte += "\nCRITERIOS OMITIDOS (no aplicables a las columnas del libro):\n"
+            for criterio, motivo in omitidos.items():
+                reporte += f"• {criterio.replace('5.', '').replace('_', ' ')}: {motivo}\n"
+
+        # Asientos más críticos (selección parcial, sin ordenar todos los críticos)
+        total_criticos = stats['asientos_criticos_count']
+        reporte += f"""
+ASIENTOS CRÍTICOS IDENTIFICADOS:
+• Total de asientos críticos: {total_criticos}
+"""
+        
+        if total_criticos > 0:
+            top = self.auditoria.ranking(10)
+            reporte += "• Top 10 asientos más críticos:\n"
+            for i, (id_asiento, monto, total) in enumerate(zip(
+                top['ID_Asiento'], top['Monto_Absoluto'], top['Total_Criterios']
+            )):
+                reporte += f"  {i+1}. ID {int(id_asiento)}: ${monto:>12,.2f} - {total} criterios\n"
+        
+        # Irregularidades detalladas
+        if self.asientos_irregulares is not None and len(self.asientos_irregulares) > 0:
+            reporte += f"""
+IRREGULARIDADES DETECTADAS:
+• Total de irregularidades: {len(self.asientos_irregulares)}
+"""
+            por_criterio = self.asientos_irregulares.groupby('Criterio', sort=False).size()
+            for criterio, count in por_criterio.items():
+                reporte += f"  • {criterio}: {count} irregularidades\n"
+        
+        reporte += f"""
+RECOMENDACIONES:
+1. Revisar en detalle los {total_criticos} asientos críticos identificados
+2. Evaluar los {stats['asientos_multiple_criterio']} asientos con múltiples criterios
+3. Verificar transacciones en fines de semana/feriados ({stats['criterios'].get('5.7_Fines_Semana_Feriados', {}).get('count', 0)} detectadas)
+4. Investigar posibles fraudes en montos sospechosos ({stats['criterios'].get('5.10_Montos_Sospechosos', {}).get('count', 0)} detectados)
+
+FECHA DE GENERACIÓN: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+EMPRESA: HLB Auditec Cía. Ltda.
+"""
+        
+        return reporte
+    
+    def exportar_resultados_excel(self, progreso=None):
+        """Exportar todos los resultados a Excel en memoria"""
+        output = io.BytesIO()
+        
+        hojas_grandes = [self.resultados, self.asientos_criticos,
+                         self.asientos_irregulares, self.auditoria.df_procesado]
+        progreso = progreso or ReporteProgreso()
+        progreso.iniciar('exportacion', total=sum(len(df) for df in hojas_grandes if df is not None))
+        
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            # Resultados detallados
+            self.resultados.to_excel(writer, sheet_name='Resultados_Detallados', index=False)
+            progreso.avanzar(len(self.resultados))
+            
+            # Asientos críticos
+            if self.asientos_criticos is not None and len(self.asientos_criticos) > 0:
+                self.asientos_criticos.to_excel(writer, sheet_name='Asientos_Criticos', index=False)
+                progreso.avanzar(len(self.asientos_criticos))
+            
+            # Irregularidades
+            if self.asientos_irregulares is not None and len(self.asientos_irregulares) > 0:
+                self.asientos_irregulares.to_excel(writer, sheet_name='Irregularidades', index=False)
+                progreso.avanzar(len(self.asientos_irregulares))
+            
+            # Resumen estadístico
+            resumen_data = []
+            stats = self.estadisticas
+            
+            resumen_data.append(['PARÁMETRO', 'VALOR'])
+            resumen_data.append(['Total Asientos Analizados', stats['total_asientos']])
+            resumen_data.append(['Asientos Materiales', stats['asientos_materiales']])
+            resumen_data.append(['Porcentaje Materiales', f"{stats['porcentaje_materiales']:.1f}%"])
+            resumen_data.append(['Materialidad Aplicada', f"${self.auditoria.materialidad:,}"])
+            resumen_data.append(['Asientos Múltiples Criterios', stats['asientos_multiple_criterio']])
+            resumen_data.append(['Asientos Alto Riesgo', stats['asientos_alto_riesgo']])
+            resumen_data.append(['Asientos Críticos', stats['asientos_criticos_count']])
+            resumen_data.append(['Monto Total Material', f"${stats['monto_total_material']:,.2f}"])
+            resumen_data.append(['Monto Total', f"${stats['monto_total']:,.2f}"])
+            resumen_data.append(['', ''])
+            resumen_data.append(['CRITERIO', 'CANTIDAD', 'PORCENTAJE', 'NIVEL RIESGO', 'DESCRIPCIÓN'])
+            
+            for criterio, data in sorted(stats['criterios'].items(), 
+                                        key=lambda x: x[1]['count'], reverse=True):
+                nombre_corto = criterio.replace('5.', '').replace('_', ' ')
+                resumen_data.append([
+                    nombre_corto,
+                    data['count'],
+                    f"{data['porcentaje']:.1f}%",
+                    data['nivel_riesgo'].upper(),
+                    data['descripcion']
+                ])
+            
+            pd.DataFrame(resumen_data).to_excel(writer, sheet_name='Resumen_Ejecutivo', index=False, header=False)
+            
+            # Datos originales procesados
+            self.auditoria.df_procesado.to_excel(writer, sheet_name='Datos_Originales', index=False)
+        
+        progreso.finalizar()
+        output.seek(0)
+        return output
+    
+    def exportar_paquete(self, progreso=None):
+        """Exportar resultados, irregularidades, libro procesado y estadísticas como paquete Parquet (.zip)"""
+        return exportar_paquete(self.auditoria, progreso=progreso)
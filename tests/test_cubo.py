@@ -0,0 +1,28 @@
+"""Cubo de agregados construido a partir de una auditoría terminada."""
+import pandas as pd
+
+from auditoria.cubo import SIN_CUENTA, CuboAuditoria
+from auditoria.motor import SistemaAuditoriaAsientos
+
+
+def _auditar(df, materialidad=500):
+    sistema = SistemaAuditoriaAsientos(materialidad=materialidad)
+    sistema.cargar_datos(df)
+    sistema.aplicar_auditoria()
+    return sistema
+
+
+def test_cuentas_numericas_y_texto_comparten_categoria():
+    # Un CSV con cuentas enteras unido a una hoja Excel con cuentas en texto
+    df = pd.DataFrame({
+        'Fecha': pd.to_datetime(['2022-03-01', '2022-03-02', '2022-03-04', '2022-04-01']),
+        'Cuenta': [1101, '1101', '2201', None],
+        'Debe': [1000, 250.5, 30, 10],
+        'Haber': [0, 0, 0, 0],
+        'Descripción': ['pago proveedor', 'venta', 'ajuste', 'otro']
+    })
+    cubo = CuboAuditoria.desde_sistema(_auditar(df))
+
+    assert cubo.opciones()['cuentas'] == ['1101', '2201', SIN_CUENTA]
+    assert cubo.filtrar(cuentas=['1101']).kpis()['total_asientos'] == 2
+    assert cubo.kpis()['total_asientos'] == 4
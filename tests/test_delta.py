@@ -0,0 +1,60 @@
+"""Auditoría incremental frente a una auditoría completa del mismo libro."""
+import io
+
+import pandas as pd
+
+from auditoria.carga import libro_sintetico
+from auditoria.delta import AlmacenResultados, auditar_incremental
+from auditoria.motor import SistemaAuditoriaAsientos
+
+
+def _auditar(df, almacen=None):
+    sistema = SistemaAuditoriaAsientos(materialidad=50000)
+    sistema.cargar_datos(df)
+    if almacen is None:
+        sistema.aplicar_auditoria()
+    else:
+        auditar_incremental(sistema, 'Cliente', almacen)
+    return sistema
+
+
+def _mismos_resultados(completa, incremental):
+    return completa.resultados.reset_index(drop=True).equals(
+        incremental.resultados[completa.resultados.columns].reset_index(drop=True)
+    )
+
+
+def _libro():
+    df = pd.read_csv(io.BytesIO(libro_sintetico(3000, semilla=3)))
+    return df.loc[pd.to_datetime(df['Fecha']).sort_values().index].reset_index(drop=True)
+
+
+def test_asientos_retroactivos_recalculan_atipicos(tmp_path):
+    almacen = AlmacenResultados(str(tmp_path))
+    libro = _libro()
+    primera = libro.iloc[:2000].reset_index(drop=True)
+    _auditar(primera, almacen)
+
+    # Asientos grandes con fechas anteriores cambian el historial de sus cuentas
+    retroactivos = primera.sample(150, random_state=1)
+    retroactivos['Debe'] *= 40
+    segunda = pd.concat([primera.iloc[:1000], retroactivos, primera.iloc[1000:], libro.iloc[2000:]],
+                        ignore_index=True)
+    incremental = _auditar(segunda, almacen)
+
+    assert incremental.resumen_delta['reutilizados'] == 2000
+    assert incremental.resumen_delta['atipicos_reevaluados'] > 0
+    assert _mismos_resultados(_auditar(segunda), incremental)
+
+
+def test_columnas_que_no_leen_los_criterios_no_cambian_huellas(tmp_path):
+    almacen = AlmacenResultados(str(tmp_path))
+    libro = _libro()
+    _auditar(libro, almacen)
+
+    libro['Auxiliar'] = 'x'
+    libro['Origen_Archivo'] = 'mayor.xlsx'
+    incremental = _auditar(libro, almacen)
+
+    assert incremental.resumen_delta['nuevos'] == 0
+    assert _mismos_resultados(_auditar(libro), incremental)
@@ -0,0 +1,90 @@
+"""Conversión de importes en texto a centavos enteros."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from auditoria.montos import a_centavos
+
+
+def _centavos(texto, decimal=None):
+    return int(a_centavos(pd.Series([texto], dtype=object), decimal).iloc[0])
+
+
+@pytest.mark.parametrize('texto, esperado', [
+    ('1.234', 123400),
+    ('1,234', 123400),
+    ('1.234,56', 123456),
+    ('1,234.56', 123456),
+    ('1234,5', 123450),
+    ('1.000.000', 100000000),
+    ('(1,234.50)', -123450),
+    ('1.234-', -123400),
+])
+def test_separadores_regionales(texto, esperado):
+    assert _centavos(texto) == esperado
+
+
+@pytest.mark.parametrize('texto, esperado', [
+    ('0.500', 50),
+    ('0,250', 25),
+    ('-0,125', -13),
+    ('.750', 75),
+    ('00.125', 13),
+])
+def test_parte_entera_cero_es_decimal(texto, esperado):
+    assert _centavos(texto) == esperado
+
+
+@pytest.mark.parametrize('texto, esperado', [
+    ('1.5E+05', 15000000),
+    ('1.5e5', 15000000),
+    ('2,5e3', 250000),
+    ('-2.5E+03', -250000),
+    ('1E-2', 1),
+])
+def test_notacion_cientifica(texto, esperado):
+    assert _centavos(texto) == esperado
+
+
+@pytest.mark.parametrize('texto, esperado', [
+    ('$-1,234.56', -123456),
+    ('USD -1,234.56', -123456),
+    ('-$1,234.56', -123456),
+    ('$ (1,234.56)', -123456),
+    ('\u22121.234,56', -123456),
+    ('1.234,56 \u2212', -123456),
+    ('EUR 1.234,56', 123456),
+    ('1.234,56 EUR', 123456),
+])
+def test_signo_con_moneda(texto, esperado):
+    assert _centavos(texto) == esperado
+
+
+@pytest.mark.parametrize('texto', [
+    '12345678901234567890',
+    '-12345678901234567890',
+    '1e400',
+    'inf',
+    '-1,5e300',
+])
+def test_texto_fuera_de_rango_es_cero(texto):
+    assert _centavos(texto) == 0
+
+
+def test_muchos_decimales():
+    assert _centavos('1234.5678999999999999999') == 123457
+    assert _centavos('0.0000000000000000000000001') == 0
+
+
+@pytest.mark.parametrize('serie', [
+    pd.Series([np.inf, -np.inf, np.nan, 1e300, 12.5]),
+    pd.Series([np.inf, -np.inf, None, 1e300, '12,50'], dtype=object),
+])
+def test_numero_no_finito_o_fuera_de_rango_es_cero(serie):
+    with np.errstate(all='raise'):
+        assert a_centavos(serie).tolist() == [0, 0, 0, 0, 1250]
+
+
+def test_columna_mixta_y_sin_digitos():
+    serie = pd.Series([1234.5, '0.500', None, 'abc', '1.5E+05'], dtype=object)
+    assert a_centavos(serie).tolist() == [123450, 50, 0, 0, 15000000]
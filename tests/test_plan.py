@@ -0,0 +1,32 @@
+"""Resolución de columnas de búsqueda contra encabezados reales de libros."""
+from auditoria.configuracion import CRITERIOS_AUDITORIA
+from auditoria.plan import planificar_criterios, resolver_columna
+
+
+def test_variantes_de_texto_se_reconocen():
+    assert resolver_columna('Descripción', ['Fecha', 'DESCRIPCION ']) == 'DESCRIPCION '
+    assert resolver_columna('Descripción', ['Fecha', 'Glosa']) == 'Glosa'
+    assert resolver_columna('Descripción', ['Fecha', 'Descripciones']) == 'Descripciones'
+    assert resolver_columna('Comentario', ['Observación']) == 'Observación'
+    assert resolver_columna('Tipo', ['Tipo documento']) == 'Tipo documento'
+    assert resolver_columna('Cuenta', ['Nombre de cuenta']) == 'Nombre de cuenta'
+
+
+def test_identificadores_numericos_no_se_buscan_como_texto():
+    numericos = ['N° Asiento', 'Nro. Asiento', 'ID Asiento', 'Número de asiento',
+                 'Nº comprobante', 'Entry number', 'Código cuenta', 'Cod. Cuenta',
+                 'Número cuenta', 'Subcuenta']
+    for nombre in ('Asiento', 'Cuenta', 'Tipo', 'Descripción', 'Comentario'):
+        assert resolver_columna(nombre, numericos) is None, nombre
+
+
+def test_plan_de_un_libro_con_encabezados_reales():
+    columnas = ['Fecha contable', 'N° Asiento', 'Código cuenta', 'Glosa', 'Debe', 'Haber']
+    plan = planificar_criterios(CRITERIOS_AUDITORIA, columnas,
+                                {'fecha': 'Fecha contable', 'cuenta': 'Código cuenta'})
+
+    assert plan['columnas']['Descripción'] == 'Glosa'
+    assert plan['columnas']['Asiento'] is None
+    assert plan['columnas']['Cuenta'] is None
+    assert all(reales in ([], ['Glosa'], ['Fecha contable'], ['Código cuenta'])
+               for reales in plan['activos'].values())